@@ -0,0 +1,122 @@
+"""
+Minimal geohash helpers used to index responder positions.
+
+Cells are addressed both as base32 strings (what gets stored on the user row)
+and as integer (x, y) grid coordinates, which makes it cheap to walk the
+rings of cells around a point.
+"""
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+BASE32_INDEX = {char: i for i, char in enumerate(BASE32)}
+
+# Precision stored on CustomUser.geohash (~4.8m x 4.8m cells)
+STORED_PRECISION = 9
+
+KM_PER_DEGREE = 111.32
+
+
+def _bit_counts(precision):
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return lng_bits, lat_bits
+
+
+def cell_xy(lat, lng, precision):
+    """Return the integer grid coordinates of the cell containing (lat, lng)"""
+    lng_bits, lat_bits = _bit_counts(precision)
+    x = int((lng + 180.0) / 360.0 * (1 << lng_bits))
+    y = int((lat + 90.0) / 180.0 * (1 << lat_bits))
+    x = min(max(x, 0), (1 << lng_bits) - 1)
+    y = min(max(y, 0), (1 << lat_bits) - 1)
+    return x, y
+
+
+def xy_to_geohash(x, y, precision):
+    lng_bits, lat_bits = _bit_counts(precision)
+    bits = 0
+    # Geohash interleaves bits starting with longitude
+    for i in range(precision * 5):
+        if i % 2 == 0:
+            lng_bits -= 1
+            bit = (x >> lng_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (y >> lat_bits) & 1
+        bits = (bits << 1) | bit
+
+    chars = []
+    for _ in range(precision):
+        chars.append(BASE32[bits & 31])
+        bits >>= 5
+    return ''.join(reversed(chars))
+
+
+def geohash_to_xy(geohash):
+    precision = len(geohash)
+    lng_bits, lat_bits = _bit_counts(precision)
+    x = y = 0
+    position = 0
+    for char in geohash:
+        value = BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if position % 2 == 0:
+                x = (x << 1) | bit
+            else:
+                y = (y << 1) | bit
+            position += 1
+    return x, y
+
+
+def encode(lat, lng, precision=STORED_PRECISION):
+    x, y = cell_xy(lat, lng, precision)
+    return xy_to_geohash(x, y, precision)
+
+
+def decode(geohash):
+    """Return the (lat, lng) centre of a geohash cell"""
+    precision = len(geohash)
+    lng_bits, lat_bits = _bit_counts(precision)
+    x, y = geohash_to_xy(geohash)
+    lng = (x + 0.5) * 360.0 / (1 << lng_bits) - 180.0
+    lat = (y + 0.5) * 180.0 / (1 << lat_bits) - 90.0
+    return lat, lng
+
+
+def cell_size_km(lat, precision):
+    """Return (width_km, height_km) of a cell at the given latitude"""
+    lng_bits, lat_bits = _bit_counts(precision)
+    width = 360.0 / (1 << lng_bits) * KM_PER_DEGREE * math.cos(math.radians(lat))
+    height = 180.0 / (1 << lat_bits) * KM_PER_DEGREE
+    return width, height
+
+
+def ring(x, y, radius, precision):
+    """
+    Return the geohashes of the cells exactly `radius` steps away from (x, y)
+    (Chebyshev distance). Longitude wraps around, latitude is clamped.
+    """
+    lng_bits, lat_bits = _bit_counts(precision)
+    x_cells = 1 << lng_bits
+    y_cells = 1 << lat_bits
+
+    if radius == 0:
+        return [xy_to_geohash(x, y, precision)]
+
+    coords = []
+    for dx in range(-radius, radius + 1):
+        coords.append((dx, -radius))
+        coords.append((dx, radius))
+    for dy in range(-radius + 1, radius):
+        coords.append((-radius, dy))
+        coords.append((radius, dy))
+
+    cells = set()
+    for dx, dy in coords:
+        cy = y + dy
+        if cy < 0 or cy >= y_cells:
+            continue
+        cells.add(xy_to_geohash((x + dx) % x_cells, cy, precision))
+    return sorted(cells)
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+from accounts import geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    users = CustomUser.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for user in users.iterator():
+        user.geohash = geohash.encode(user.latitude, user.longitude)
+        user.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_customuser_last_password_change_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, help_text='Geohash cell of latitude/longitude, kept in sync on save', max_length=12, null=True),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_customuser_geohash'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['user_type', 'created_at'], name='accounts_cu_user_ty_01fbe5_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from .managers import CustomUserManager
 from django.utils import timezone
+from . import geohash
 
 class CustomUser(AbstractUser):
     USER_TYPES = [
@@ -60,6 +61,8 @@ class CustomUser(AbstractUser):
     location = models.CharField(max_length=255, blank=True, null=True)
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, null=True, db_index=True,
+                               help_text="Geohash cell of latitude/longitude, kept in sync on save")
     
     # Personal information
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, default='male')
@@ -84,6 +87,11 @@ class CustomUser(AbstractUser):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['user_type', 'created_at']),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -101,8 +109,19 @@ class CustomUser(AbstractUser):
         if self.user_type == 'agent' and not self.responder_type:
             raise ValidationError({'responder_type': 'Responder type is required for agent users.'})
 
+    def update_geohash(self):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash.encode(float(self.latitude), float(self.longitude))
+        else:
+            self.geohash = None
+
     def save(self, *args, **kwargs):
         self.clean()
+        self.update_geohash()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
 
         if self.pk:
             old_user = CustomUser.objects.get(pk=self.pk)
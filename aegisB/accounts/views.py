@@ -12,6 +12,7 @@ from django.db import models
 from .models import CustomUser
 from .serializers import PasswordChangeSerializer, ResponderSerializer, UserSerializer, LoginSerializer, UserProfileSerializer,ProfilePictureSerializer
 from . import serializers
+from aegis.pagination import paginate_list
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -147,7 +148,7 @@ def check_auth_status(request):
 @permission_classes([IsAuthenticated])
 def get_responders(request):
 
-    responders = CustomUser.objects.filter(user_type='agent').order_by('-last_active')
+    responders = CustomUser.objects.filter(user_type='agent')
     
     # Apply filters
     status_filter = request.GET.get('status', 'all')
@@ -167,8 +168,9 @@ def get_responders(request):
             models.Q(badge_number__icontains=search_term)
         )
     
-    serializer = ResponderSerializer(responders, many=True)
-    return Response(serializer.data)
+    # Keyset pages on created_at: last_active changes constantly, which would
+    # shuffle rows between pages while a client is walking them
+    return paginate_list(request, responders, '-created_at', ResponderSerializer)
 
 # @api_view(['PATCH'])
 # @permission_classes([IsAuthenticated])
@@ -0,0 +1,135 @@
+"""
+Responder latency analytics from EmergencyResponse timestamps.
+
+The database computes each response's intervals (notified -> accepted,
+accepted -> arrived, notified -> arrived) over the requested time window and
+returns only those numbers; the distributions (mean, p50/p90/p99) are taken
+with NumPy, since SQLite has no percentile aggregate. Reports for a window
+are cached in time buckets of RESPONSE_ANALYTICS_CACHE_SECONDS, so every
+dashboard load after the first in a bucket is a cache hit and figures are
+never older than one bucket.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.utils import timezone
+
+from .models import EmergencyResponse
+
+RESPONSE_ANALYTICS_WINDOW_DAYS = getattr(settings, 'RESPONSE_ANALYTICS_WINDOW_DAYS', 30)
+RESPONSE_ANALYTICS_CACHE_SECONDS = getattr(settings, 'RESPONSE_ANALYTICS_CACHE_SECONDS', 300)
+
+# Interval name -> (start, end) timestamp fields
+METRICS = {
+    'notify_to_accept': ('notified_at', 'accepted_at'),
+    'accept_to_arrive': ('accepted_at', 'arrived_at'),
+    'total': ('notified_at', 'arrived_at'),
+}
+PERCENTILES = (50, 90, 99)
+
+
+def _intervals():
+    return {
+        name: ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+        for name, (start, end) in METRICS.items()
+    }
+
+
+def _seconds(values):
+    return np.array([np.nan if value is None else value.total_seconds() for value in values], dtype=np.float64)
+
+
+def distribution(seconds):
+    """count, mean and percentiles (in seconds) of the non-missing values"""
+    seconds = seconds[~np.isnan(seconds)]
+    # Negative intervals come from device clock skew and are not latencies
+    seconds = seconds[seconds >= 0]
+    if not len(seconds):
+        return {'count': 0, 'mean': None, **{f'p{q}': None for q in PERCENTILES}}
+    values = np.percentile(seconds, PERCENTILES)
+    return {
+        'count': int(len(seconds)),
+        'mean': round(float(seconds.mean()), 1),
+        **{f'p{q}': round(float(value), 1) for q, value in zip(PERCENTILES, values)},
+    }
+
+
+def _columns(rows, offset=0):
+    if not rows:
+        return {name: np.empty(0) for name in METRICS}
+    columns = list(zip(*rows))
+    return {name: _seconds(columns[offset + i]) for i, name in enumerate(METRICS)}
+
+
+def report(queryset, by_responder=False):
+    """
+    Latency distributions for the responses in `queryset`, overall and
+    optionally per responder, in one query.
+    """
+    fields = ['responder_id', 'responder__full_name'] if by_responder else []
+    rows = list(queryset.annotate(**_intervals()).values_list(*fields, *METRICS))
+
+    columns = _columns(rows, offset=len(fields))
+    result = {
+        'responses': len(rows),
+        'metrics': {name: distribution(values) for name, values in columns.items()},
+    }
+    if by_responder:
+        responder_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        names = {row[0]: row[1] for row in rows}
+        result['responders'] = []
+        for responder_id in np.unique(responder_ids):
+            mask = responder_ids == responder_id
+            result['responders'].append({
+                'responder_id': int(responder_id),
+                'full_name': names[int(responder_id)],
+                'responses': int(mask.sum()),
+                'metrics': {name: distribution(values[mask]) for name, values in columns.items()},
+            })
+    return result
+
+
+def window(days=RESPONSE_ANALYTICS_WINDOW_DAYS, **filters):
+    """EmergencyResponse rows notified within the last `days` days"""
+    since = timezone.now() - timedelta(days=days)
+    return EmergencyResponse.objects.filter(notified_at__gte=since, **filters)
+
+
+def cached_report(scope, days, queryset, by_responder=False):
+    """`report`, cached per scope and window until the current time bucket ends"""
+    bucket = int(time.time() // RESPONSE_ANALYTICS_CACHE_SECONDS)
+    key = f'aegis:response-times:{scope}:{days}:{int(by_responder)}:{bucket}'
+    result = cache.get(key)
+    if result is None:
+        result = report(queryset, by_responder)
+        result['window_days'] = days
+        cache.set(key, result, RESPONSE_ANALYTICS_CACHE_SECONDS)
+    return result
+
+
+def for_victim(user, days=RESPONSE_ANALYTICS_WINDOW_DAYS):
+    """How quickly responders reached the user's own alerts"""
+    return cached_report(f'user:{user.id}', days, window(days, alert__user=user))
+
+
+def for_responder(responder, days=RESPONSE_ANALYTICS_WINDOW_DAYS):
+    return cached_report(f'responder:{responder.id}', days, window(days, responder=responder))
+
+
+def for_controller(days=RESPONSE_ANALYTICS_WINDOW_DAYS):
+    return cached_report('all', days, window(days), by_responder=True)
+
+
+def for_alert(alert):
+    """Per-alert latencies; small enough not to need caching"""
+    return report(EmergencyResponse.objects.filter(alert=alert), by_responder=True)
+
+
+def average_minutes(result):
+    """Mean notified -> arrived time in minutes, or None without data"""
+    mean = result['metrics']['total']['mean']
+    return round(mean / 60, 1) if mean is not None else None
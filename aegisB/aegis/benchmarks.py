@@ -0,0 +1,484 @@
+"""
+Benchmark suites, run with `python manage.py benchmark <suite>`.
+
+Suites that touch the database run against a throwaway test database created
+by the management command, so they never write to the development database.
+"""
+import contextlib
+import io
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts import geohash
+
+from . import crypto, gazetteer, local_routing, location_ingest, risk
+from .distance import eta_minutes, haversine_km, top_k
+from .geo import calculate_distance, calculate_eta_based_on_distance, nearest_responders
+from .models import (
+    AlertEvent, BackgroundJob, EmergencyAlert, EmergencyContact, EmergencyNotification, EmergencyResponse,
+    LocationUpdate
+)
+
+User = get_user_model()
+
+SUITES = {}
+
+# Rough bounding box of Bangladesh
+BD_LAT = (20.6, 26.6)
+BD_LNG = (88.0, 92.7)
+
+
+def suite(name, needs_db=True, processes=False):
+    """
+    Register a suite. Suites with processes=True fork worker processes, so
+    their test database is a file the workers can open rather than in memory.
+    """
+    def register(func):
+        func.needs_db = needs_db
+        func.processes = processes
+        SUITES[name] = func
+        return func
+    return register
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def random_point(rng):
+    return rng.uniform(*BD_LAT), rng.uniform(*BD_LNG)
+
+
+def seed_agents(count, rng, batch_size=5000):
+    User.objects.filter(user_type='agent').delete()
+    types = ['police', 'medical', 'ngo', 'volunteer']
+    batch = []
+    for i in range(count):
+        lat, lng = random_point(rng)
+        batch.append(User(
+            email=f'bench-agent-{i}@example.com',
+            full_name=f'Bench Agent {i}',
+            user_type='agent',
+            agent_id=f'BENCH{i}',
+            responder_type=types[i % len(types)],
+            status='available',
+            latitude=lat,
+            longitude=lng,
+            geohash=geohash.encode(lat, lng),
+        ))
+        if len(batch) >= batch_size:
+            User.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        User.objects.bulk_create(batch)
+
+
+def linear_nearest(lat, lng, k):
+    """The pre-index approach: load every available agent and sort by distance"""
+    responders = User.objects.filter(
+        user_type='agent', status='available',
+        latitude__isnull=False, longitude__isnull=False,
+    )
+    ranked = sorted(
+        ((responder, calculate_distance(lat, lng, responder.latitude, responder.longitude))
+         for responder in responders),
+        key=lambda pair: pair[1],
+    )
+    return ranked[:k]
+
+
+@suite('nearest-responders')
+def nearest_responders_suite(out, sizes=(100, 1000, 10000, 100000), repeat=50):
+    rng = random.Random(42)
+    out.write(f"{'agents':>8} {'index p50 ms':>13} {'index p99 ms':>13} {'scan p50 ms':>12}")
+    for size in sizes:
+        seed_agents(size, rng)
+        points = [random_point(rng) for _ in range(repeat)]
+        point_iter = iter(points * 2)
+
+        indexed = timed(lambda: nearest_responders(*next(point_iter), 3), repeat)
+        scan_repeat = max(1, min(repeat, 200000 // max(size, 1)))
+        scan_points = iter(points)
+        scan = timed(lambda: linear_nearest(*next(scan_points), 3), scan_repeat)
+
+        out.write(
+            f"{size:>8} {percentile(indexed, 50) * 1000:>13.2f} "
+            f"{percentile(indexed, 99) * 1000:>13.2f} {percentile(scan, 50) * 1000:>12.2f}"
+        )
+
+
+@suite('haversine', needs_db=False)
+def haversine_suite(out, sizes=(10000,), repeat=50):
+    """Batched distance + ETA + top-k against the scalar per-responder loop"""
+    rng = random.Random(42)
+    types = ['police', 'medical', 'ngo', 'volunteer']
+    out.write(f"{'points':>8} {'numpy p50 ms':>13} {'numpy p99 ms':>13} {'scalar p50 ms':>14}")
+    for size in sizes:
+        points = [random_point(rng) for _ in range(size)]
+        lats = [lat for lat, _ in points]
+        lngs = [lng for _, lng in points]
+        responder_types = [types[i % len(types)] for i in range(size)]
+        origin = random_point(rng)
+
+        def batched():
+            distances = haversine_km(*origin, lats, lngs)
+            eta_minutes(distances, responder_types)
+            top_k(distances, 3)
+
+        def scalar():
+            ranked = []
+            for (lat, lng), responder_type in zip(points, responder_types):
+                distance = calculate_distance(*origin, lat, lng)
+                ranked.append((distance, calculate_eta_based_on_distance(distance, responder_type)))
+            ranked.sort()
+
+        fast = timed(batched, repeat)
+        slow = timed(scalar, max(1, repeat // 5))
+        out.write(
+            f"{size:>8} {percentile(fast, 50) * 1000:>13.2f} "
+            f"{percentile(fast, 99) * 1000:>13.2f} {percentile(slow, 50) * 1000:>14.2f}"
+        )
+
+
+
+@suite('gazetteer', needs_db=False)
+def gazetteer_suite(out, sizes=(1000, 10000, 100000), repeat=200):
+    """Grid-indexed reverse geocoding against a scan of every place"""
+    rng = random.Random(42)
+    out.write(f"{'places':>8} {'index p50 us':>13} {'index p99 us':>13} {'scan p50 us':>12}")
+    for size in sizes:
+        places = [(f'Place {i}', *random_point(rng)) for i in range(size)]
+        index = gazetteer.GazetteerIndex.from_places(places)
+        lats, lngs = index.points[:, 0], index.points[:, 1]
+        points = iter([random_point(rng) for _ in range(repeat)] * 2)
+
+        indexed = timed(lambda: index.nearest(*next(points)), repeat)
+        scan = timed(lambda: top_k(haversine_km(*next(points), lats, lngs), 1), repeat)
+        out.write(
+            f"{size:>8} {percentile(indexed, 50) * 1e6:>13.1f} "
+            f"{percentile(indexed, 99) * 1e6:>13.1f} {percentile(scan, 50) * 1e6:>12.1f}"
+        )
+
+
+def sample_city(side, rng, spacing=0.0009, origin=(23.70, 90.35)):
+    """
+    Ways of a side x side street grid about 100 m apart: an arterial every
+    tenth street, alternate one-way avenues and a few missing blocks
+    """
+    ways = []
+    for row in range(side):
+        lat = origin[0] + row * spacing
+        tags = {'highway': 'primary' if row % 10 == 0 else 'residential'}
+        ways.append(([(lat, origin[1] + col * spacing) for col in range(side)], tags))
+    for col in range(side):
+        lng = origin[1] + col * spacing
+        tags = {'highway': 'secondary' if col % 10 == 0 else 'residential', 'oneway': 'yes' if col % 2 else 'no'}
+        rows = [row for row in range(side) if row % 10 == 0 or col % 10 == 0 or rng.random() > 0.05]
+        for start, stop in zip(rows, rows[1:]):
+            if stop == start + 1:
+                ways.append(([(origin[0] + start * spacing, lng), (origin[0] + stop * spacing, lng)], tags))
+    return ways
+
+
+@suite('routing', needs_db=False)
+def routing_suite(out, sizes=(50, 100, 200), repeat=30, hazards=5):
+    """Local A* routes across a sample city grid with emergency hazards to steer round"""
+    rng = random.Random(42)
+    out.write(f"{'nodes':>8} {'edges':>8} {'route p50 ms':>13} {'route p99 ms':>13} {'snap p50 us':>12}")
+    for side in sizes:
+        graph = local_routing.RoadGraph.from_ways(sample_city(side, rng))
+        lats, lngs = graph.points[:, 0], graph.points[:, 1]
+
+        def point():
+            return [rng.uniform(lngs.min(), lngs.max()), rng.uniform(lats.min(), lats.max())]
+
+        trips = iter([(point(), point(), [point()[::-1] for _ in range(hazards)]) for _ in range(repeat)])
+        routes = timed(lambda: graph.route(*next(trips)), repeat)
+        snap_points = iter([point() for _ in range(repeat)])
+        snaps = timed(lambda: graph.snap(*next(snap_points)[::-1]), repeat)
+        out.write(
+            f"{graph.meta['nodes']:>8} {graph.meta['edges']:>8} {percentile(routes, 50) * 1000:>13.2f} "
+            f"{percentile(routes, 99) * 1000:>13.2f} {percentile(snaps, 50) * 1e6:>12.1f}"
+        )
+
+
+@suite('risk', needs_db=False)
+def risk_suite(out, sizes=(1000, 10000, 100000, 1000000), repeat=100):
+    """Route scoring and heatmap tiles against the risk surface, by number of incidents"""
+    rng = random.Random(42)
+    out.write(f"{'incidents':>10} {'deposit ms':>11} {'score p50 us':>13} {'score p99 us':>13} {'tile p50 ms':>12}")
+    now = time.time()
+    for size in sizes:
+        surface = risk.RiskSurface.empty(now=now)
+        points = [random_point(rng) for _ in range(size)]
+        start = time.perf_counter()
+        surface.deposit(
+            [lat for lat, _ in points], [lng for _, lng in points],
+            [1.0] * size, [now - rng.uniform(0, 90 * 86400) for _ in range(size)],
+        )
+        deposit = time.perf_counter() - start
+
+        def route():
+            # A wandering ~15 km polyline of 150 points
+            lat, lng = random_point(rng)
+            path = []
+            for _ in range(150):
+                lat += rng.uniform(-0.001, 0.001)
+                lng += rng.uniform(0, 0.001)
+                path.append([lng, lat])
+            return path
+
+        routes = iter([route() for _ in range(repeat)])
+        scores = timed(lambda: surface.score(next(routes), now), repeat)
+        tiles = timed(lambda: surface.tile(12, 3075 + rng.randrange(4), 1755 + rng.randrange(4), now=now), 10)
+        out.write(
+            f"{size:>10} {deposit * 1000:>11.1f} {percentile(scores, 50) * 1e6:>13.1f} "
+            f"{percentile(scores, 99) * 1e6:>13.1f} {percentile(tiles, 50) * 1000:>12.2f}"
+        )
+
+def seed_alerts(count, responders_per_alert, rng):
+    """Active alerts, each with its own responders assigned"""
+    User.objects.all().delete()
+    cache.clear()
+    alerts = []
+    for i in range(count):
+        lat, lng = random_point(rng)
+        victim = User.objects.create(email=f'bench-victim-{i}@example.com', full_name=f'Victim {i}')
+        alert = EmergencyAlert.objects.create(user=victim, initial_latitude=round(lat, 6), initial_longitude=round(lng, 6))
+        for j in range(responders_per_alert):
+            responder = User.objects.create(
+                email=f'bench-agent-{i}-{j}@example.com', full_name=f'Agent {i}-{j}',
+                user_type='agent', agent_id=f'BENCH{i}-{j}', responder_type='police', status='busy',
+            )
+            EmergencyResponse.objects.create(alert=alert, responder=responder)
+        alerts.append(alert)
+    return alerts
+
+
+def gps_tracks(alerts, seconds, rng):
+    """
+    One sample per second per alert. Half the victims walk (1.4 m/s), half are
+    in a vehicle (12 m/s); every fix has a few meters of GPS noise.
+    """
+    for alert in alerts:
+        lat, lng = float(alert.initial_latitude), float(alert.initial_longitude)
+        speed = 1.4 if alert.pk % 2 else 12.0
+        bearing = rng.uniform(0, 2 * math.pi)
+        for second in range(seconds):
+            lat += speed * math.cos(bearing) / 111320
+            lng += speed * math.sin(bearing) / (111320 * math.cos(math.radians(lat)))
+            noise = rng.gauss(0, 3) / 111320
+            yield alert, second, {'latitude': round(lat + noise, 6), 'longitude': round(lng + noise, 6), 'accuracy': 5.0}
+
+
+def row_counts():
+    return {
+        'location': LocationUpdate.objects.count(),
+        'notification': EmergencyNotification.objects.count(),
+        'event': AlertEvent.objects.count(),
+    }
+
+
+def run_workers(jobs, workers):
+    """
+    Run each worker's jobs in its own forked process, all at once, and return
+    the wall time. Every process opens its own database connection.
+    """
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=run_jobs, args=(jobs[worker],)) for worker in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    if any(process.exitcode for process in processes):
+        raise RuntimeError('A benchmark worker failed')
+    return elapsed
+
+
+def run_jobs(jobs):
+    for func, args, kwargs in jobs:
+        func(*args, **kwargs)
+    connections.close_all()
+
+
+@suite('location-ingest', processes=True)
+def location_ingest_suite(out, sizes=(20,), repeat=120, responders=5, workers=(1, 4)):
+    """
+    Rows written for `repeat` seconds of 1 Hz GPS from `size` alerts, sent
+    live one sample at a time (coalesced into the hot slot) versus uploaded as
+    one buffered batch per alert, spread over worker processes the way a load
+    balancer would: live samples round-robin, each batch to one worker. The
+    configured shared cache is compared with a per-process memory cache;
+    `stale` counts alerts whose latest location, read back afterwards, is not
+    their newest sample.
+    """
+    per_process = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    out.write(
+        f"{'alerts':>7} {'workers':>8} {'cache':>7} {'mode':>10} {'samples':>8} {'locations':>10} "
+        f"{'notifs':>7} {'events':>7} {'rows/sample':>12} {'ms/sample':>10} {'stale':>6}"
+    )
+    for size in sizes:
+        for worker_count in workers:
+            for cache_name, caches in (('shared', None), ('local', per_process)):
+                if worker_count == 1 and caches:
+                    continue
+                for mode in ('live', 'batched'):
+                    settings_override = override_settings(CACHES=caches) if caches else contextlib.nullcontext()
+                    with settings_override:
+                        rng = random.Random(42)
+                        alerts = seed_alerts(size, responders, rng)
+                        start_time = timezone.now()
+                        tracks = {}
+                        for alert, second, data in gps_tracks(alerts, repeat, rng):
+                            tracks.setdefault(alert, []).append(
+                                {**data, 'timestamp': start_time + timedelta(seconds=second)}
+                            )
+                        samples = sum(len(points) for points in tracks.values())
+
+                        jobs = [[] for _ in range(worker_count)]
+                        for index, (alert, points) in enumerate(tracks.items()):
+                            if mode == 'live':
+                                for second, point in enumerate(points):
+                                    jobs[second % worker_count].append(
+                                        (location_ingest.ingest, (alert, point), {'now': point['timestamp']})
+                                    )
+                            else:
+                                jobs[index % worker_count].append((location_ingest.ingest_batch, (alert, points), {}))
+                        # Live samples arrive in time order across all alerts
+                        for worker_jobs in jobs:
+                            worker_jobs.sort(key=lambda job: job[2].get('now') or job[1][1][0]['timestamp'])
+
+                        before = row_counts()
+                        elapsed = run_workers(jobs, worker_count)
+                        after = row_counts()
+
+                        stale = sum(
+                            1 for alert, points in tracks.items()
+                            if (location_ingest.latest_location(alert) or {}).get('timestamp')
+                            != points[-1]['timestamp'].isoformat()
+                        )
+                    written = {name: after[name] - before[name] for name in after}
+                    total = sum(written.values())
+                    out.write(
+                        f"{size:>7} {worker_count:>8} {cache_name:>7} {mode:>10} {samples:>8} "
+                        f"{written['location']:>10} {written['notification']:>7} {written['event']:>7} "
+                        f"{total / samples:>12.2f} {elapsed / samples * 1000:>10.2f} {stale:>6}"
+                    )
+
+
+@suite('activation')
+def activation_suite(out, sizes=(10,), repeat=100):
+    """
+    activate_emergency latency for a user with `size` emergency contacts and
+    `size` nearby responders: fan-out run inside the request (the previous
+    behaviour) versus queued as background jobs.
+    """
+    out.write(f"{'size':>5} {'fan-out':>8} {'p50 ms':>8} {'p99 ms':>8} {'jobs':>6}")
+    lat, lng = 23.8103, 90.4125
+    for size in sizes:
+        User.objects.all().delete()
+        victim = User.objects.create(email='bench-victim@example.com', full_name='Victim')
+        EmergencyContact.objects.bulk_create([
+            EmergencyContact(user=victim, name=f'Contact {i}', phone=f'+8801700{i:06d}')
+            for i in range(size)
+        ])
+        for i in range(size):
+            User.objects.create(
+                email=f'bench-agent-{i}@example.com', full_name=f'Agent {i}', user_type='agent',
+                agent_id=f'BENCH{i}', responder_type='police', status='available',
+                latitude=lat + i * 0.001, longitude=lng + i * 0.001,
+            )
+        client = APIClient()
+        client.force_authenticate(victim)
+        payload = {'activation_method': 'button', 'is_silent': True, 'latitude': lat, 'longitude': lng}
+
+        for mode, backend in (('inline', 'immediate'), ('queued', 'database')):
+            BackgroundJob.objects.all().delete()
+
+            def activate():
+                response = client.post(reverse('activate-emergency'), payload, format='json')
+                assert response.status_code == 201, response.data
+
+            # SMS sending is stubbed with print()
+            with override_settings(TASK_BACKEND=backend), contextlib.redirect_stdout(io.StringIO()):
+                samples = timed(activate, repeat)
+            out.write(
+                f"{size:>5} {mode:>8} {percentile(samples, 50) * 1000:>8.2f} "
+                f"{percentile(samples, 99) * 1000:>8.2f} {BackgroundJob.objects.count():>6}"
+            )
+
+
+@suite('media-encryption', needs_db=False)
+def media_encryption_suite(out, sizes=(100,), repeat=200, range_size=64 * 1024):
+    """
+    Saving and reading a `size` MB video through the encrypted storage against
+    plain FileSystemStorage: write and sequential read throughput, and the
+    latency of `repeat` random Range-sized reads
+    """
+    rng = random.Random(42)
+    out.write(f"{'MB':>5} {'storage':>10} {'write MB/s':>11} {'read MB/s':>10} {'range p50 ms':>13} {'range p99 ms':>13}")
+    with tempfile.TemporaryDirectory() as root:
+        storages = {
+            'plain': FileSystemStorage(location=os.path.join(root, 'plain')),
+            'encrypted': crypto.EncryptedFileSystemStorage(location=os.path.join(root, 'encrypted')),
+        }
+        for size in sizes:
+            source = os.path.join(root, 'source.mp4')
+            with open(source, 'wb') as f:
+                for _ in range(size):
+                    f.write(os.urandom(1024 * 1024))
+
+            for label, storage in storages.items():
+                start = time.perf_counter()
+                with open(source, 'rb') as f:
+                    name = storage.save('video.mp4', File(f, 'video.mp4'))
+                write_seconds = time.perf_counter() - start
+
+                start = time.perf_counter()
+                with storage.open(name) as f:
+                    while f.read(crypto.SEGMENT_SIZE):
+                        pass
+                read_seconds = time.perf_counter() - start
+
+                offsets = iter([rng.randrange(size * 1024 * 1024 - range_size) for _ in range(repeat)])
+                with storage.open(name) as f:
+                    def range_read():
+                        f.seek(next(offsets))
+                        f.read(range_size)
+
+                    samples = timed(range_read, repeat)
+                storage.delete(name)
+
+                out.write(
+                    f"{size:>5} {label:>10} {size / write_seconds:>11.1f} {size / read_seconds:>10.1f} "
+                    f"{percentile(samples, 50) * 1000:>13.3f} {percentile(samples, 99) * 1000:>13.3f}"
+                )
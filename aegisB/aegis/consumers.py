@@ -1,48 +1,127 @@
-# aegis/consumers.py 
+# aegis/consumers.py
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.db.models import Q
+from django.utils import timezone
 from .models import EmergencyAlert
+from .events import alert_group, user_group
+
+# Close codes sent when a connection is refused
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_FORBIDDEN = 4403
+
+CHAT_MESSAGE = 'chat.message'
+CHAT_MAX_LENGTH = 1000
+
 
 class EmergencyConsumer(AsyncWebsocketConsumer):
+    """
+    Live updates for one emergency: ws/emergency/<alert_id>/
+    Open to the victim, responders assigned to the alert, controllers and admins.
+    """
     async def connect(self):
         self.alert_id = self.scope['url_route']['kwargs']['alert_id']
-        self.room_group_name = f'emergency_{self.alert_id}'
-        
+        self.room_group_name = alert_group(self.alert_id)
+
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+        if not await self.can_access_alert(user):
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
-        
+
         await self.accept()
-        
+
     async def disconnect(self, close_code):
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-    
-    # Receive message from WebSocket
+
+    @database_sync_to_async
+    def can_access_alert(self, user):
+        alerts = EmergencyAlert.objects.filter(alert_id=self.alert_id)
+        if user.user_type not in ['controller', 'admin']:
+            alerts = alerts.filter(Q(user=user) | Q(responses__responder=user))
+        return alerts.exists()
+
+    # Receive message from WebSocket. Text chat between the people on the alert
+    # is all a client may send; typed events only ever come from the server.
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
-        
-        # Send message to room group
+        try:
+            message = json.loads(text_data).get('message')
+        except (ValueError, AttributeError):
+            message = None
+        if not isinstance(message, str) or not message.strip() or len(message) > CHAT_MAX_LENGTH:
+            await self.send(text_data=json.dumps({
+                'error': f'Only text messages of up to {CHAT_MAX_LENGTH} characters can be sent'
+            }))
+            return
+
+        user = self.scope['user']
+        # Send message to room group, stamped with who sent it
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'emergency_update',
-                'message': message
+                'message': message,
+                'sender': {'id': user.id, 'name': user.full_name, 'user_type': user.user_type},
+                'sent_at': timezone.now().isoformat(),
             }
         )
-    
+
     # Receive message from room group
     async def emergency_update(self, event):
-        message = event['message']
-        
         # Send message to WebSocket
         await self.send(text_data=json.dumps({
-            'message': message
-        }))
\ No newline at end of file
+            'type': CHAT_MESSAGE,
+            'alert_id': self.alert_id,
+            'message': event['message'],
+            'sender': event['sender'],
+            'sent_at': event['sent_at'],
+        }))
+
+    # Typed events published by the REST views (see aegis/events.py)
+    async def emergency_event(self, event):
+        await self.send(text_data=json.dumps(serialize_event(event)))
+
+
+class UserConsumer(AsyncWebsocketConsumer):
+    """
+    Personal event stream for the authenticated user: ws/notifications/
+    Receives events for every alert the user is involved in.
+    """
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def emergency_event(self, event):
+        await self.send(text_data=json.dumps(serialize_event(event)))
+
+
+def serialize_event(event):
+    return {
+        'type': event['event'],
+        'alert_id': event['alert_id'],
+        'data': event['data'],
+        'sent_at': event['sent_at'],
+    }
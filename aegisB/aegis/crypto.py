@@ -0,0 +1,240 @@
+"""
+At-rest encryption of evidence files with segmented AES-256-GCM.
+
+Every file gets its own random data key. The data key is stored in the file
+header, wrapped (AES-GCM encrypted) with the master key MEDIA_ENCRYPTION_KEY.
+The body is a series of independently sealed segments, each SEGMENT_SIZE
+bytes of plaintext plus a 16 byte tag:
+
+    magic | segment size | master key id | wrap nonce | wrapped data key | nonce prefix
+    segment 0 | segment 1 | ... | last segment
+
+A segment's nonce is the file's random nonce prefix, the segment number and
+a last-segment flag. Segments therefore can't be reordered, and a file can't
+be truncated at a segment boundary, without failing authentication. Reading
+at any offset decrypts only the segment that holds it, so Range requests
+stay cheap.
+
+EncryptedFileSystemStorage encrypts while saving and decrypts on open. path()
+still names the ciphertext on disk. Anything handing files to an external
+tool or to the web server must go through local_path() or is_encrypted().
+Files written before encryption was enabled are read as they are.
+
+Master keys are 32 bytes, urlsafe base64 encoded. Retired keys listed in
+MEDIA_ENCRYPTION_OLD_KEYS can still unwrap the files written under them.
+Without MEDIA_ENCRYPTION_KEY nothing is encrypted or decrypted: reads and
+writes raise ImproperlyConfigured.
+"""
+import base64
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+from contextlib import contextmanager
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+SEGMENT_SIZE = getattr(settings, 'MEDIA_ENCRYPTION_SEGMENT_SIZE', 256 * 1024)
+
+MAGIC = b'AEG1'
+KEY_SIZE = 32
+TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 7
+# magic, segment size, master key id, wrap nonce, wrapped data key, nonce prefix
+HEADER = struct.Struct(f'>4sI8s12s{KEY_SIZE + TAG_SIZE}s{NONCE_PREFIX_SIZE}s')
+
+
+class DecryptionError(OSError):
+    """A file that is damaged, tampered with or under an unknown master key"""
+
+
+def decode_key(text):
+    key = base64.urlsafe_b64decode(text)
+    if len(key) != KEY_SIZE:
+        raise ValueError(f'Media encryption keys must be {KEY_SIZE} bytes')
+    return key
+
+
+def master_keys():
+    """{key id: key}, the current MEDIA_ENCRYPTION_KEY first"""
+    current = getattr(settings, 'MEDIA_ENCRYPTION_KEY', None)
+    if not current:
+        raise ImproperlyConfigured('MEDIA_ENCRYPTION_KEY is not set; refusing to store or read evidence')
+    keys = [decode_key(current)]
+    keys += [decode_key(text) for text in getattr(settings, 'MEDIA_ENCRYPTION_OLD_KEYS', [])]
+    return {hashlib.sha256(key).digest()[:8]: key for key in keys}
+
+
+def key_id():
+    """Hex id of the master key new files are wrapped with"""
+    return next(iter(master_keys())).hex()
+
+
+def segment_nonce(prefix, index, last):
+    return prefix + struct.pack('>IB', index, last)
+
+
+def encrypt_chunks(chunks, segment_size=None):
+    """Encrypt an iterable of plaintext byte strings; yields the file header, then each sealed segment"""
+    segment_size = segment_size or SEGMENT_SIZE
+    master_id, master = next(iter(master_keys().items()))
+    data_key = AESGCM.generate_key(bit_length=KEY_SIZE * 8)
+    wrap_nonce = os.urandom(12)
+    prefix = os.urandom(NONCE_PREFIX_SIZE)
+    wrapped = AESGCM(master).encrypt(wrap_nonce, data_key, MAGIC + master_id)
+    yield HEADER.pack(MAGIC, segment_size, master_id, wrap_nonce, wrapped, prefix)
+
+    aead = AESGCM(data_key)
+    buffer = bytearray()
+    index = 0
+    for chunk in chunks:
+        buffer += chunk
+        # Hold back the last full segment until we know whether more follows
+        while len(buffer) > segment_size:
+            yield aead.encrypt(segment_nonce(prefix, index, False), bytes(buffer[:segment_size]), None)
+            del buffer[:segment_size]
+            index += 1
+    yield aead.encrypt(segment_nonce(prefix, index, True), bytes(buffer), None)
+
+
+class DecryptingFile(io.RawIOBase):
+    """Seekable plaintext view of an encrypted file, decrypting one segment at a time"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        try:
+            magic, self.segment_size, master_id, wrap_nonce, wrapped, self.prefix = HEADER.unpack(
+                raw.read(HEADER.size)
+            )
+        except struct.error:
+            raise DecryptionError('Encrypted file header is truncated')
+        master = master_keys().get(master_id)
+        if magic != MAGIC or master is None:
+            raise DecryptionError(f'File is not encrypted under a known master key ({master_id.hex()})')
+        try:
+            self.aead = AESGCM(AESGCM(master).decrypt(wrap_nonce, wrapped, MAGIC + master_id))
+        except InvalidTag:
+            raise DecryptionError('Data key failed authentication')
+
+        body = raw.seek(0, io.SEEK_END) - HEADER.size
+        self.sealed_size = self.segment_size + TAG_SIZE
+        self.segments = max(1, -(-body // self.sealed_size))
+        self.size = body - self.segments * TAG_SIZE
+        if self.size < 0:
+            raise DecryptionError('Encrypted file is truncated')
+        self.position = 0
+        self.cached = (None, b'')
+
+    def segment(self, index):
+        if self.cached[0] != index:
+            self.raw.seek(HEADER.size + index * self.sealed_size)
+            sealed = self.raw.read(self.sealed_size)
+            try:
+                plaintext = self.aead.decrypt(segment_nonce(self.prefix, index, index == self.segments - 1), sealed, None)
+            except InvalidTag:
+                raise DecryptionError(f'Segment {index} failed authentication')
+            self.cached = (index, plaintext)
+        return self.cached[1]
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        count = 0
+        while count < len(view) and self.position < self.size:
+            index, offset = divmod(self.position, self.segment_size)
+            data = self.segment(index)[offset:offset + len(view) - count]
+            view[count:count + len(data)] = data
+            count += len(data)
+            self.position += len(data)
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError('Negative seek position')
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+        super().close()
+
+
+class EncryptedContent(File):
+    """Uploaded content as FileSystemStorage._save should write it: encrypted"""
+
+    def chunks(self, chunk_size=None):
+        return encrypt_chunks(self.file.chunks(SEGMENT_SIZE))
+
+
+class EncryptedFileSystemStorage(FileSystemStorage):
+    def _save(self, name, content):
+        # Hides temporary_file_path(), so even a finished upload is copied through the cipher
+        return super()._save(name, EncryptedContent(content, name))
+
+    def _open(self, name, mode='rb'):
+        if 'b' not in mode or any(flag in mode for flag in 'wa+'):
+            raise ValueError('Encrypted files can only be opened for binary reading')
+        raw = open(self.path(name), 'rb')
+        if raw.read(len(MAGIC)) != MAGIC:
+            # Written before encryption was enabled
+            raw.seek(0)
+            return File(raw)
+        raw.seek(0)
+        try:
+            return File(DecryptingFile(raw), name)
+        except Exception:
+            raw.close()
+            raise
+
+    def size(self, name):
+        with self.open(name) as f:
+            return f.seek(0, io.SEEK_END)
+
+
+storage = EncryptedFileSystemStorage()
+
+
+def encrypted_storage():
+    """Storage for FileFields holding evidence that must be encrypted at rest"""
+    return storage
+
+
+def is_encrypted(field):
+    return isinstance(field.storage, EncryptedFileSystemStorage)
+
+
+@contextmanager
+def local_path(field):
+    """
+    A path to the plaintext of a stored file, for external tools like ffmpeg:
+    the file itself, or a decrypted temporary copy deleted on exit. Raises
+    NotImplementedError for storage without local files.
+    """
+    if not is_encrypted(field):
+        yield field.path
+        return
+    with field.storage.open(field.name, 'rb') as source, \
+            tempfile.NamedTemporaryFile(suffix=os.path.splitext(field.name)[1]) as copy:
+        shutil.copyfileobj(source, copy, SEGMENT_SIZE)
+        copy.flush()
+        yield copy.name
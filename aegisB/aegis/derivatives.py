@@ -0,0 +1,206 @@
+"""
+Thumbnails and previews of evidence media, so review screens load kilobytes
+instead of whole recordings.
+
+- photos: a THUMBNAIL_SIZE thumbnail and a PREVIEW_SIZE downscaled copy
+- videos: a poster frame thumbnail and a SHEET_COLUMNS x SHEET_ROWS contact
+  sheet of frames spread through the video
+- audio and documents: nothing
+
+Derivatives are stored next to the original in the same storage, e.g.
+video_evidence/2026/10/16/clip.mp4 gets clip.thumb.webp and
+clip.preview.webp. Their names are kept in the model's `thumbnail` and
+`preview` fields.
+
+They are made by the `generate_derivatives` job. The job is queued when a
+file is saved (see aegis/signals.py), so an upload never waits for it.
+Video frames come from the ffmpeg binary bundled with imageio-ffmpeg. ffmpeg
+seeks to each timestamp, so a long recording is never decoded end to end.
+Encrypted videos are decrypted to a temporary copy for ffmpeg first.
+"""
+import io
+import logging
+import mimetypes
+import os
+import subprocess
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import crypto, media_probe, tasks
+from .models import EmergencyReportEvidence, IncidentMedia, MediaCapture, VideoEvidence
+
+logger = logging.getLogger(__name__)
+
+# 'WEBP' or 'JPEG'
+DERIVATIVE_FORMAT = getattr(settings, 'DERIVATIVE_FORMAT', 'WEBP')
+DERIVATIVE_QUALITY = getattr(settings, 'DERIVATIVE_QUALITY', 80)
+THUMBNAIL_SIZE = 320
+PREVIEW_SIZE = 1280
+SHEET_COLUMNS = 3
+SHEET_ROWS = 3
+SHEET_GAP = 4
+FRAME_TIMEOUT = getattr(settings, 'FRAME_TIMEOUT', 30)
+
+# Model -> name of its original file field
+SOURCES = {
+    VideoEvidence: 'video_file',
+    MediaCapture: 'file',
+    IncidentMedia: 'file',
+    EmergencyReportEvidence: 'file',
+}
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def source_file(instance):
+    return getattr(instance, SOURCES[type(instance)])
+
+
+def media_kind(instance):
+    """'image', 'video' or None for files that get no derivatives"""
+    if isinstance(instance, VideoEvidence):
+        return 'video'
+    mime = mimetypes.guess_type(source_file(instance).name)[0] or getattr(instance, 'mime_type', '')
+    kind = mime.split('/')[0] if mime else None
+    return kind if kind in ('image', 'video') else None
+
+
+def needs_derivatives(instance):
+    return bool(source_file(instance)) and not instance.thumbnail and media_kind(instance) is not None
+
+
+def downscale(image, size):
+    image = image.copy()
+    image.thumbnail((size, size))
+    return image
+
+
+def image_derivatives(field):
+    """(thumbnail, preview) of a photo"""
+    with field.storage.open(field.name, 'rb') as f:
+        image = Image.open(f)
+        # Only decode at a fraction of full size when the format allows it
+        image.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    return downscale(image, THUMBNAIL_SIZE), downscale(image, PREVIEW_SIZE)
+
+
+def grab_frame(path, seconds, width):
+    """One frame `seconds` into a video, at most `width` pixels wide, or None"""
+    import imageio_ffmpeg
+
+    try:
+        result = subprocess.run([
+            imageio_ffmpeg.get_ffmpeg_exe(), '-v', 'error', '-ss', f'{seconds:.3f}', '-i', path,
+            '-frames:v', '1', '-vf', f"scale=w='min({width},iw)':h=-2", '-f', 'image2pipe', '-c:v', 'png', '-',
+        ], capture_output=True, timeout=FRAME_TIMEOUT, check=True)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logger.info(f"Could not read a frame of {path} at {seconds:.1f}s: {str(e)}")
+        return None
+    if not result.stdout:
+        return None
+    return Image.open(io.BytesIO(result.stdout)).convert('RGB')
+
+
+def video_duration(instance, field, path):
+    """Length of a video in seconds, 0 if unknown"""
+    probed = media_probe.FIELDS.get(type(instance).__name__)
+    if probed and getattr(instance, probed[1]):
+        return getattr(instance, probed[1])
+    with field.storage.open(field.name, 'rb') as f:
+        info = media_probe.probe_file(f)
+    if info is None:
+        try:
+            info = media_probe.probe_external(path)
+        except (subprocess.SubprocessError, ValueError, OSError) as e:
+            logger.info(f"Could not probe {field.name}: {str(e)}")
+            return 0
+    return info.duration or 0
+
+
+def video_derivatives(instance, field):
+    """(poster frame thumbnail, contact sheet) of a video, or None without any frames"""
+    with crypto.local_path(field) as path:
+        duration = video_duration(instance, field, path)
+        # Without a length there is nowhere to seek to but the start
+        count = SHEET_COLUMNS * SHEET_ROWS if duration else 1
+        frames = [
+            frame for frame in (
+                grab_frame(path, duration * (i + 0.5) / count, THUMBNAIL_SIZE) for i in range(count)
+            ) if frame is not None
+        ]
+    if not frames:
+        return None
+
+    width, height = frames[0].size
+    columns = min(SHEET_COLUMNS, len(frames))
+    rows = -(-len(frames) // columns)
+    sheet = Image.new('RGB', (
+        columns * width + (columns - 1) * SHEET_GAP, rows * height + (rows - 1) * SHEET_GAP
+    ))
+    for i, frame in enumerate(frames):
+        sheet.paste(frame, ((i % columns) * (width + SHEET_GAP), (i // columns) * (height + SHEET_GAP)))
+    return downscale(frames[0], THUMBNAIL_SIZE), sheet
+
+
+def save_image(field, suffix, image):
+    """Store `image` next to the original; returns its storage name"""
+    output = io.BytesIO()
+    image.save(output, DERIVATIVE_FORMAT, quality=DERIVATIVE_QUALITY)
+    name = f'{os.path.splitext(field.name)[0]}.{suffix}.{EXTENSIONS[DERIVATIVE_FORMAT]}'
+    if field.storage.exists(name):
+        field.storage.delete(name)
+    return field.storage.save(name, ContentFile(output.getvalue()))
+
+
+def generate(instance):
+    """Make and record the thumbnail and preview of an instance; returns whether it has them"""
+    if not needs_derivatives(instance):
+        return bool(instance.thumbnail)
+    field = source_file(instance)
+    try:
+        if media_kind(instance) == 'image':
+            images = image_derivatives(field)
+        else:
+            images = video_derivatives(instance, field)
+    except NotImplementedError:
+        # ffmpeg needs a local file; remote storage would need a download first
+        logger.info(f"Skipping derivatives of {field.name}: storage has no local path")
+        return False
+    except (UnidentifiedImageError, OSError) as e:
+        logger.info(f"Could not make derivatives of {field.name}: {str(e)}")
+        return False
+    if images is None:
+        return False
+
+    thumbnail, preview = images
+    changes = {'thumbnail': save_image(field, 'thumb', thumbnail), 'preview': save_image(field, 'preview', preview)}
+    # update() keeps this out of the save signals that queued us
+    type(instance).objects.filter(pk=instance.pk).update(**changes)
+    for name, value in changes.items():
+        setattr(instance, name, value)
+    return True
+
+
+def schedule(instance):
+    """Queue generate_derivatives for a just-saved instance that has none yet"""
+    if needs_derivatives(instance):
+        model = type(instance).__name__
+        tasks.enqueue(generate_derivatives, model, instance.pk,
+                      idempotency_key=f'derivatives:{model}:{instance.pk}:{source_file(instance).name}')
+
+
+def delete_files(instance):
+    for field in (instance.thumbnail, instance.preview):
+        if field:
+            field.delete(save=False)
+
+
+@tasks.task(max_attempts=2)
+def generate_derivatives(model, pk):
+    instance = apps.get_model('aegis', model).objects.filter(pk=pk).first()
+    if instance is not None and generate(instance):
+        logger.info(f"Derivatives ready for {model} {pk}")
@@ -0,0 +1,60 @@
+"""
+Real-time event publishing over the channel layer.
+
+Views call `publish()` while handling a request; the event is sent to the
+WebSocket groups only once the surrounding transaction commits, so clients
+never hear about rows that were rolled back.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Event types pushed to clients
+LOCATION_UPDATED = 'location.updated'
+MEDIA_UPLOADED = 'media.uploaded'
+RESPONSE_STATUS_CHANGED = 'response.status_changed'
+RESPONDER_ASSIGNED = 'responder.assigned'
+ALERT_CANCELLED = 'alert.cancelled'
+
+
+def alert_group(alert_id):
+    return f'emergency_{alert_id}'
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def publish(event_type, alert, data, user_ids=()):
+    """
+    Send a typed event to the alert's group and to each user's personal group
+    after the current transaction commits.
+    """
+    message = {
+        'type': 'emergency.event',
+        'event': event_type,
+        'alert_id': alert.alert_id,
+        'data': data,
+        'sent_at': timezone.now().isoformat(),
+    }
+    groups = [alert_group(alert.alert_id)]
+    groups.extend(user_group(user_id) for user_id in dict.fromkeys(user_ids))
+    transaction.on_commit(lambda: _send(groups, message))
+
+
+def _send(groups, message):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    for group in groups:
+        try:
+            async_to_sync(channel_layer.group_send)(group, message)
+        except Exception as e:
+            # Push is best effort, clients can still catch up by polling
+            logger.error(f"Failed to publish {message['event']} to {group}: {str(e)}")
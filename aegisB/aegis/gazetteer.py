@@ -0,0 +1,258 @@
+"""
+Offline reverse geocoding from a gazetteer of named places.
+
+Places come from a CSV (name, latitude, longitude and optional district and
+division columns, or a ready-made label column) or a GeoJSON file of Point
+features. They are bucketed into a uniform lat/lng grid stored CSR-style:
+points sorted by cell, plus an offsets array where cell i holds points
+offsets[i]:offsets[i + 1]. A lookup scans rings of cells outward from the
+query point and stops as soon as no unscanned cell can hold anything closer,
+so it touches a handful of points regardless of the gazetteer size.
+
+`python manage.py build_gazetteer` writes the index to GAZETTEER_PATH as
+plain .npy files that are memory-mapped on load, so startup does not parse
+anything and the pages are shared between worker processes. Without a built
+index the places in GAZETTEER_SOURCE (the bundled district list by default)
+are indexed in memory on first use.
+"""
+import csv
+import json
+import math
+import os
+import shutil
+import threading
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+
+from .distance import EARTH_RADIUS_KM
+from .geo import calculate_distance
+
+GAZETTEER_SOURCE = os.path.join(os.path.dirname(__file__), 'data', 'bd_places.csv')
+# Grid cell size; 0.05 degrees is about 5.5 km
+GAZETTEER_CELL_DEGREES = 0.05
+# Nothing further away than this counts as a match
+GAZETTEER_MAX_DISTANCE_KM = getattr(settings, 'GAZETTEER_MAX_DISTANCE_KM', 25)
+# Closer than this the place name is a usable address
+GAZETTEER_NEAR_KM = getattr(settings, 'GAZETTEER_NEAR_KM', 1)
+
+INDEX_VERSION = 1
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+
+Place = namedtuple('Place', 'label latitude longitude distance_km')
+
+
+def read_places(path):
+    """(label, lat, lng) tuples from a CSV or GeoJSON gazetteer file"""
+    if path.endswith(('.json', '.geojson')):
+        with open(path, encoding='utf-8') as source:
+            features = json.load(source).get('features', [])
+        places = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            properties = feature.get('properties') or {}
+            lng, lat = geometry['coordinates'][:2]
+            places.append((place_label(properties), float(lat), float(lng)))
+        return places
+
+    with open(path, newline='', encoding='utf-8') as source:
+        return [
+            (place_label(row), float(row.get('latitude') or row['lat']), float(row.get('longitude') or row['lng']))
+            for row in csv.DictReader(source)
+        ]
+
+
+def place_label(properties):
+    if properties.get('label'):
+        return properties['label']
+    parts = [properties.get(key) for key in ('name', 'district', 'division')]
+    # "Gulshan, Dhaka" rather than "Gulshan, Dhaka, Dhaka"
+    return ', '.join(dict.fromkeys(part.strip() for part in parts if part and part.strip()))
+
+
+class GazetteerIndex:
+    def __init__(self, meta, points, offsets, label_offsets, labels):
+        self.meta = meta
+        # Plain ndarray views of memory-mapped arrays index much faster than np.memmap
+        self.points = np.asarray(points)
+        self.offsets = np.asarray(offsets)
+        self.label_offsets = np.asarray(label_offsets)
+        self.labels = np.asarray(labels)
+        self.cell = meta['cell_degrees']
+        self.lat0 = meta['lat0']
+        self.lng0 = meta['lng0']
+        self.rows = meta['rows']
+        self.cols = meta['cols']
+        # Smallest east-west cell width over the grid, for the stopping bound
+        widest_lat = max(abs(self.lat0), abs(self.lat0 + self.rows * self.cell))
+        self.cell_km = self.cell * KM_PER_DEGREE * math.cos(math.radians(min(widest_lat, 89)))
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def from_places(cls, places, cell_degrees=GAZETTEER_CELL_DEGREES):
+        if not places:
+            raise ValueError('Gazetteer has no places')
+        lats = np.array([lat for _, lat, _ in places], dtype=np.float64)
+        lngs = np.array([lng for _, _, lng in places], dtype=np.float64)
+        lat0 = math.floor(lats.min() / cell_degrees) * cell_degrees
+        lng0 = math.floor(lngs.min() / cell_degrees) * cell_degrees
+        rows = int((lats.max() - lat0) // cell_degrees) + 1
+        cols = int((lngs.max() - lng0) // cell_degrees) + 1
+
+        cells = ((lats - lat0) // cell_degrees).astype(np.int64) * cols + ((lngs - lng0) // cell_degrees).astype(np.int64)
+        order = np.argsort(cells, kind='stable')
+        offsets = np.searchsorted(cells[order], np.arange(rows * cols + 1)).astype(np.int64)
+
+        encoded = [places[i][0].encode('utf-8') for i in order]
+        label_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        label_offsets[1:] = np.cumsum([len(label) for label in encoded])
+
+        meta = {
+            'version': INDEX_VERSION,
+            'count': len(places),
+            'cell_degrees': cell_degrees,
+            'lat0': lat0,
+            'lng0': lng0,
+            'rows': rows,
+            'cols': cols,
+        }
+        points = np.column_stack([lats[order], lngs[order]])
+        labels = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return cls(meta, points, offsets, label_offsets, labels)
+
+    def save(self, path):
+        """Write the index as a directory of .npy files, replacing any existing one"""
+        staging = path.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, 'points.npy'), self.points)
+        np.save(os.path.join(staging, 'offsets.npy'), self.offsets)
+        np.save(os.path.join(staging, 'label_offsets.npy'), self.label_offsets)
+        np.save(os.path.join(staging, 'labels.npy'), self.labels)
+        with open(os.path.join(staging, 'meta.json'), 'w') as output:
+            json.dump(self.meta, output)
+        # Processes that mapped the old files keep reading them until they reload
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(staging, path)
+        with _indexes_lock:
+            _indexes.pop(path, None)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as source:
+            meta = json.load(source)
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f'Unsupported gazetteer index version {meta.get("version")}')
+        arrays = [
+            np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in ('points', 'offsets', 'label_offsets', 'labels')
+        ]
+        return cls(meta, *arrays)
+
+    def label(self, i):
+        return bytes(self.labels[self.label_offsets[i]:self.label_offsets[i + 1]]).decode('utf-8')
+
+    def ring_ranges(self, row, col, ring):
+        """(start, stop) point ranges of the cells `ring` steps from (row, col)"""
+        first_col, last_col = max(col - ring, 0), min(col + ring, self.cols - 1)
+        if first_col > last_col:
+            return []
+        ranges = []
+        for r in {row - ring, row + ring}:
+            if 0 <= r < self.rows:
+                # Cells of one row are contiguous, so a row segment is one range
+                ranges.append((self.offsets[r * self.cols + first_col], self.offsets[r * self.cols + last_col + 1]))
+        for r in range(max(row - ring + 1, 0), min(row + ring, self.rows)):
+            for c in {col - ring, col + ring}:
+                if 0 <= c < self.cols:
+                    ranges.append((self.offsets[r * self.cols + c], self.offsets[r * self.cols + c + 1]))
+        return ranges
+
+    def nearest(self, lat, lng, max_distance_km=GAZETTEER_MAX_DISTANCE_KM):
+        """The closest Place within max_distance_km of (lat, lng), or None"""
+        lat, lng = float(lat), float(lng)
+        row = math.floor((lat - self.lat0) / self.cell)
+        col = math.floor((lng - self.lng0) / self.cell)
+        # Rings before the grid starts hold nothing; rings past the radius never match
+        first_ring = max(0, -row, row - self.rows + 1, -col, col - self.cols + 1)
+        last_ring = first_ring + int(max_distance_km // self.cell_km) + 1
+
+        # Rank candidates on the equirectangular approximation, which is within
+        # a fraction of a percent of haversine at these distances and much
+        # cheaper on small arrays; only the winner gets the exact distance
+        lng_scale = math.cos(math.radians(lat))
+        best, best_distance = None, max_distance_km
+        for ring in range(first_ring, last_ring + 1):
+            ranges = [(start, stop) for start, stop in self.ring_ranges(row, col, ring) if stop > start]
+            if ranges:
+                candidates = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+                points = self.points[candidates]
+                squared = (points[:, 0] - lat) ** 2 + ((points[:, 1] - lng) * lng_scale) ** 2
+                closest = int(np.argmin(squared))
+                distance = math.sqrt(squared[closest]) * KM_PER_DEGREE
+                if distance <= best_distance:
+                    best, best_distance = int(candidates[closest]), distance
+            # Every cell further out is at least `ring` cells away
+            if ring * self.cell_km >= best_distance:
+                break
+
+        if best is None:
+            return None
+        place_lat, place_lng = float(self.points[best, 0]), float(self.points[best, 1])
+        return Place(self.label(best), place_lat, place_lng, calculate_distance(lat, lng, place_lat, place_lng))
+
+
+def build(source, output=None, cell_degrees=GAZETTEER_CELL_DEGREES):
+    index = GazetteerIndex.from_places(read_places(source), cell_degrees)
+    if output:
+        index.save(output)
+    return index
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The memory-mapped index at GAZETTEER_PATH, or one built in memory from
+    GAZETTEER_SOURCE, or None when neither is configured
+    """
+    path = getattr(settings, 'GAZETTEER_PATH', None)
+    if path and not os.path.exists(os.path.join(path, 'meta.json')):
+        path = None
+    source = None if path else getattr(settings, 'GAZETTEER_SOURCE', GAZETTEER_SOURCE)
+    key = path or source
+    if not key:
+        return None
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = GazetteerIndex.load(path) if path else build(source)
+        return _indexes[key]
+
+
+def describe(lat, lng, max_distance_km=GAZETTEER_MAX_DISTANCE_KM):
+    """
+    A human readable address for (lat, lng) from the gazetteer, or None: the
+    place name within GAZETTEER_NEAR_KM of it, else "N km from <place>". This
+    is the offline answer; callers that can reach a street-level geocoder pass
+    max_distance_km=GAZETTEER_NEAR_KM and only ask it when that finds nothing.
+    """
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        return None
+    index = get_index()
+    if index is None:
+        return None
+    place = index.nearest(lat, lng, max_distance_km)
+    if place is None:
+        return None
+    if place.distance_km < GAZETTEER_NEAR_KM:
+        return place.label
+    return f'{place.distance_km:.1f} km from {place.label}'
@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from accounts import geohash
+
+from .distance import coordinates, haversine_km, top_k
+
+User = get_user_model()
+
+# Finest cell precision searched first (precision 6 ~ 1.1km x 0.6km cells); the
+# search coarsens one level at a time down to precision 3 (~156km cells)
+RESPONDER_SEARCH_PRECISION = getattr(settings, 'RESPONDER_SEARCH_PRECISION', 6)
+RESPONDER_SEARCH_MIN_PRECISION = 3
+# Rings of cells searched around the point at each precision level
+RESPONDER_SEARCH_RINGS = 2
+# Responders further away than this are never returned
+RESPONDER_SEARCH_RADIUS_KM = getattr(settings, 'RESPONDER_SEARCH_RADIUS_KM', 50)
+
+# Sorts after every base32 character, so [cell, cell + '{') covers all geohashes under cell
+_PREFIX_UPPER_BOUND = '{'
+
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate distance between two coordinates in kilometers using Haversine formula
+    """
+    R = 6371  # Earth radius in kilometers
+
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+
+    a = (math.sin(dlat/2) * math.sin(dlat/2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon/2) * math.sin(dlon/2))
+
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    distance = R * c
+
+    return distance
+
+
+def calculate_eta_based_on_distance(distance_km, responder_type):
+
+    # Base speed in km/h based on responder type
+    base_speeds = {
+        'police': 60,    # km/h
+        'medical': 50,   # km/h
+        'ngo': 40,       # km/h
+        'volunteer': 30, # km/h
+    }
+
+    speed = base_speeds.get(responder_type, 40)  # Default 40 km/h
+
+    # Calculate time in hours, then convert to minutes
+    time_hours = distance_km / speed
+    eta_minutes = max(2, time_hours * 60)  # Minimum 2 minutes
+
+    return round(eta_minutes)
+
+
+def cells_filter(cells):
+    """Build an index-friendly filter matching users whose geohash falls in any of the cells"""
+    condition = Q()
+    for cell in cells:
+        condition |= Q(geohash__gte=cell, geohash__lt=cell + _PREFIX_UPPER_BOUND)
+    return condition
+
+
+def nearest_responders(lat, lng, k, responder_type=None, exclude_ids=None, max_radius_km=None):
+    """
+    Return up to k available agents nearest to (lat, lng) as (responder, distance_km)
+    pairs, closest first.
+
+    Searches the rings of geohash cells around the cell containing the point,
+    moving to coarser cells until k responders are found and no unsearched cell
+    can hold anyone closer, so the cost depends on k and the number of cells
+    visited, not on the number of agents.
+    """
+    if k <= 0:
+        return []
+
+    lat = float(lat)
+    lng = float(lng)
+    max_radius_km = RESPONDER_SEARCH_RADIUS_KM if max_radius_km is None else max_radius_km
+    queryset = User.objects.filter(user_type='agent', status='available', geohash__isnull=False)
+    if responder_type:
+        queryset = queryset.filter(responder_type=responder_type)
+    if exclude_ids:
+        queryset = queryset.exclude(id__in=exclude_ids)
+
+    responders = []
+    distances = np.empty(0)
+    seen = set()
+    for precision in range(RESPONDER_SEARCH_PRECISION, RESPONDER_SEARCH_MIN_PRECISION - 1, -1):
+        x, y = geohash.cell_xy(lat, lng, precision)
+        cells = []
+        for radius in range(RESPONDER_SEARCH_RINGS + 1):
+            cells.extend(geohash.ring(x, y, radius, precision))
+
+        batch = [
+            responder for responder in queryset.filter(cells_filter(cells))
+            if responder.id not in seen
+        ]
+        if batch:
+            seen.update(responder.id for responder in batch)
+            responders.extend(batch)
+            distances = np.concatenate([distances, haversine_km(lat, lng, *coordinates(batch))])
+
+        # Anything outside the rings searched so far is at least this far away
+        width_km, height_km = geohash.cell_size_km(lat, precision)
+        covered_km = RESPONDER_SEARCH_RINGS * min(width_km, height_km)
+
+        within = np.count_nonzero(distances <= max_radius_km)
+        if within >= k and np.partition(distances, k - 1)[k - 1] <= covered_km:
+            break
+        if covered_km >= max_radius_km:
+            break
+
+    return [
+        (responders[i], float(distances[i]))
+        for i in top_k(distances, k)
+        if distances[i] <= max_radius_km
+    ]
+
+
+def nearest_responders_anywhere(lat, lng, k, exclude_ids=None):
+    """
+    Up to k available agents with a location nearest to (lat, lng), at any
+    distance. Scans every such agent, so it is only the fallback for when
+    nearest_responders finds too few within its radius.
+    """
+    if k <= 0:
+        return []
+    queryset = User.objects.filter(
+        user_type='agent', status='available', latitude__isnull=False, longitude__isnull=False
+    )
+    if exclude_ids:
+        queryset = queryset.exclude(id__in=exclude_ids)
+    responders = list(queryset)
+    if not responders:
+        return []
+    distances = haversine_km(float(lat), float(lng), *coordinates(responders))
+    return [(responders[i], float(distances[i])) for i in top_k(distances, k)]
@@ -0,0 +1,323 @@
+"""
+Local routing over an imported road graph, for when OpenRouteService is slow,
+down or not configured.
+
+`python manage.py build_road_graph` reads an OSM XML extract (.osm) or a
+GeoJSON file of LineString roads and writes a directed graph in CSR form to
+ROUTING_GRAPH_PATH:
+
+- points.npy: (N, 2) node latitude/longitude, sorted by latitude
+- indptr.npy: node u's outgoing edges are indptr[u]:indptr[u + 1]
+- indices.npy, lengths.npy, seconds.npy: target node, length in meters and
+  free-flow travel time of each edge
+
+The arrays are memory-mapped on load. Routes are found with A* on travel time
+(straight-line distance at the top speed is the heuristic). Instead of cutting
+holes around recent emergencies, nodes within ROUTING_HAZARD_RADIUS_KM of one
+make the edges into them up to 1 + ROUTING_HAZARD_PENALTY times as costly,
+tapering off with distance, so a route only passes close by when there is no
+reasonable way round.
+
+`route` answers in the same GeoJSON shape as OpenRouteService directions, so
+callers can use either.
+"""
+import json
+import math
+import os
+import shutil
+import threading
+import xml.etree.ElementTree as ElementTree
+from heapq import heappop, heappush
+
+import numpy as np
+from django.conf import settings
+
+from .distance import EARTH_RADIUS_KM, haversine_km
+from .geo import calculate_distance
+
+# km/h by OSM highway tag
+HIGHWAY_SPEEDS = {
+    'motorway': 80, 'motorway_link': 50,
+    'trunk': 60, 'trunk_link': 40,
+    'primary': 40, 'primary_link': 30,
+    'secondary': 35, 'secondary_link': 25,
+    'tertiary': 30, 'tertiary_link': 25,
+    'unclassified': 25, 'residential': 20, 'living_street': 10,
+    'service': 15, 'road': 20,
+}
+DEFAULT_SPEED = 20
+ONEWAY_VALUES = {'yes', 'true', '1'}
+
+# Start and end points further than this from the graph are not routed locally
+ROUTING_MAX_SNAP_KM = getattr(settings, 'ROUTING_MAX_SNAP_KM', 2)
+ROUTING_HAZARD_RADIUS_KM = getattr(settings, 'ROUTING_HAZARD_RADIUS_KM', 0.5)
+ROUTING_HAZARD_PENALTY = getattr(settings, 'ROUTING_HAZARD_PENALTY', 4)
+
+GRAPH_VERSION = 1
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+ARRAYS = ('points', 'indptr', 'indices', 'lengths', 'seconds')
+
+
+def read_ways(path):
+    """([(lat, lng), ...], tags) for every road in an OSM XML or GeoJSON file"""
+    if path.endswith(('.json', '.geojson')):
+        with open(path, encoding='utf-8') as source:
+            features = json.load(source).get('features', [])
+        ways = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            lines = {'LineString': [geometry.get('coordinates')],
+                     'MultiLineString': geometry.get('coordinates')}.get(geometry.get('type'), [])
+            for line in lines:
+                ways.append(([(lat, lng) for lng, lat, *_ in line], feature.get('properties') or {}))
+        return ways
+
+    nodes = {}
+    ways = []
+    for _, element in ElementTree.iterparse(path):
+        if element.tag == 'node':
+            nodes[element.get('id')] = (float(element.get('lat')), float(element.get('lon')))
+        elif element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.findall('tag')}
+            if 'highway' in tags:
+                refs = [nd.get('ref') for nd in element.findall('nd')]
+                ways.append(([nodes[ref] for ref in refs if ref in nodes], tags))
+            element.clear()
+    return ways
+
+
+def segment_lengths(starts, ends):
+    """Haversine length in meters of each (lat, lng) start -> end segment"""
+    lat1, lat2 = np.radians(starts[:, 0]), np.radians(ends[:, 0])
+    dlng = np.radians(ends[:, 1] - starts[:, 1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return EARTH_RADIUS_KM * 1000 * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def way_speed(tags):
+    try:
+        return float(str(tags.get('maxspeed', '')).split()[0])
+    except (ValueError, IndexError):
+        return HIGHWAY_SPEEDS.get(tags.get('highway'), DEFAULT_SPEED)
+
+
+class RoadGraph:
+    def __init__(self, meta, points, indptr, indices, lengths, seconds):
+        self.meta = meta
+        # Plain ndarray views of memory-mapped arrays index much faster than np.memmap
+        self.points = np.asarray(points)
+        self.indptr = np.asarray(indptr)
+        self.indices = np.asarray(indices)
+        self.lengths = np.asarray(lengths)
+        self.seconds = np.asarray(seconds)
+        self.max_speed = meta['max_speed_kmh'] / 3.6
+
+    def __len__(self):
+        return len(self.points)
+
+    @classmethod
+    def from_ways(cls, ways):
+        """Build the graph from (points, tags) ways; shared coordinates join roads"""
+        node_ids = {}
+        edges = []
+        for points, tags in ways:
+            ids = [node_ids.setdefault((round(lat, 7), round(lng, 7)), len(node_ids)) for lat, lng in points]
+            oneway = str(tags.get('oneway', '')).lower()
+            if tags.get('junction') == 'roundabout' and not oneway:
+                oneway = 'yes'
+            speed = way_speed(tags)
+            for a, b in zip(ids, ids[1:]):
+                if a == b:
+                    continue
+                if oneway != '-1':
+                    edges.append((a, b, speed))
+                if oneway not in ONEWAY_VALUES:
+                    edges.append((b, a, speed))
+        if not edges:
+            raise ValueError('No roads found')
+        sources, targets, speeds = (np.array(column) for column in zip(*edges))
+
+        coordinates = np.array(list(node_ids), dtype=np.float64)
+        # Number nodes by latitude so snapping can binary search a latitude band
+        order = np.argsort(coordinates[:, 0], kind='stable')
+        renumber = np.empty(len(order), dtype=np.int64)
+        renumber[order] = np.arange(len(order))
+        points = coordinates[order]
+
+        edge_order = np.argsort(renumber[sources], kind='stable')
+        sources, targets = renumber[sources][edge_order], renumber[targets][edge_order]
+        speeds = speeds[edge_order].astype(np.float64)
+        lengths = segment_lengths(points[sources], points[targets])
+        indptr = np.searchsorted(sources, np.arange(len(points) + 1)).astype(np.int64)
+
+        meta = {
+            'version': GRAPH_VERSION,
+            'nodes': len(points),
+            'edges': len(targets),
+            'max_speed_kmh': float(speeds.max()),
+        }
+        return cls(meta, points, indptr, targets.astype(np.int32),
+                   lengths.astype(np.float32), (lengths / (speeds / 3.6)).astype(np.float32))
+
+    def save(self, path):
+        """Write the graph as a directory of .npy files, replacing any existing one"""
+        staging = path.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name in ARRAYS:
+            np.save(os.path.join(staging, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(staging, 'meta.json'), 'w') as output:
+            json.dump(self.meta, output)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(staging, path)
+        with _graphs_lock:
+            _graphs.pop(path, None)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as source:
+            meta = json.load(source)
+        if meta.get('version') != GRAPH_VERSION:
+            raise ValueError(f'Unsupported road graph version {meta.get("version")}')
+        return cls(meta, *(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS))
+
+    def nodes_within(self, lat, lng, radius_km):
+        """(node ids, distances in km) of the nodes within radius_km of (lat, lng)"""
+        band = radius_km / KM_PER_DEGREE
+        first, last = np.searchsorted(self.points[:, 0], [lat - band, lat + band])
+        if first == last:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = self.points[first:last]
+        distances = haversine_km(lat, lng, candidates[:, 0], candidates[:, 1])
+        within = np.flatnonzero(distances <= radius_km)
+        return within + first, distances[within]
+
+    def snap(self, lat, lng, max_distance_km=ROUTING_MAX_SNAP_KM):
+        """The node closest to (lat, lng), or None if none is within max_distance_km"""
+        nodes, distances = self.nodes_within(lat, lng, max_distance_km)
+        if not len(nodes):
+            return None
+        return int(nodes[np.argmin(distances)])
+
+    def hazard_penalties(self, hazards, radius_km=ROUTING_HAZARD_RADIUS_KM, penalty=ROUTING_HAZARD_PENALTY):
+        """{node: cost multiplier} for nodes near any of the (lat, lng) hazards"""
+        penalties = {}
+        for lat, lng in hazards:
+            nodes, distances = self.nodes_within(lat, lng, radius_km)
+            for node, factor in zip(nodes.tolist(), (1 + penalty * (1 - distances / radius_km)).tolist()):
+                penalties[node] = max(factor, penalties.get(node, 1.0))
+        return penalties
+
+    def search_arrays(self):
+        """
+        Memoryviews of the arrays A* touches per node. Reading one element
+        from a memoryview costs about what a list lookup does, several times
+        less than indexing the ndarray, and it reads the mapped pages in place
+        instead of copying the graph into every worker process.
+        """
+        return tuple(
+            memoryview(np.ascontiguousarray(array))
+            for array in (self.indptr, self.indices, self.seconds, self.points)
+        )
+
+    def shortest_path(self, source, target, penalties=None):
+        """Edge ids of the cheapest path from source to target, or None"""
+        penalties = penalties or {}
+        indptr, indices, seconds, points = self.search_arrays()
+        target_lat, target_lng = points[target, 0], points[target, 1]
+        lng_scale = math.cos(math.radians(target_lat))
+        # Seconds per degree at top speed; a slight underestimate keeps A* exact
+        scale = 0.99 * KM_PER_DEGREE * 1000 / self.max_speed
+
+        def heuristic(node):
+            return scale * math.hypot(points[node, 0] - target_lat, (points[node, 1] - target_lng) * lng_scale)
+
+        costs = {source: 0.0}
+        via = {}
+        heap = [(heuristic(source), 0.0, source)]
+        while heap:
+            _, cost, node = heappop(heap)
+            if node == target:
+                break
+            if cost > costs[node]:
+                continue
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[edge]
+                new_cost = cost + seconds[edge] * penalties.get(neighbor, 1.0)
+                if new_cost < costs.get(neighbor, math.inf):
+                    costs[neighbor] = new_cost
+                    via[neighbor] = (edge, node)
+                    heappush(heap, (new_cost + heuristic(neighbor), new_cost, neighbor))
+        else:
+            return None
+
+        edges = []
+        node = target
+        while node != source:
+            edge, node = via[node]
+            edges.append(edge)
+        edges.reverse()
+        return edges
+
+    def route(self, start, end, hazards=()):
+        """
+        Directions between two [lng, lat] points in OpenRouteService's GeoJSON
+        shape, steering clear of the (lat, lng) hazards. None when either point
+        is off the graph or they are not connected.
+        """
+        source = self.snap(start[1], start[0])
+        target = self.snap(end[1], end[0])
+        if source is None or target is None:
+            return None
+        edges = self.shortest_path(source, target, self.hazard_penalties(hazards))
+        if edges is None:
+            return None
+
+        nodes = [source] + self.indices[edges].tolist()
+        path = [[float(lng), float(lat)] for lat, lng in self.points[nodes]]
+        # Walk on and off the graph in straight lines
+        access = [
+            calculate_distance(start[1], start[0], path[0][1], path[0][0]),
+            calculate_distance(end[1], end[0], path[-1][1], path[-1][0]),
+        ]
+        coordinates = [list(start)] + path + [list(end)]
+        distance = float(self.lengths[edges].sum()) + sum(access) * 1000
+        duration = float(self.seconds[edges].sum()) + sum(access) / DEFAULT_SPEED * 3600
+        lngs = [lng for lng, _ in coordinates]
+        lats = [lat for _, lat in coordinates]
+        return {
+            'type': 'FeatureCollection',
+            'features': [{
+                'type': 'Feature',
+                'geometry': {'type': 'LineString', 'coordinates': coordinates},
+                'properties': {'summary': {'distance': distance, 'duration': duration}, 'engine': 'local'},
+                'bbox': [min(lngs), min(lats), max(lngs), max(lats)],
+            }],
+        }
+
+
+def build(source, output=None):
+    graph = RoadGraph.from_ways(read_ways(source))
+    if output:
+        graph.save(output)
+    return graph
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def get_graph():
+    """The memory-mapped graph at ROUTING_GRAPH_PATH, or None if there is none"""
+    path = getattr(settings, 'ROUTING_GRAPH_PATH', None)
+    if not path or not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    with _graphs_lock:
+        if path not in _graphs:
+            _graphs[path] = RoadGraph.load(path)
+        return _graphs[path]
+
+
+def preferred():
+    """Whether to try the local graph before OpenRouteService"""
+    return getattr(settings, 'ROUTING_BACKEND', 'openroute') == 'local'
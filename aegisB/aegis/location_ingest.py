@@ -0,0 +1,167 @@
+"""
+Coalesced ingestion of victim location samples.
+
+The latest sample for each alert lives in a "hot slot" in the shared cache
+(settings.CACHES), so every worker process sees the same one. A LocationUpdate
+row is only written when the victim has moved at least
+LOCATION_PERSIST_DISTANCE_M from the last stored position, or
+LOCATION_PERSIST_INTERVAL_S have passed since it was stored. Setting both to 0
+stores every sample. Samples of one alert may reach several workers at once;
+a short claim in the cache lets only one of them write the row.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import tracks
+from .geo import calculate_distance
+from .models import LocationUpdate
+from .signals import record_events
+
+LOCATION_PERSIST_DISTANCE_M = getattr(settings, 'LOCATION_PERSIST_DISTANCE_M', 15)
+LOCATION_PERSIST_INTERVAL_S = getattr(settings, 'LOCATION_PERSIST_INTERVAL_S', 10)
+
+# Hot slots outlive the persist interval by a wide margin, so an expired slot
+# only means the alert has gone quiet
+HOT_SLOT_TIMEOUT = 60 * 60
+
+SAMPLE_FIELDS = ['latitude', 'longitude', 'accuracy', 'speed', 'altitude', 'heading']
+
+
+# A worker that dies while holding a claim only blocks persisting this long
+CLAIM_TIMEOUT = 5
+
+
+def hot_slot_key(alert):
+    return f'aegis:location:{alert.alert_id}'
+
+
+def stored_key(alert):
+    """Where and when the last LocationUpdate row of the alert was written"""
+    return f'aegis:location:{alert.alert_id}:stored'
+
+
+def claim_key(alert):
+    return f'aegis:location:{alert.alert_id}:claim'
+
+
+def latest_location(alert):
+    """The most recent sample for the alert, persisted or not, or None"""
+    return cache.get(hot_slot_key(alert))
+
+
+def superseded(sample, timestamp):
+    """Whether a sample taken at timestamp replaces the hot slot's sample"""
+    return sample is None or datetime.fromisoformat(sample['timestamp']) <= timestamp
+
+
+def stored_state(sample):
+    return {
+        'persisted_at': datetime.fromisoformat(sample['timestamp']).timestamp(),
+        'persisted_latitude': sample['latitude'],
+        'persisted_longitude': sample['longitude'],
+    }
+
+
+def should_persist(stored, latitude, longitude, now):
+    if stored is None:
+        return True
+    elapsed = now.timestamp() - stored['persisted_at']
+    # A late sample from before the stored one adds nothing
+    if elapsed < 0:
+        return False
+    if elapsed >= LOCATION_PERSIST_INTERVAL_S:
+        return True
+    moved_m = calculate_distance(
+        stored['persisted_latitude'], stored['persisted_longitude'], latitude, longitude
+    ) * 1000
+    return moved_m >= LOCATION_PERSIST_DISTANCE_M
+
+
+def make_sample(data, timestamp):
+    sample = {field: data.get(field) for field in SAMPLE_FIELDS}
+    sample['latitude'] = float(data['latitude'])
+    sample['longitude'] = float(data['longitude'])
+    sample['timestamp'] = timestamp.isoformat()
+    return sample
+
+
+def ingest(alert, data, now=None):
+    """
+    Record a location sample for the alert. Returns (sample, location_update),
+    where location_update is None when the sample was only kept in the hot slot.
+    """
+    now = now or timezone.now()
+    sample = make_sample(data, now)
+    latitude = sample['latitude']
+    longitude = sample['longitude']
+
+    key, stored = hot_slot_key(alert), stored_key(alert)
+    slots = cache.get_many([key, stored])
+
+    location_update = None
+    if should_persist(slots.get(stored), latitude, longitude, now) \
+            and cache.add(claim_key(alert), True, CLAIM_TIMEOUT):
+        try:
+            # Another worker may have stored a row since the slots were read
+            if should_persist(cache.get(stored), latitude, longitude, now):
+                location_update = LocationUpdate.objects.create(
+                    alert=alert,
+                    timestamp=now,
+                    **{field: data.get(field) for field in SAMPLE_FIELDS}
+                )
+                cache.set(stored, stored_state(sample), HOT_SLOT_TIMEOUT)
+        finally:
+            cache.delete(claim_key(alert))
+
+    # Another worker may already have moved the hot slot to a later sample
+    if superseded(slots.get(key), now):
+        cache.set(key, sample, HOT_SLOT_TIMEOUT)
+    return sample, location_update
+
+
+def ingest_batch(alert, points):
+    """
+    Store a buffered track in one insert. Points may arrive out of order;
+    within the batch the last point for a timestamp wins, and timestamps the
+    alert already has, as rows or folded into track chunks, are skipped, so
+    re-sending a batch is harmless even after compaction.
+    Returns (created LocationUpdates, newest sample or None if it was not newer
+    than the hot slot).
+    """
+    by_timestamp = {}
+    for point in points:
+        by_timestamp[point['timestamp']] = point
+    if not by_timestamp:
+        return [], None
+    timestamps = sorted(by_timestamp)
+
+    with transaction.atomic():
+        existing = set(
+            LocationUpdate.objects.filter(
+                alert=alert, timestamp__gte=timestamps[0], timestamp__lte=timestamps[-1]
+            ).values_list('timestamp', flat=True)
+        )
+        compacted = tracks.compacted_times(alert, timestamps[0], timestamps[-1])
+        created = LocationUpdate.objects.bulk_create([
+            LocationUpdate(alert=alert, timestamp=timestamp, **{
+                field: by_timestamp[timestamp].get(field) for field in SAMPLE_FIELDS
+            })
+            for timestamp in timestamps
+            if timestamp not in existing and round(timestamp.timestamp() * 1000) not in compacted
+        ])
+        # bulk_create skips post_save, so record the sync events here
+        record_events('location', created)
+
+    # Move the hot slot forward if the batch ends after the last live sample
+    newest = timestamps[-1]
+    key = hot_slot_key(alert)
+    if not superseded(cache.get(key), newest):
+        return created, None
+
+    sample = make_sample(by_timestamp[newest], newest)
+    cache.set_many({key: sample, stored_key(alert): stored_state(sample)}, HOT_SLOT_TIMEOUT)
+    return created, sample
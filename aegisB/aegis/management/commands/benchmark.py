@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from aegis.benchmarks import SUITES
+
+
+class Command(BaseCommand):
+    help = 'Run a performance benchmark suite against a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(SUITES))
+        parser.add_argument('--sizes', type=str, default=None,
+                            help='Comma separated problem sizes, overriding the suite defaults')
+        parser.add_argument('--repeat', type=int, default=None,
+                            help='Iterations per measurement, overriding the suite default')
+
+    def handle(self, *args, **options):
+        suite = SUITES[options['suite']]
+        kwargs = {}
+        if options['sizes']:
+            kwargs['sizes'] = [int(size) for size in options['sizes'].split(',')]
+        if options['repeat']:
+            kwargs['repeat'] = options['repeat']
+
+        if not suite.needs_db:
+            suite(self.stdout, **kwargs)
+            return
+
+        old_name = connection.settings_dict['NAME']
+        if suite.processes and connection.vendor == 'sqlite':
+            # Worker processes cannot open an in-memory database
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+            connection.settings_dict['OPTIONS'].setdefault('transaction_mode', 'IMMEDIATE')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            suite(self.stdout, **kwargs)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
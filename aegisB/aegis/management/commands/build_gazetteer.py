@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from aegis import gazetteer
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped offline reverse geocoding index from a gazetteer file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default=gazetteer.GAZETTEER_SOURCE,
+                            help='CSV or GeoJSON file of named places (default: the bundled district list)')
+        parser.add_argument('--output', default=None,
+                            help='Index directory (default: GAZETTEER_PATH)')
+        parser.add_argument('--cell-degrees', type=float, default=gazetteer.GAZETTEER_CELL_DEGREES,
+                            help='Grid cell size in degrees (default 0.05)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'GAZETTEER_PATH', None)
+        if not output:
+            raise CommandError('Set GAZETTEER_PATH or pass --output')
+        try:
+            index = gazetteer.build(options['source'], output, options['cell_degrees'])
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not build gazetteer from {options["source"]}: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} places in {index.rows}x{index.cols} cells at {output}"
+        ))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from aegis.models import EmergencyAlert
+from aegis.tracks import compact_alert
+
+
+class Command(BaseCommand):
+    help = 'Fold old LocationUpdate rows into compressed LocationTrackChunk rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-minutes', type=int, default=60,
+                            help='Only compact points older than this (default 60)')
+        parser.add_argument('--alert', dest='alert_id', default=None,
+                            help='Only compact this alert (e.g. EMG-ABC12345)')
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(minutes=options['older_than_minutes'])
+        alerts = EmergencyAlert.objects.filter(location_updates__timestamp__lt=before).distinct()
+        if options['alert_id']:
+            alerts = alerts.filter(alert_id=options['alert_id'])
+
+        total = 0
+        for alert in alerts.iterator():
+            compacted = compact_alert(alert, before)
+            total += compacted
+            self.stdout.write(f'{alert.alert_id}: compacted {compacted} points')
+        self.stdout.write(self.style.SUCCESS(f'Compacted {total} points'))
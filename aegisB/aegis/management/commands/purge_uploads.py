@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from aegis.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete resumable uploads that were abandoned before finishing'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'Purged {purge_expired()} abandoned uploads'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from aegis.rollups import SOURCES_BY_NAME, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard StatsRollup buckets from their source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='*',
+                            help=f'Sources to rebuild (default: all of {", ".join(sorted(SOURCES_BY_NAME))})')
+
+    def handle(self, *args, **options):
+        unknown = set(options['sources']) - set(SOURCES_BY_NAME)
+        if unknown:
+            raise CommandError(f'Unknown sources: {", ".join(sorted(unknown))}')
+
+        results = rebuild(options['sources'] or None)
+        for name, buckets in results.items():
+            self.stdout.write(f'{name}: {buckets} buckets')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(results)} rollup sources'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from aegis import risk
+
+
+class Command(BaseCommand):
+    help = 'Add new incidents to the route risk surface, or rebuild it from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute from every incident instead of only the new ones')
+
+    def handle(self, *args, **options):
+        surface, added = risk.refresh(rebuild=options['rebuild'])
+        where = risk.surface_path() or 'memory'
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {added} incidents to the {surface.rows}x{surface.cols} risk surface in {where}"
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from aegis.tasks import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued BackgroundJob rows (TASK_BACKEND = "database")'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs that are due now, then exit')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty (default 1)')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
+            return
+
+        self.stdout.write('Waiting for jobs, press Ctrl+C to stop')
+        try:
+            while True:
+                if not run_pending():
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
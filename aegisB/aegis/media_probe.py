@@ -0,0 +1,356 @@
+"""
+Duration and resolution of uploaded media, without decoding it.
+
+`probe_file` reads container headers directly:
+
+- MP4 / MOV / 3GP: duration from moov/mvhd, size from the first video tkhd
+- WAV: data chunk size over the fmt byte rate
+- MP3: Xing/Info frame count, or the first frame's bitrate for CBR files
+- PNG, GIF, JPEG: image dimensions
+
+That only touches a few KB of the file, so it runs as soon as a
+VideoEvidence or MediaCapture is saved (see aegis/signals.py). Anything it
+cannot read (WebM, AVI, corrupt files) is queued as a `probe_media` job. The
+job runs ffprobe in a subprocess, or moviepy's ffmpeg reader when ffprobe is
+not installed. moviepy is only imported by that job.
+"""
+import json
+import logging
+import os
+import shutil
+import struct
+import subprocess
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+from . import crypto, rollups, tasks
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT = getattr(settings, 'PROBE_TIMEOUT', 30)
+
+MediaInfo = namedtuple('MediaInfo', 'duration width height')
+
+# Where each model keeps its file and what the probe fills in
+FIELDS = {
+    'VideoEvidence': ('video_file', 'duration_seconds', None),
+    'MediaCapture': ('file', 'duration', 'resolution'),
+}
+
+
+class ProbeError(Exception):
+    pass
+
+
+def _read(f, size):
+    data = f.read(size)
+    if len(data) < size:
+        raise ProbeError('Unexpected end of file')
+    return data
+
+
+def _file_size(f):
+    position = f.tell()
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(position)
+    return size
+
+
+# MP4 / QuickTime
+
+MP4_TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip', b'pnot'}
+
+
+def _mp4_boxes(f, end):
+    """(type, payload start, payload end) for each box up to `end`"""
+    position = f.tell()
+    while position + 8 <= end:
+        f.seek(position)
+        size, kind = struct.unpack('>I4s', _read(f, 8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', _read(f, 8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            raise ProbeError('Invalid MP4 box')
+        yield kind, position + header, min(position + size, end)
+        position += size
+
+
+def _mp4_child(f, start, end, kind):
+    f.seek(start)
+    for child, child_start, child_end in _mp4_boxes(f, end):
+        if child == kind:
+            return child_start, child_end
+    return None
+
+
+def probe_mp4(f, size):
+    moov = _mp4_child(f, 0, size, b'moov')
+    if moov is None:
+        raise ProbeError('No moov box')
+
+    mvhd = _mp4_child(f, *moov, b'mvhd')
+    if mvhd is None:
+        raise ProbeError('No mvhd box')
+    f.seek(mvhd[0])
+    if _read(f, 4)[0] == 1:
+        f.seek(16, os.SEEK_CUR)
+        timescale, duration = struct.unpack('>IQ', _read(f, 12))
+    else:
+        f.seek(8, os.SEEK_CUR)
+        timescale, duration = struct.unpack('>II', _read(f, 8))
+    if not timescale:
+        raise ProbeError('Invalid mvhd timescale')
+
+    width = height = None
+    f.seek(moov[0])
+    for kind, start, end in list(_mp4_boxes(f, moov[1])):
+        if kind != b'trak':
+            continue
+        tkhd = _mp4_child(f, start, end, b'tkhd')
+        if tkhd is None:
+            continue
+        f.seek(tkhd[0])
+        f.seek(84 if _read(f, 4)[0] == 1 else 72, os.SEEK_CUR)
+        track_width, track_height = struct.unpack('>II', _read(f, 8))
+        # 16.16 fixed point; audio tracks are 0 x 0
+        if track_width and track_height:
+            width, height = track_width >> 16, track_height >> 16
+            break
+    return MediaInfo(duration / timescale, width, height)
+
+
+# WAV
+
+def probe_wav(f, size):
+    f.seek(12)
+    byte_rate = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ProbeError('No data chunk')
+        kind, length = struct.unpack('<4sI', header)
+        if kind == b'fmt ':
+            byte_rate = struct.unpack('<HHII', _read(f, 12))[3]
+            f.seek(length - 12 + (length & 1), os.SEEK_CUR)
+        elif kind == b'data':
+            if not byte_rate:
+                raise ProbeError('No fmt chunk')
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF
+            if length in (0, 0xFFFFFFFF):
+                length = size - f.tell()
+            return MediaInfo(min(length, size - f.tell()) / byte_rate, None, None)
+        else:
+            f.seek(length + (length & 1), os.SEEK_CUR)
+
+
+# MP3
+
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+# version bits: 0 = MPEG 2.5, 2 = MPEG 2, 3 = MPEG 1
+MP3_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+
+
+def probe_mp3(f, size):
+    f.seek(0)
+    start = 0
+    header = _read(f, 10)
+    if header[:3] == b'ID3':
+        # Syncsafe size, plus a footer if flagged
+        start = 10 + (header[6] << 21 | header[7] << 14 | header[8] << 7 | header[9])
+        if header[5] & 0x10:
+            start += 10
+    f.seek(start)
+    frame = _read(f, 4)
+    if frame[0] != 0xFF or frame[1] & 0xE0 != 0xE0:
+        raise ProbeError('No MP3 frame header')
+
+    version = MP3_VERSIONS.get((frame[1] >> 3) & 3)
+    layer = 4 - ((frame[1] >> 1) & 3)
+    bitrate_index, rate_index = frame[2] >> 4, (frame[2] >> 2) & 3
+    if version is None or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        raise ProbeError('Unsupported MP3 frame header')
+    bitrate = MP3_BITRATES[(min(version, 2), layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    samples = 384 if layer == 1 else 1152 if layer == 2 or version == 1 else 576
+
+    # VBR files carry a frame count in a Xing/Info header after the side info
+    mono = frame[3] >> 6 == 3
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    f.seek(start + 4 + side_info)
+    xing = f.read(12)
+    if len(xing) == 12 and xing[:4] in (b'Xing', b'Info') and struct.unpack('>I', xing[4:8])[0] & 1:
+        frames = struct.unpack('>I', xing[8:12])[0]
+        return MediaInfo(frames * samples / sample_rate, None, None)
+    return MediaInfo((size - start) * 8 / bitrate, None, None)
+
+
+# Images
+
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def probe_png(f, size):
+    f.seek(16)
+    width, height = struct.unpack('>II', _read(f, 8))
+    return MediaInfo(None, width, height)
+
+
+def probe_gif(f, size):
+    f.seek(6)
+    width, height = struct.unpack('<HH', _read(f, 4))
+    return MediaInfo(None, width, height)
+
+
+def probe_jpeg(f, size):
+    f.seek(2)
+    while True:
+        marker = _read(f, 2)
+        if marker[0] != 0xFF:
+            raise ProbeError('Invalid JPEG marker')
+        kind = marker[1]
+        while kind == 0xFF:
+            kind = _read(f, 1)[0]
+        if kind in (0x01, 0xD8) or 0xD0 <= kind <= 0xD7:
+            continue
+        length = struct.unpack('>H', _read(f, 2))[0]
+        if kind in JPEG_SOF:
+            height, width = struct.unpack('>xHH', _read(f, 5))
+            return MediaInfo(None, width, height)
+        if kind == 0xD9 or length < 2:
+            raise ProbeError('No JPEG frame header')
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _parser(head):
+    if head[4:8] in MP4_TOP_LEVEL:
+        return probe_mp4
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return probe_wav
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return probe_mp3
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return probe_png
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return probe_gif
+    if head[:2] == b'\xff\xd8':
+        return probe_jpeg
+    return None
+
+
+def probe_file(f):
+    """MediaInfo for an open binary file, or None if the format is not one read here"""
+    f.seek(0)
+    parser = _parser(f.read(12))
+    if parser is None:
+        return None
+    try:
+        return parser(f, _file_size(f))
+    except (ProbeError, struct.error, ValueError, OSError) as e:
+        logger.info(f"Could not read media headers: {str(e)}")
+        return None
+
+
+def probe_external(path):
+    """MediaInfo from ffprobe, or from moviepy's ffmpeg reader when ffprobe is missing"""
+    ffprobe = getattr(settings, 'FFPROBE_PATH', None) or shutil.which('ffprobe')
+    if ffprobe:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+            capture_output=True, timeout=PROBE_TIMEOUT, check=True
+        )
+        info = json.loads(result.stdout)
+        video = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), {})
+        duration = info.get('format', {}).get('duration')
+        return MediaInfo(float(duration) if duration else None, video.get('width'), video.get('height'))
+
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    info = ffmpeg_parse_infos(path)
+    width, height = info.get('video_size') or (None, None)
+    return MediaInfo(info.get('duration') or None, width, height)
+
+
+def missing_fields(instance):
+    """The duration/resolution fields of a saved instance that a probe should fill"""
+    file_field, duration_field, resolution_field = FIELDS[type(instance).__name__]
+    if not getattr(instance, file_field):
+        return []
+    media_type = getattr(instance, 'media_type', 'video')
+    fields = []
+    if media_type != 'photo':
+        fields.append(duration_field)
+    if resolution_field and media_type != 'audio':
+        fields.append(resolution_field)
+    return [name for name in fields if not getattr(instance, name)]
+
+
+def apply(instance, info):
+    """Store what a probe found in the instance's empty fields; returns the changes"""
+    _, duration_field, resolution_field = FIELDS[type(instance).__name__]
+    found = {duration_field: int(info.duration) if info.duration is not None else None}
+    if resolution_field and info.width and info.height:
+        found[resolution_field] = f'{info.width}x{info.height}'
+    changes = {name: found[name] for name in missing_fields(instance) if found.get(name)}
+    if changes:
+        # update() keeps this out of the save signals that called us
+        type(instance).objects.filter(pk=instance.pk).update(**changes)
+        for name, value in changes.items():
+            setattr(instance, name, value)
+    return changes
+
+
+def probe_saved(instance):
+    """Fill duration/resolution of a just-saved instance from its headers, or queue probe_media"""
+    if not missing_fields(instance):
+        return
+    field = getattr(instance, FIELDS[type(instance).__name__][0])
+    info = None
+    try:
+        with field.storage.open(field.name, 'rb') as f:
+            info = probe_file(f)
+    except OSError as e:
+        logger.warning(f"Could not open {field.name} to probe: {str(e)}")
+    if info is None:
+        model = type(instance).__name__
+        tasks.enqueue(probe_media, model, instance.pk, idempotency_key=f'probe:{model}:{instance.pk}')
+        return
+    apply(instance, info)
+
+
+@tasks.task(max_attempts=2)
+def probe_media(model, pk):
+    instance = apps.get_model('aegis', model).objects.filter(pk=pk).first()
+    if instance is None or not missing_fields(instance):
+        return
+    field = getattr(instance, FIELDS[model][0])
+    try:
+        with crypto.local_path(field) as path:
+            info = probe_external(path)
+    except NotImplementedError:
+        # ffprobe needs a local file; remote storage would need a download first
+        logger.info(f"Skipping probe of {field.name}: storage has no local path")
+        return
+    source = rollups.SOURCES.get(type(instance))
+    with transaction.atomic():
+        previous = rollups.stored_contribution(type(instance), source, pk) if source else None
+        # apply() skips the save signals, so move the dashboard rollup here. A
+        # probe inside post_save needs no move: the rollup handler runs after
+        # it and sees the new values on the instance.
+        if apply(instance, info) and source:
+            rollups.move(previous, rollups.instance_contribution(source, instance))
+    logger.info(f"Probed {model} {pk}: {info}")
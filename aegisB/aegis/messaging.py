@@ -0,0 +1,343 @@
+"""
+Outbound SMS and email.
+
+Every message is an OutboundMessage row. `queue` renders a template once and
+stores one row per recipient; `deliver` sends queued rows through the
+configured provider for their channel, in batches of the provider's
+BATCH_SIZE, with batches dispatched concurrently on a thread pool and throttled
+by the provider's RATE_LIMIT (messages per second, per process). Each row
+ends up 'sent' (with the provider's message id) or 'failed' (with the error).
+
+MESSAGING configures one provider per channel, in the style of CACHES:
+
+    MESSAGING = {
+        'sms': {
+            'BACKEND': 'aegis.messaging.HTTPBackend',
+            'OPTIONS': {'url': 'https://sms.example.com/v1/batch', 'token': '...'},
+            'BATCH_SIZE': 100,
+            'RATE_LIMIT': 50,
+        },
+        'email': {'BACKEND': 'aegis.messaging.DjangoEmailBackend'},
+    }
+
+Backends: ConsoleBackend (logs, the default), FileBackend (JSON lines, a local
+stub), HTTPBackend (JSON batches over a pooled session, for an SMS gateway or
+a local stub server) and DjangoEmailBackend (one EMAIL_BACKEND connection per
+batch).
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core import mail
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from . import tasks
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+MESSAGING_THREADS = getattr(settings, 'MESSAGING_THREADS', 8)
+
+DEFAULT_PROVIDER = {'BACKEND': 'aegis.messaging.ConsoleBackend'}
+
+TEMPLATES = {
+    'emergency_alert': (
+        'EMERGENCY: {name} needs help',
+        "🚨 EMERGENCY ALERT 🚨\n\n"
+        "{name} has activated an emergency alert.\n\n"
+        "Alert ID: {alert_id}\n"
+        "Time: {time}\n"
+        "Location: {location}\n"
+        "Emergency Type: {emergency_type}\n\n"
+        "Please check the Aegis app for real-time updates.\n\n"
+        "Stay safe,\n"
+        "Aegis Emergency Response System"
+    ),
+    'alert_test': (
+        'Aegis alert test from {name}',
+        "{name} tested their Aegis emergency alert at {time}. "
+        "You are one of their emergency contacts. Be safe, Be aware"
+    ),
+    'safety_check': (
+        '{name} checked in safe',
+        "{name} is safe now at {time}. Be safe, Be aware"
+    ),
+}
+
+
+def render(template, **context):
+    """(subject, body) for a template"""
+    subject, body = TEMPLATES[template]
+    return subject.format(**context), body.format(**context)
+
+
+def alert_context(alert):
+    return {
+        'name': alert.user.full_name,
+        'alert_id': alert.alert_id,
+        'time': timezone.localtime(alert.activated_at).strftime('%Y-%m-%d %H:%M:%S'),
+        'location': alert.initial_address or 'Location being tracked',
+        'emergency_type': alert.emergency_type.title(),
+    }
+
+
+# Rate limiting
+
+class RateLimiter:
+    """Token bucket: `rate` tokens per second, bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count=1):
+        # A request larger than the bucket waits for a full bucket and leaves
+        # it in debt, so the long-run rate still holds
+        needed = min(count, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= count
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Backends
+
+class BaseBackend:
+    """
+    send_batch(channel, messages) returns one result per message:
+    {'status': 'sent' | 'failed', 'provider_id': str, 'error': str}
+    """
+    name = 'base'
+
+    def __init__(self, **options):
+        self.options = options
+
+    def send_batch(self, channel, messages):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    name = 'console'
+
+    def send_batch(self, channel, messages):
+        for message in messages:
+            logger.info(f"{channel.upper()} to {message.recipient}: {message.body}")
+        return [{'status': 'sent'} for _ in messages]
+
+
+class FileBackend(BaseBackend):
+    """Appends each batch as JSON lines to OPTIONS['path']"""
+    name = 'file'
+
+    def __init__(self, path, **options):
+        super().__init__(**options)
+        self.path = path
+        self.lock = threading.Lock()
+
+    def send_batch(self, channel, messages):
+        lines = [
+            json.dumps({'channel': channel, 'to': m.recipient, 'subject': m.subject, 'body': m.body, 'reference': m.id})
+            for m in messages
+        ]
+        with self.lock, open(self.path, 'a', encoding='utf-8') as output:
+            output.write('\n'.join(lines) + '\n')
+        return [{'status': 'sent', 'provider_id': f'file-{m.id}'} for m in messages]
+
+
+class HTTPBackend(BaseBackend):
+    """
+    POSTs {'channel', 'messages': [{'to', 'subject', 'body', 'reference'}]}
+    to OPTIONS['url'] and expects {'results': [{'reference', 'id', 'status',
+    'error'}]}. One pooled session per provider keeps connections open.
+    """
+    name = 'http'
+
+    def __init__(self, url, token=None, timeout=10, **options):
+        super().__init__(**options)
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MESSAGING_THREADS)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if token:
+            self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def send_batch(self, channel, messages):
+        response = self.session.post(self.url, timeout=self.timeout, json={
+            'channel': channel,
+            'messages': [
+                {'to': m.recipient, 'subject': m.subject, 'body': m.body, 'reference': m.id}
+                for m in messages
+            ],
+        })
+        response.raise_for_status()
+        results = {result.get('reference'): result for result in response.json().get('results', [])}
+        output = []
+        for message in messages:
+            result = results.get(message.id)
+            if result is None:
+                output.append({'status': 'failed', 'error': 'No result from provider'})
+            elif result.get('status') == 'failed':
+                output.append({'status': 'failed', 'error': result.get('error', '')})
+            else:
+                output.append({'status': 'sent', 'provider_id': str(result.get('id', ''))})
+        return output
+
+
+class DjangoEmailBackend(BaseBackend):
+    """Sends a batch over one connection of the configured EMAIL_BACKEND"""
+    name = 'email'
+
+    def send_batch(self, channel, messages):
+        from_email = self.options.get('from_email')
+        emails = [
+            mail.EmailMessage(message.subject, message.body, from_email, [message.recipient])
+            for message in messages
+        ]
+        with mail.get_connection(fail_silently=False) as connection:
+            results = []
+            for email in emails:
+                try:
+                    connection.send_messages([email])
+                    results.append({'status': 'sent'})
+                except Exception as e:
+                    results.append({'status': 'failed', 'error': str(e)})
+        return results
+
+
+class Provider:
+    def __init__(self, config):
+        self.backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        self.batch_size = config.get('BATCH_SIZE', 100)
+        rate = config.get('RATE_LIMIT')
+        self.limiter = RateLimiter(rate, config.get('BURST')) if rate else None
+
+    def send(self, channel, messages):
+        if self.limiter:
+            self.limiter.acquire(len(messages))
+        try:
+            results = self.backend.send_batch(channel, messages)
+        except Exception as e:
+            logger.error(f"{self.backend.name} batch of {len(messages)} {channel} messages failed: {str(e)}")
+            results = [{'status': 'failed', 'error': str(e)}] * len(messages)
+        return list(zip(messages, results))
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MESSAGING_THREADS, thread_name_prefix='aegis-messaging')
+
+
+def get_provider(channel):
+    config = getattr(settings, 'MESSAGING', {}).get(channel, DEFAULT_PROVIDER)
+    key = (channel, repr(config))
+    with _providers_lock:
+        if key not in _providers:
+            _providers[key] = Provider(config)
+        return _providers[key]
+
+
+# Sending
+
+def queue(template, recipients, context, alert=None, sender=None):
+    """
+    Render `template` once and store a queued message per recipient.
+    recipients: (channel, address, contact or None) tuples.
+    """
+    subject, body = render(template, **context)
+    return OutboundMessage.objects.bulk_create([
+        OutboundMessage(
+            channel=channel, recipient=address, contact=contact, template=template,
+            subject=subject, body=body, alert=alert, sender=sender
+        )
+        for channel, address, contact in recipients
+    ])
+
+
+def contact_recipients(contacts):
+    """An SMS to every contact's phone and an email to those with an address"""
+    recipients = []
+    for contact in contacts:
+        if contact.phone:
+            recipients.append(('sms', contact.phone, contact))
+        if contact.email:
+            recipients.append(('email', contact.email, contact))
+    return recipients
+
+
+def deliver(messages):
+    """
+    Send messages concurrently, batched per provider, and record each
+    message's status. Returns the number that failed.
+    """
+    messages = list(messages)
+    batches = []
+    for channel in {message.channel for message in messages}:
+        provider = get_provider(channel)
+        channel_messages = [message for message in messages if message.channel == channel]
+        for start in range(0, len(channel_messages), provider.batch_size):
+            batches.append((provider, channel, channel_messages[start:start + provider.batch_size]))
+
+    futures = [
+        (provider, _executor.submit(provider.send, channel, batch))
+        for provider, channel, batch in batches
+    ]
+
+    now = timezone.now()
+    failed = 0
+    for provider, future in futures:
+        for message, result in future.result():
+            message.attempts += 1
+            message.status = result['status']
+            message.provider = provider.backend.name
+            message.provider_message_id = result.get('provider_id', '')
+            message.error = result.get('error', '')
+            if message.status == 'sent':
+                message.sent_at = now
+            else:
+                failed += 1
+    OutboundMessage.objects.bulk_update(
+        messages, ['status', 'provider', 'provider_message_id', 'error', 'attempts', 'sent_at'], batch_size=500
+    )
+    return failed
+
+
+def deliver_pending(**filters):
+    """Deliver queued and previously failed messages matching `filters`"""
+    return deliver(OutboundMessage.objects.filter(status__in=['queued', 'failed'], **filters))
+
+
+@tasks.task(max_attempts=3)
+def send_queued(message_ids):
+    """Background job: deliver the given messages, retrying the ones that fail"""
+    failed = deliver_pending(id__in=message_ids)
+    if failed:
+        raise RuntimeError(f'{failed} of {len(message_ids)} messages failed')
+
+
+def send_to_contact(contact, template, sender):
+    """Queue a template message to one contact and deliver it in the background"""
+    messages = queue(
+        template,
+        contact_recipients([contact]),
+        {'name': sender.full_name, 'time': timezone.localtime().strftime('%Y-%m-%d %I:%M:%S %p')},
+        sender=sender,
+    )
+    tasks.enqueue(send_queued, [message.id for message in messages])
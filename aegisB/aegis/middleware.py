@@ -0,0 +1,40 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authtoken.models import Token
+
+
+@database_sync_to_async
+def get_token_user(key):
+    try:
+        return Token.objects.select_related('user').get(key=key).user
+    except Token.DoesNotExist:
+        return AnonymousUser()
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with the same DRF tokens the REST API uses.
+
+    The token is read from an `Authorization: Token <key>` header, or from a
+    `?token=<key>` query parameter for clients that cannot set headers.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token_key(scope)
+        user = await get_token_user(key) if key else AnonymousUser()
+        scope['user'] = user if user.is_active else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    def get_token_key(self, scope):
+        headers = dict(scope.get('headers', []))
+        authorization = headers.get(b'authorization', b'').decode()
+        keyword, _, key = authorization.partition(' ')
+        if keyword == 'Token' and key:
+            return key.strip()
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        return query.get('token', [None])[0]
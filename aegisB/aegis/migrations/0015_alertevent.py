@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-16 22:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0014_alter_emergencynotification_notification_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('alert', 'Alert'), ('location', 'Location Update'), ('media', 'Media Capture'), ('response', 'Emergency Response'), ('notification', 'Notification')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='aegis.emergencyalert')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['alert', 'id'], name='aegis_alert_alert_i_6856b8_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0015_alertevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationTrackChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('alert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='track_chunks', to='aegis.emergencyalert')),
+            ],
+            options={
+                'ordering': ['start_time'],
+                'indexes': [models.Index(fields=['alert', 'start_time'], name='aegis_locat_alert_i_15850d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0016_locationtrackchunk'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='emergencyalert',
+            index=models.Index(fields=['activated_at'], name='aegis_emerg_activat_29efa0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencyincidentreport',
+            index=models.Index(fields=['created_at'], name='aegis_emerg_created_21b9aa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emergencyincidentreport',
+            index=models.Index(fields=['agent', 'created_at'], name='aegis_emerg_agent_i_357629_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidentreport',
+            index=models.Index(fields=['created_at'], name='aegis_incid_created_e0c834_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learningresource',
+            index=models.Index(fields=['order', 'created_at'], name='aegis_learn_order_f2e0d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediacapture',
+            index=models.Index(fields=['captured_at'], name='aegis_media_capture_ae9681_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediacapture',
+            index=models.Index(fields=['alert', 'captured_at'], name='aegis_media_alert_i_4fd84c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoevidence',
+            index=models.Index(fields=['recorded_at'], name='aegis_video_recorde_069791_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoevidence',
+            index=models.Index(fields=['user', 'recorded_at'], name='aegis_video_user_id_a5acc3_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0017_list_ordering_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('incident_report', 'Incident Report'), ('emergency_alert', 'Emergency Alert'), ('emergency_incident_report', 'Emergency Incident Report'), ('video_evidence', 'Video Evidence')], max_length=30)),
+                ('day', models.DateField()),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('kind', models.CharField(blank=True, max_length=50)),
+                ('severity', models.CharField(blank=True, max_length=20)),
+                ('is_anonymous', models.BooleanField(default=False)),
+                ('row_count', models.IntegerField(default=0)),
+                ('duration_seconds', models.BigIntegerField(default=0)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'user', 'day'], name='aegis_stats_source_245a55_idx'), models.Index(fields=['source', 'day'], name='aegis_stats_source_2b106a_idx')],
+                'constraints': [models.UniqueConstraint(fields=('source', 'day', 'user', 'status', 'kind', 'severity', 'is_anonymous'), name='unique_stats_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:48
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from aegis import polyline
+
+LEGACY_FIELDS = ('route_path', 'raw_route_data')
+
+
+def move_paths_to_geometry(apps, schema_editor):
+    """Store each saved route's path as a polyline and drop the raw provider JSON"""
+    SafeRoute = apps.get_model('aegis', 'SafeRoute')
+    RouteGeometry = apps.get_model('aegis', 'RouteGeometry')
+    for route in SafeRoute.objects.filter(geometry__isnull=True).iterator():
+        data = route.route_data or {}
+        path = data.get('route_path')
+        if not path:
+            continue
+        encoded = polyline.encode([(lat, lng) for lng, lat in path], 6)
+        feature = (data.get('raw_route_data') or {}).get('features', [{}])[0]
+        summary = feature.get('properties', {}).get('summary', {})
+        # Keyed on the path itself: old routes are kept, never matched by new requests
+        geometry, _ = RouteGeometry.objects.get_or_create(
+            key=hashlib.sha256(('legacy:' + encoded).encode()).hexdigest(),
+            defaults={
+                'polyline': encoded,
+                'distance_m': summary.get('distance', 0),
+                'duration_s': summary.get('duration', 0),
+                'bbox': feature.get('bbox', []),
+                'engine': feature.get('properties', {}).get('engine', 'openroute'),
+            }
+        )
+        route.geometry = geometry
+        route.route_data = {name: value for name, value in data.items() if name not in LEGACY_FIELDS}
+        route.save(update_fields=['geometry', 'route_data'])
+
+
+def restore_paths(apps, schema_editor):
+    SafeRoute = apps.get_model('aegis', 'SafeRoute')
+    for route in SafeRoute.objects.filter(geometry__isnull=False).select_related('geometry').iterator():
+        route.route_data = dict(route.route_data, route_path=[
+            [lng, lat] for lat, lng in polyline.decode(route.geometry.polyline, 6)
+        ])
+        route.save(update_fields=['route_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0020_outbound_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteGeometry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('polyline', models.TextField()),
+                ('distance_m', models.FloatField()),
+                ('duration_s', models.FloatField()),
+                ('bbox', models.JSONField(default=list)),
+                ('engine', models.CharField(default='openroute', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='saferoute',
+            name='geometry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='routes', to='aegis.routegeometry'),
+        ),
+        migrations.RunPython(move_paths_to_geometry, restore_paths),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0022_upload_session'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emergencyreportevidence',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='emergencyreportevidence',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='incidentmedia',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='incidentmedia',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='mediacapture',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='mediacapture',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='videoevidence',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='videoevidence',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, upload_to=''),
+        ),
+    ]
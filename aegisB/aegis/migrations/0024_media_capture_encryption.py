@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:20
+
+import aegis.crypto
+import aegis.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0023_media_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mediacapture',
+            name='file',
+            field=models.FileField(storage=aegis.crypto.encrypted_storage, upload_to=aegis.models.media_upload_path),
+        ),
+        migrations.AlterField(
+            model_name='mediacapture',
+            name='preview',
+            field=models.FileField(blank=True, editable=False, storage=aegis.crypto.encrypted_storage, upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='mediacapture',
+            name='thumbnail',
+            field=models.FileField(blank=True, editable=False, storage=aegis.crypto.encrypted_storage, upload_to=''),
+        ),
+    ]
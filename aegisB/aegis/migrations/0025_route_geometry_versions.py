@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-17 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aegis', '0024_media_capture_encryption'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='routegeometry',
+            name='key',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='routegeometry',
+            index=models.Index(fields=['key', 'created_at'], name='aegis_route_key_1867ff_idx'),
+        ),
+    ]
@@ -4,11 +4,12 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import timedelta
-from moviepy import VideoFileClip
 
 import uuid
 import os
 
+from .crypto import encrypted_storage
+
 User = get_user_model()
 
 
@@ -103,6 +104,9 @@ class LearningResource(models.Model):
 
     class Meta:
         ordering = ['order', 'created_at']
+        indexes = [
+            models.Index(fields=['order', 'created_at']),
+        ]
 
     def __str__(self):
         return self.title
@@ -231,6 +235,9 @@ class IncidentReport(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.get_incident_type_display()} - {self.title}"
@@ -251,6 +258,9 @@ class IncidentMedia(models.Model):
     media_type = models.CharField(max_length=10, choices=MEDIA_TYPES)
     file = models.FileField(upload_to=incident_media_upload_path)
     caption = models.TextField(blank=True)
+    # Stored next to `file` by aegis/derivatives.py
+    thumbnail = models.FileField(blank=True, editable=False)
+    preview = models.FileField(blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -381,6 +391,9 @@ class VideoEvidence(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='video_evidence')
     title = models.CharField(max_length=255, default='Silently Captured Evidence')
     video_file = models.FileField(upload_to='video_evidence/%Y/%m/%d/')
+    # Poster frame and contact sheet, stored next to `video_file` by aegis/derivatives.py
+    thumbnail = models.FileField(blank=True, editable=False)
+    preview = models.FileField(blank=True, editable=False)
     location_lat = models.FloatField(null=True, blank=True)
     location_lng = models.FloatField(null=True, blank=True)
     location_address = models.TextField(blank=True)
@@ -397,6 +410,10 @@ class VideoEvidence(models.Model):
     class Meta:
         ordering = ['-recorded_at']
         verbose_name_plural = "Video Evidence"
+        indexes = [
+            models.Index(fields=['recorded_at']),
+            models.Index(fields=['user', 'recorded_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.email} - {self.recorded_at.strftime('%Y-%m-%d %H:%M')}"
@@ -412,17 +429,7 @@ class VideoEvidence(models.Model):
             except (ValueError, OSError):
                 pass
         
-        if self.video_file and (self.duration_seconds == 0 or not self.duration_seconds):
-            try:
-                
-                if hasattr(self.video_file, 'path') and os.path.exists(self.video_file.path):
-                    clip = VideoFileClip(self.video_file.path)
-                    self.duration_seconds = int(clip.duration)
-                    clip.close()
-            except Exception as e:
-                print(f"Could not get video duration: {e}")
-
-        
+        # duration_seconds is filled in after saving, see aegis/media_probe.py
         super().save(*args, **kwargs)
 
     def get_file_size_display(self):
@@ -462,6 +469,13 @@ class VideoEvidence(models.Model):
 def generate_alert_id():
     return f"EMG-{uuid.uuid4().hex[:8].upper()}"
 
+
+class EmergencyAlertQuerySet(models.QuerySet):
+    def with_list_data(self):
+        """Everything EmergencyAlertSerializer reads, in the same query"""
+        return self.select_related('user').annotate(responders_total=models.Count('responses'))
+
+
 class EmergencyAlert(models.Model):
     ALERT_STATUS = [
         ('active', 'Active'),
@@ -511,9 +525,12 @@ class EmergencyAlert(models.Model):
     fake_screen_active = models.BooleanField(default=True)
     deactivation_attempts = models.IntegerField(default=0)
     
+    objects = EmergencyAlertQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-activated_at']
         indexes = [
+            models.Index(fields=['activated_at']),
             models.Index(fields=['status', 'activated_at']),
             models.Index(fields=['user', 'activated_at']),
         ]
@@ -540,6 +557,26 @@ class LocationUpdate(models.Model):
     def __str__(self):
         return f"Location for {self.alert.alert_id} at {self.timestamp}"
 
+class LocationTrackChunk(models.Model):
+    """
+    A run of compacted LocationUpdate rows for one alert. `data` holds
+    zlib-compressed, delta-encoded int32 columns (see aegis/tracks.py).
+    """
+    alert = models.ForeignKey(EmergencyAlert, on_delete=models.CASCADE, related_name='track_chunks')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    point_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['start_time']
+        indexes = [
+            models.Index(fields=['alert', 'start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.point_count} points for {self.alert.alert_id} from {self.start_time}"
+
 def media_upload_path(instance, filename):
     """
     Example: emergency/EMG-ABC12345/filename.jpg
@@ -558,23 +595,75 @@ class MediaCapture(models.Model):
     
     alert = models.ForeignKey(EmergencyAlert, on_delete=models.CASCADE, related_name='media_captures')
     media_type = models.CharField(max_length=10, choices=MEDIA_TYPES)
-    file = models.FileField(upload_to=media_upload_path, blank=False, null=False)
+    # Encrypted at rest, see aegis/crypto.py
+    file = models.FileField(upload_to=media_upload_path, storage=encrypted_storage, blank=False, null=False)
+    # Stored next to `file` by aegis/derivatives.py
+    thumbnail = models.FileField(storage=encrypted_storage, blank=True, editable=False)
+    preview = models.FileField(storage=encrypted_storage, blank=True, editable=False)
     file_size = models.BigIntegerField(default=0, help_text="Size in bytes")
     duration = models.IntegerField(null=True, blank=True, help_text="For audio/video in seconds")
     captured_at = models.DateTimeField(default=timezone.now)
     
     # Security & metadata
     is_encrypted = models.BooleanField(default=True)
+    # Id of the master key wrapping the file's data key; the wrapped key is in the file header
     encryption_key = models.TextField(blank=True)
     mime_type = models.CharField(max_length=100, blank=True)
     resolution = models.CharField(max_length=20, blank=True, help_text="e.g., 1920x1080")
     
     class Meta:
         ordering = ['-captured_at']
+        indexes = [
+            models.Index(fields=['captured_at']),
+            models.Index(fields=['alert', 'captured_at']),
+        ]
     
     def __str__(self):
         return f"{self.media_type} for {self.alert.alert_id}"
 
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload (see aegis/uploads.py). The file grows on disk
+    chunk by chunk; finalizing attaches it to a VideoEvidence or creates the
+    MediaCapture for an alert.
+    """
+    TARGET_CHOICES = [
+        ('video_evidence', 'Video Evidence'),
+        ('media_capture', 'Emergency Media'),
+    ]
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    evidence = models.ForeignKey(VideoEvidence, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    alert = models.ForeignKey(EmergencyAlert, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    media_type = models.CharField(max_length=10, choices=MediaCapture.MEDIA_TYPES, blank=True)
+    duration = models.IntegerField(null=True, blank=True)
+    media_capture = models.ForeignKey(MediaCapture, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    # Running CRC-32 of the first `received` bytes
+    crc32 = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.upload_id} ({self.received}/{self.total_size} bytes)"
+
 class EmergencyResponse(models.Model):
     RESPONSE_STATUS = [
         ('notified', 'Notified'),
@@ -658,7 +747,167 @@ class EmergencyNotification(models.Model):
     
     def __str__(self):
         return f"{self.notification_type} - {self.user.email}"
-    
+
+
+class AlertEvent(models.Model):
+    """
+    Change log for an emergency. The auto-incrementing id is used as the sync
+    cursor: ids only grow, so the ids for one alert form its event sequence.
+    Ids are assigned before commit, though, so the cursor handed to clients
+    stops short of events younger than CURSOR_SETTLE_SECONDS.
+    """
+    # Longest a transaction writing events is expected to stay open
+    CURSOR_SETTLE_SECONDS = 10
+
+    EVENT_KINDS = [
+        ('alert', 'Alert'),
+        ('location', 'Location Update'),
+        ('media', 'Media Capture'),
+        ('response', 'Emergency Response'),
+        ('notification', 'Notification'),
+    ]
+
+    alert = models.ForeignKey(EmergencyAlert, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=EVENT_KINDS)
+    object_id = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['alert', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} for alert {self.alert_id}"
+
+    @classmethod
+    def settle_cutoff(cls):
+        return timezone.now() - timedelta(seconds=cls.CURSOR_SETTLE_SECONDS)
+
+
+class OutboundMessage(models.Model):
+    """
+    One SMS or email to one recipient, with its delivery status (see
+    aegis/messaging.py). Messages from one send share a rendered body.
+    """
+    CHANNEL_CHOICES = [
+        ('sms', 'SMS'),
+        ('email', 'Email'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255)
+    template = models.CharField(max_length=50)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    alert = models.ForeignKey(
+        EmergencyAlert, on_delete=models.CASCADE, null=True, blank=True, related_name='outbound_messages'
+    )
+    contact = models.ForeignKey(
+        EmergencyContact, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbound_messages'
+    )
+    sender = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='outbound_messages'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    provider = models.CharField(max_length=50, blank=True)
+    provider_message_id = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['alert', 'template', 'status']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+
+class BackgroundJob(models.Model):
+    """
+    A durable queued call for the database task backend (see aegis/tasks.py),
+    executed by the run_jobs worker command.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+class StatsRollup(models.Model):
+    """
+    Pre-aggregated dashboard counts: one row per source table, day and
+    dimension values, kept up to date by aegis/rollups.py.
+    """
+    SOURCES = [
+        ('incident_report', 'Incident Report'),
+        ('emergency_alert', 'Emergency Alert'),
+        ('emergency_incident_report', 'Emergency Incident Report'),
+        ('video_evidence', 'Video Evidence'),
+    ]
+
+    source = models.CharField(max_length=30, choices=SOURCES)
+    day = models.DateField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stats_rollups')
+    status = models.CharField(max_length=20, blank=True)
+    kind = models.CharField(max_length=50, blank=True)
+    severity = models.CharField(max_length=20, blank=True)
+    is_anonymous = models.BooleanField(default=False)
+
+    row_count = models.IntegerField(default=0)
+    duration_seconds = models.BigIntegerField(default=0)
+    file_size = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'day', 'user', 'status', 'kind', 'severity', 'is_anonymous'],
+                name='unique_stats_rollup_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'user', 'day']),
+            models.Index(fields=['source', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.day}: {self.row_count}"
+
 
 
 
@@ -756,6 +1005,10 @@ class EmergencyIncidentReport(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['agent', 'created_at']),
+        ]
     
     def __str__(self):
         return f"Incident Report - {self.emergency.alert_id}"
@@ -768,6 +1021,9 @@ class EmergencyReportEvidence(models.Model):
     )
     file = models.FileField(upload_to='incident_evidence/%Y/%m/%d/')
     file_type = models.CharField(max_length=10)
+    # Stored next to `file` by aegis/derivatives.py
+    thumbnail = models.FileField(blank=True, editable=False)
+    preview = models.FileField(blank=True, editable=False)
     uploaded_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
@@ -806,9 +1062,35 @@ class SafeLocation(models.Model):
     def __str__(self):
         return f"{self.name} - {self.user.email}"
 
+class RouteGeometry(models.Model):
+    """
+    One computed route, shared by every SafeRoute asking for the same trip
+    (see aegis/route_store.py). `key` hashes the origin cell, destination and
+    avoided locations; the path is an encoded polyline. Rows are never
+    changed: recomputing a trip adds a row, and routes planned earlier keep
+    the path they were given.
+    """
+    key = models.CharField(max_length=64)
+    polyline = models.TextField()
+    distance_m = models.FloatField()
+    duration_s = models.FloatField()
+    bbox = models.JSONField(default=list)
+    engine = models.CharField(max_length=20, default='openroute')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Route {self.key[:12]} ({self.distance_m / 1000:.1f} km)"
+
+
 class SafeRoute(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='safe_routes')
     destination = models.CharField(max_length=255)
+    geometry = models.ForeignKey(RouteGeometry, on_delete=models.PROTECT, null=True, blank=True, related_name='routes')
     route_data = models.JSONField(default=dict)
     avoided_locations = models.JSONField(default=list)
     is_active = models.BooleanField(default=False)
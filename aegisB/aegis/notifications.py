@@ -0,0 +1,117 @@
+"""
+Notification dispatch for emergencies.
+
+Each template function returns the notification_type, title, message and data
+for one kind of notification; `send` writes one row per recipient with a
+single bulk insert, so fan-out costs the same number of queries whatever the
+number of recipients.
+"""
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmergencyNotification, EmergencyResponse
+from .signals import record_events
+
+User = get_user_model()
+
+Notice = namedtuple('Notice', ['notification_type', 'title', 'message', 'data'])
+
+
+# Templates
+
+def alert_cancelled(alert):
+    return Notice(
+        'alert_resolved',
+        'Emergency Cancelled',
+        f'Emergency {alert.alert_id} has been cancelled by the user.',
+        {
+            'cancelled_at': alert.cancelled_at.isoformat(),
+            'alert_id': alert.alert_id
+        }
+    )
+
+
+def media_uploaded(alert, media_capture):
+    return Notice(
+        'media_uploaded',
+        'New Media Uploaded',
+        f'New {media_capture.media_type} uploaded for emergency {alert.alert_id}',
+        {
+            'media_type': media_capture.media_type,
+            'media_id': media_capture.id,
+            'file_size': media_capture.file_size,
+            'captured_at': media_capture.captured_at.isoformat()
+        }
+    )
+
+
+def suspicious_deactivation(alert, attempts):
+    return Notice(
+        'alert_activated',
+        'Suspicious Deactivation Attempts',
+        f'Multiple failed deactivation attempts ({attempts}) for alert {alert.alert_id}. Possible coercion situation.',
+        {
+            'attempts': attempts,
+            'alert_id': alert.alert_id,
+            'user_email': alert.user.email,
+            'user_name': alert.user.full_name
+        }
+    )
+
+
+# Dispatch
+
+def send(alert, notice, user_ids):
+    """Create the notice for every user in user_ids with one bulk insert"""
+    notifications = EmergencyNotification.objects.bulk_create([
+        EmergencyNotification(
+            user_id=user_id,
+            alert=alert,
+            notification_type=notice.notification_type,
+            title=notice.title,
+            message=notice.message,
+            data=notice.data
+        )
+        for user_id in dict.fromkeys(user_ids)
+    ])
+    # bulk_create skips post_save, so record the sync events here
+    record_events('notification', notifications)
+    return notifications
+
+
+def responder_ids(alert):
+    return list(alert.responses.values_list('responder_id', flat=True))
+
+
+@transaction.atomic
+def notify_responders(alert, notice):
+    return send(alert, notice, responder_ids(alert))
+
+
+@transaction.atomic
+def notify_admins(alert, notice):
+    return send(alert, notice, User.objects.filter(user_type='admin').values_list('id', flat=True))
+
+
+@transaction.atomic
+def cancel_responses(alert):
+    """
+    Cancel every response to the alert, free the responders and tell them,
+    in a fixed number of queries.
+    """
+    responses = list(alert.responses.only('id', 'alert_id', 'responder_id'))
+    if not responses:
+        return []
+
+    now = timezone.now()
+    EmergencyResponse.objects.filter(id__in=[r.id for r in responses]).update(
+        status='cancelled', completed_at=now
+    )
+    record_events('response', responses)
+
+    ids = [r.responder_id for r in responses]
+    User.objects.filter(id__in=ids).update(status='available')
+    return send(alert, alert_cancelled(alert), ids)
@@ -0,0 +1,191 @@
+"""
+OpenRouteService client for geocoding and directions.
+
+One pooled requests.Session per configuration, with connect/read timeouts and
+retries with exponential backoff on connection errors, 429 and 5xx. Results
+are kept in in-process LRU caches with a TTL:
+
+- geocode: keyed on the normalized search text (case and whitespace folded)
+- reverse geocode: keyed on coordinates rounded to REVERSE_GEOCODE_PRECISION
+  decimals (4 = about 11 m)
+- directions: keyed on origin and destination rounded to
+  DIRECTIONS_PRECISION decimals (3 = about 110 m) plus the avoided areas, so
+  nearby trips to the same place share a route
+
+"Not found" answers are cached too; errors are not.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+OPENROUTE_BASE_URL = 'https://api.openrouteservice.org'
+# (connect, read) seconds
+OPENROUTE_TIMEOUT = getattr(settings, 'OPENROUTE_TIMEOUT', (3.05, 10))
+OPENROUTE_RETRIES = getattr(settings, 'OPENROUTE_RETRIES', 2)
+OPENROUTE_BACKOFF = getattr(settings, 'OPENROUTE_BACKOFF', 0.5)
+
+GEOCODE_CACHE_SECONDS = getattr(settings, 'GEOCODE_CACHE_SECONDS', 24 * 3600)
+DIRECTIONS_CACHE_SECONDS = getattr(settings, 'DIRECTIONS_CACHE_SECONDS', 15 * 60)
+OPENROUTE_CACHE_SIZE = getattr(settings, 'OPENROUTE_CACHE_SIZE', 2048)
+REVERSE_GEOCODE_PRECISION = 4
+DIRECTIONS_PRECISION = 3
+
+_MISSING = object()
+
+
+class OpenRouteError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def normalize_text(text):
+    return ' '.join(str(text).lower().split())
+
+
+def quantize(lat, lng, precision):
+    return round(float(lat), precision), round(float(lng), precision)
+
+
+class OpenRouteClient:
+    def __init__(self, api_key, base_url=OPENROUTE_BASE_URL, timeout=OPENROUTE_TIMEOUT,
+                 retries=OPENROUTE_RETRIES, backoff=OPENROUTE_BACKOFF):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'GET', 'POST'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry, pool_maxsize=16)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = api_key
+
+        self.geocode_cache = TTLCache(OPENROUTE_CACHE_SIZE, GEOCODE_CACHE_SECONDS)
+        self.reverse_cache = TTLCache(OPENROUTE_CACHE_SIZE, GEOCODE_CACHE_SECONDS)
+        self.directions_cache = TTLCache(OPENROUTE_CACHE_SIZE, DIRECTIONS_CACHE_SECONDS)
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise OpenRouteError(f'OpenRouteService request failed: {e}') from e
+        if response.status_code != 200:
+            raise OpenRouteError(f'OpenRouteService returned {response.status_code}', response.status_code)
+        return response.json()
+
+    def geocode(self, text, country='BGD'):
+        """The best matching GeoJSON feature for `text`, or None"""
+        key = (normalize_text(text), country)
+        feature = self.geocode_cache.get(key, _MISSING)
+        if feature is _MISSING:
+            data = self._request('GET', '/geocode/search', params={
+                'text': text,
+                'boundary.country': country,
+                'size': 1,
+            })
+            features = data.get('features') or []
+            feature = features[0] if features else None
+            self.geocode_cache.set(key, feature)
+        return feature
+
+    def reverse_geocode(self, lat, lng):
+        """Label of the nearest address, or None"""
+        key = quantize(lat, lng, REVERSE_GEOCODE_PRECISION)
+        label = self.reverse_cache.get(key, _MISSING)
+        if label is _MISSING:
+            data = self._request('GET', '/geocode/reverse', params={
+                'point.lat': key[0],
+                'point.lon': key[1],
+                'size': 1,
+            })
+            features = data.get('features') or []
+            label = features[0]['properties'].get('label') if features else None
+            self.reverse_cache.set(key, label)
+        return label
+
+    def directions(self, start, end, avoid_polygons=None, profile='driving-car'):
+        """
+        Route between two [lng, lat] points, optionally avoiding polygons
+        (lists of [lng, lat] rings). Nearby start/end points share a cached route.
+        """
+        start_key = quantize(start[1], start[0], DIRECTIONS_PRECISION)
+        end_key = quantize(end[1], end[0], DIRECTIONS_PRECISION)
+        avoid_key = hashlib.sha1(json.dumps(avoid_polygons or []).encode()).hexdigest()
+        key = (profile, start_key, end_key, avoid_key)
+
+        route = self.directions_cache.get(key)
+        if route is None:
+            body = {
+                # Rounded only for the cache key: the route itself starts and ends where asked
+                'coordinates': [[float(start[0]), float(start[1])], [float(end[0]), float(end[1])]],
+                'instructions': False,
+                'preference': 'recommended',
+            }
+            if avoid_polygons:
+                body['options'] = {
+                    'avoid_polygons': {'type': 'MultiPolygon', 'coordinates': [avoid_polygons]}
+                }
+            route = self._request('POST', f'/v2/directions/{profile}', json=body)
+            self.directions_cache.set(key, route)
+        return route
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    api_key = getattr(settings, 'OPENROUTE_API_KEY', None)
+    base_url = getattr(settings, 'OPENROUTE_BASE_URL', OPENROUTE_BASE_URL)
+    with _clients_lock:
+        if (api_key, base_url) not in _clients:
+            _clients[(api_key, base_url)] = OpenRouteClient(api_key, base_url)
+        return _clients[(api_key, base_url)]
@@ -0,0 +1,96 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Pages are fetched with `WHERE <ordering column> < <cursor position> LIMIT n`
+on an indexed column, so the cost of a page does not depend on how deep into
+the table it is. Clients follow the opaque `next`/`previous` URLs.
+Envelope responses carry the total `count` only when asked for with
+`?with_count=1`, since counting is a scan of every matching row.
+
+A cursor only records its position in the first ordering column, so that
+column must be (nearly) unique. Lists sorted by a hand-edited rank, where most
+rows tie, use numbered pages instead.
+"""
+from rest_framework import pagination
+from rest_framework.response import Response
+
+
+class CursorPagination(pagination.CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-created_at'
+
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = ordering
+
+
+def link_header_response(paginator, data):
+    """The list as the body, page links in an RFC 8288 `Link` header"""
+    links = []
+    next_link = paginator.get_next_link()
+    previous_link = paginator.get_previous_link()
+    if next_link:
+        links.append(f'<{next_link}>; rel="next"')
+    if previous_link:
+        links.append(f'<{previous_link}>; rel="prev"')
+    headers = {'Link': ', '.join(links)} if links else None
+    return Response(data, headers=headers)
+
+
+class LinkHeaderCursorPagination(CursorPagination):
+    """
+    For endpoints whose body has always been a plain list: the list stays the
+    body and the page links go in a `Link` header.
+    """
+
+    def get_paginated_response(self, data):
+        return link_header_response(self, data)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
+
+
+class LinkHeaderPageNumberPagination(pagination.PageNumberPagination):
+    """Numbered pages (`?page=n`) with the links in a `Link` header"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_paginated_response(self, data):
+        return link_header_response(self, data)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
+
+
+def paginate(request, queryset, ordering):
+    """
+    Return (page, paginator) for function-based views that wrap results in the
+    usual {'success': ..., 'data': ...} envelope; see `envelope`.
+    """
+    paginator = CursorPagination(ordering)
+    paginator.count = queryset.count() if request.query_params.get('with_count') in ('1', 'true') else None
+    page = paginator.paginate_queryset(queryset, request)
+    return page, paginator
+
+
+def envelope(paginator, data):
+    body = {'success': True}
+    if paginator.count is not None:
+        body['count'] = paginator.count
+    body.update({
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'data': data
+    })
+    return Response(body)
+
+
+def paginate_list(request, queryset, ordering, serializer_class, **serializer_kwargs):
+    """Paginated plain-list response with a Link header"""
+    paginator = LinkHeaderCursorPagination(ordering)
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, **serializer_kwargs)
+    return paginator.get_paginated_response(serializer.data)
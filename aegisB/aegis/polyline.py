@@ -0,0 +1,58 @@
+"""
+Encoded polyline format (as used by Google Maps and OSRM).
+
+Coordinates are stored as zig-zag varint deltas in printable ASCII. Precision
+5 is the Google default; precision 6 keeps the full resolution of the
+DecimalField(decimal_places=6) coordinates used throughout the models.
+"""
+
+
+def _encode_value(value, chunks):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+
+
+def encode(points, precision=5):
+    """Encode a sequence of (lat, lng) pairs"""
+    factor = 10 ** precision
+    chunks = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat = int(round(float(lat) * factor))
+        lng = int(round(float(lng) * factor))
+        _encode_value(lat - prev_lat, chunks)
+        _encode_value(lng - prev_lng, chunks)
+        prev_lat, prev_lng = lat, lng
+    return ''.join(chunks)
+
+
+def decode(encoded, precision=5):
+    """Decode a polyline into a list of (lat, lng) pairs; raises ValueError if malformed"""
+    factor = 10 ** precision
+    points = []
+    index = 0
+    length = len(encoded)
+    lat = lng = 0
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError('Truncated polyline')
+                byte = ord(encoded[index]) - 63
+                index += 1
+                if byte < 0 or byte > 0x3f:
+                    raise ValueError('Invalid polyline character')
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
@@ -0,0 +1,307 @@
+"""
+Incident-density risk surface for scoring routes and drawing heatmaps.
+
+Every emergency alert, incident report and piece of video evidence with
+coordinates deposits its weight on a lat/lng grid over Bangladesh
+(RISK_CELL_DEGREES cells, spread over the 3x3 cells around it). Weights halve
+every RISK_HALF_LIFE_DAYS: the grid is stored relative to a reference time and
+scaled by the elapsed decay when read, so ageing never rewrites it.
+
+`refresh` adds only the rows created since the previous refresh (tracked as
+the highest id seen per source) and rewrites the whole grid once a day, which
+also drops rows since deleted, moved or dismissed. It is enqueued as a
+background job when a reader finds the surface older than
+RISK_REFRESH_SECONDS, and `python manage.py refresh_risk_surface` runs it by
+hand. Requests never wait on it: until the first refresh finishes readers
+get an empty surface. Without RISK_SURFACE_PATH each process keeps its own
+surface in memory; with it the grid is saved there and reloaded by other
+processes when the file changes, which is needed for the 'database' task
+backend.
+
+Scoring a route samples the grid along its polyline with NumPy, so it costs
+the same however many incidents have been recorded.
+"""
+import io
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+
+from . import tasks
+from .distance import EARTH_RADIUS_KM
+from .models import EmergencyAlert, IncidentReport, VideoEvidence
+
+logger = logging.getLogger(__name__)
+
+# (min lat, max lat, min lng, max lng) covered by the grid
+RISK_BOUNDS = getattr(settings, 'RISK_BOUNDS', (20.5, 26.7, 88.0, 92.8))
+# About 550 m
+RISK_CELL_DEGREES = getattr(settings, 'RISK_CELL_DEGREES', 0.005)
+RISK_HALF_LIFE_DAYS = getattr(settings, 'RISK_HALF_LIFE_DAYS', 30)
+RISK_REFRESH_SECONDS = getattr(settings, 'RISK_REFRESH_SECONDS', 60)
+RISK_REBUILD_SECONDS = getattr(settings, 'RISK_REBUILD_SECONDS', 24 * 3600)
+# Exposure at which a route's rating has dropped about halfway, roughly one
+# recent medium-severity incident on every sample
+RISK_SCALE = getattr(settings, 'RISK_SCALE', 1.0)
+# Distance between samples along a route
+RISK_SAMPLE_KM = 0.1
+RISK_TILE_CACHE_SECONDS = getattr(settings, 'RISK_TILE_CACHE_SECONDS', 300)
+
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+HALF_LIFE_SECONDS = RISK_HALF_LIFE_DAYS * 24 * 3600
+# Share of an incident's weight landing on each cell around it
+KERNEL = [
+    (dr, dc, 1.0 if dr == dc == 0 else 0.5 if 0 in (dr, dc) else 0.25)
+    for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+]
+
+# Where a source model keeps its coordinates and time, which rows to skip,
+# and how much each row weighs
+RiskSource = namedtuple('RiskSource', 'name model lat lng time exclude weight_field weights default_weight')
+
+SEVERITY_WEIGHTS = {'low': 0.5, 'medium': 1.0, 'high': 1.5, 'critical': 2.0, 'urgent': 2.0}
+
+SOURCES = (
+    RiskSource('emergency_alert', EmergencyAlert, 'initial_latitude', 'initial_longitude', 'activated_at',
+               {'status': 'false_alarm'}, 'severity_level', SEVERITY_WEIGHTS, 1.0),
+    RiskSource('incident_report', IncidentReport, 'latitude', 'longitude', 'incident_date',
+               {'status': 'dismissed'}, 'priority', SEVERITY_WEIGHTS, 1.0),
+    RiskSource('video_evidence', VideoEvidence, 'location_lat', 'location_lng', 'recorded_at',
+               {'status': 'rejected'}, None, {}, 0.5),
+)
+
+
+class RiskSurface:
+    def __init__(self, grid, meta):
+        self.grid = grid
+        self.meta = meta
+        self.lat0, self.lat1, self.lng0, self.lng1 = meta['bounds']
+        self.cell = meta['cell_degrees']
+        self.rows, self.cols = grid.shape
+
+    @classmethod
+    def empty(cls, bounds=RISK_BOUNDS, cell_degrees=RISK_CELL_DEGREES, now=None):
+        rows = int(math.ceil((bounds[1] - bounds[0]) / cell_degrees))
+        cols = int(math.ceil((bounds[3] - bounds[2]) / cell_degrees))
+        now = time.time() if now is None else now
+        return cls(np.zeros((rows, cols), dtype=np.float32), {
+            'bounds': list(bounds),
+            'cell_degrees': cell_degrees,
+            'reference': now,
+            'built_at': now,
+            'refreshed_at': now,
+            'watermarks': {},
+        })
+
+    def cells(self, lats, lngs):
+        """(rows, cols, inside) grid cells of coordinate arrays"""
+        rows = np.floor((np.asarray(lats, dtype=np.float64) - self.lat0) / self.cell).astype(np.int64)
+        cols = np.floor((np.asarray(lngs, dtype=np.float64) - self.lng0) / self.cell).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.rows) & (cols >= 0) & (cols < self.cols)
+        return rows, cols, inside
+
+    def deposit(self, lats, lngs, weights, timestamps):
+        """Add incidents at the given coordinates, weights and epoch-second times"""
+        rows, cols, inside = self.cells(lats, lngs)
+        # Relative to the reference time, so later incidents count for more
+        weights = np.asarray(weights, dtype=np.float64) * np.exp2(
+            (np.asarray(timestamps, dtype=np.float64) - self.meta['reference']) / HALF_LIFE_SECONDS
+        )
+        for dr, dc, share in KERNEL:
+            r, c = rows + dr, cols + dc
+            keep = inside & (r >= 0) & (r < self.rows) & (c >= 0) & (c < self.cols)
+            np.add.at(self.grid, (r[keep], c[keep]), (weights[keep] * share).astype(np.float32))
+
+    def rebase(self, now):
+        """Fold the decay since the reference time into the grid"""
+        self.grid *= np.float32(self.decay(now))
+        self.meta['reference'] = now
+
+    def decay(self, now=None):
+        now = time.time() if now is None else now
+        return 0.5 ** ((now - self.meta['reference']) / HALF_LIFE_SECONDS)
+
+    def values(self, lats, lngs, now=None):
+        """Decayed risk at each coordinate; zero outside the grid"""
+        rows, cols, inside = self.cells(lats, lngs)
+        values = np.zeros(len(rows), dtype=np.float64)
+        values[inside] = self.grid[rows[inside], cols[inside]]
+        return values * self.decay(now)
+
+    def score(self, path, now=None):
+        """
+        Risk along a [[lng, lat], ...] polyline, sampled every RISK_SAMPLE_KM:
+        {'exposure': mean risk, 'peak': highest risk, 'safety_rating': 1-5}
+        """
+        points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+        if not len(points):
+            return {'exposure': 0.0, 'peak': 0.0, 'safety_rating': 5.0}
+        lngs, lats = points[:, 0], points[:, 1]
+        lng_scale = math.cos(math.radians(float(lats.mean())))
+        steps = np.hypot(np.diff(lats), np.diff(lngs) * lng_scale) * KM_PER_DEGREE
+        along = np.concatenate([[0.0], np.cumsum(steps)])
+        samples = np.linspace(0, along[-1], max(2, int(along[-1] / RISK_SAMPLE_KM) + 1))
+        risk = self.values(np.interp(samples, along, lats), np.interp(samples, along, lngs), now)
+        exposure = float(risk.mean())
+        return {
+            'exposure': round(exposure, 3),
+            'peak': round(float(risk.max()), 3),
+            'safety_rating': round(1 + 4 * math.exp(-exposure / RISK_SCALE), 1),
+        }
+
+    def tile(self, z, x, y, size=256, now=None):
+        """RGBA heatmap for slippy-map tile z/x/y as PNG bytes"""
+        pixels = (np.arange(size) + 0.5) / size
+        lngs = (x + pixels) / 2 ** z * 360 - 180
+        lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixels) / 2 ** z))))
+        grid_lats, grid_lngs = np.meshgrid(lats, lngs, indexing='ij')
+        intensity = 1 - np.exp(-self.values(grid_lats.ravel(), grid_lngs.ravel(), now) / RISK_SCALE)
+        intensity = intensity.reshape(size, size)
+
+        # Yellow through orange to red, more opaque as the risk rises
+        image = np.zeros((size, size, 4), dtype=np.uint8)
+        image[..., 0] = 255
+        image[..., 1] = (220 * (1 - intensity)).astype(np.uint8)
+        image[..., 3] = (200 * np.sqrt(intensity)).astype(np.uint8)
+        output = io.BytesIO()
+        Image.fromarray(image, 'RGBA').save(output, format='PNG', optimize=True)
+        return output.getvalue()
+
+    def save(self, path):
+        staging = f'{path}.tmp'
+        with open(staging, 'wb') as output:
+            np.savez(output, grid=self.grid, meta=np.array(json.dumps(self.meta)))
+        os.replace(staging, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['grid'], json.loads(data['meta'].item()))
+
+
+def source_rows(source, after_id=0):
+    """(ids, lats, lngs, weights, timestamps) arrays of a source's rows with coordinates"""
+    queryset = source.model.objects.filter(
+        **{f'{source.lat}__isnull': False, f'{source.lng}__isnull': False, 'id__gt': after_id}
+    ).exclude(**source.exclude)
+    fields = ['id', source.lat, source.lng, source.time] + ([source.weight_field] if source.weight_field else [])
+    rows = list(queryset.values_list(*fields))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    lats = np.array([float(row[1]) for row in rows], dtype=np.float64)
+    lngs = np.array([float(row[2]) for row in rows], dtype=np.float64)
+    timestamps = np.array([row[3].timestamp() for row in rows], dtype=np.float64)
+    weights = np.array([
+        source.weights.get(row[4], source.default_weight) if source.weight_field else source.default_weight
+        for row in rows
+    ], dtype=np.float64)
+    return ids, lats, lngs, weights, timestamps
+
+
+def add_new_rows(surface):
+    """Deposit every source row newer than the surface's watermarks; returns the count"""
+    added = 0
+    for source in SOURCES:
+        ids, lats, lngs, weights, timestamps = source_rows(source, surface.meta['watermarks'].get(source.name, 0))
+        if len(ids):
+            surface.deposit(lats, lngs, weights, timestamps)
+            surface.meta['watermarks'][source.name] = int(ids.max())
+            added += len(ids)
+    return added
+
+
+def surface_path():
+    return getattr(settings, 'RISK_SURFACE_PATH', None)
+
+
+# Guards _loaded; held only to look up or swap a surface, never while building one
+_lock = threading.Lock()
+# One refresh at a time per process
+_refresh_lock = threading.Lock()
+# path (None for a process-local surface) -> (file mtime, RiskSurface)
+_loaded = {}
+_placeholder = None
+
+
+def current(path):
+    """The latest saved surface for path, or None; call with _lock held"""
+    if path is None:
+        loaded = _loaded.get(None)
+        return loaded[1] if loaded else None
+    if not os.path.exists(path):
+        return None
+    mtime = os.stat(path).st_mtime_ns
+    loaded = _loaded.get(path)
+    if loaded is None or loaded[0] != mtime:
+        loaded = _loaded[path] = (mtime, RiskSurface.load(path))
+    return loaded[1]
+
+
+def refresh(rebuild=False):
+    """Bring the surface up to date; returns (surface, rows added)"""
+    path = surface_path()
+    now = time.time()
+    with _refresh_lock:
+        with _lock:
+            previous = current(path)
+        if rebuild or previous is None or now - previous.meta['built_at'] > RISK_REBUILD_SECONDS:
+            surface = RiskSurface.empty(now=now)
+        else:
+            # Built on a copy: readers keep using the previous grid until the swap below
+            surface = RiskSurface(previous.grid.copy(), json.loads(json.dumps(previous.meta)))
+            surface.rebase(now)
+        added = add_new_rows(surface)
+        surface.meta['refreshed_at'] = now
+        if path:
+            surface.save(path)
+        with _lock:
+            _loaded[path] = (os.stat(path).st_mtime_ns if path else None, surface)
+    logger.info(f"Risk surface refreshed with {added} new incidents")
+    return surface, added
+
+
+@tasks.task(max_attempts=2)
+def refresh_surface():
+    """Background job: incremental refresh of the risk surface"""
+    refresh()
+
+
+def placeholder():
+    """An empty surface to answer with until the first refresh has finished"""
+    global _placeholder
+    if _placeholder is None:
+        _placeholder = RiskSurface.empty(now=0)
+    return _placeholder
+
+
+def get_surface():
+    """
+    The current surface, reloaded when another process saves a newer one.
+    Never builds one inline: before the first refresh it is empty, and a
+    stale surface is still returned, while a refresh job catches up.
+    """
+    with _lock:
+        surface = current(surface_path())
+    if surface is None or time.time() - surface.meta['refreshed_at'] > RISK_REFRESH_SECONDS:
+        window = int(time.time() // RISK_REFRESH_SECONDS)
+        tasks.enqueue(refresh_surface, idempotency_key=f'risk-refresh:{window}')
+    return surface or placeholder()
+
+
+def tile_png(z, x, y):
+    """PNG bytes of a heatmap tile, cached per saved surface version"""
+    surface = get_surface()
+    version = int(surface.meta['refreshed_at'])
+    key = f'aegis:risk-tile:{version}:{z}:{x}:{y}'
+    png = cache.get(key)
+    if png is None:
+        png = surface.tile(z, x, y)
+        cache.set(key, png, RISK_TILE_CACHE_SECONDS)
+    return png
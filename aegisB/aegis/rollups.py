@@ -0,0 +1,177 @@
+"""
+Materialized dashboard statistics.
+
+StatsRollup holds one row per (source, day, user, status, kind, severity,
+is_anonymous) bucket with a row count and summed measures. Signals in
+aegis/signals.py move a row's contribution between buckets on every save and
+delete, and `rebuild` recomputes everything from the source tables (see the
+rebuild_stats_rollups command). Dashboards opt in with the
+STATS_FROM_ROLLUPS setting or `?rollup=true`, and then read a number of rows
+proportional to the number of buckets instead of the number of records.
+
+Bulk operations (bulk_create, queryset.update/delete) skip the signals; run
+`rebuild` after them.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import EmergencyAlert, EmergencyIncidentReport, IncidentReport, StatsRollup, VideoEvidence
+from .stats import StatsQuery
+
+STATS_FROM_ROLLUPS = getattr(settings, 'STATS_FROM_ROLLUPS', False)
+
+# How a source model maps onto the rollup dimensions: model field names,
+# None when the model has no such dimension
+Source = namedtuple('Source', 'name time user status kind severity anonymous measures')
+
+SOURCES = {
+    IncidentReport: Source(
+        'incident_report', 'created_at', 'user', 'status', 'incident_type', 'priority', 'is_anonymous', ()
+    ),
+    EmergencyAlert: Source(
+        'emergency_alert', 'activated_at', 'user', 'status', 'emergency_type', 'severity_level', None, ()
+    ),
+    EmergencyIncidentReport: Source(
+        'emergency_incident_report', 'created_at', 'agent', 'status', 'incident_type', 'severity', 'is_anonymous', ()
+    ),
+    VideoEvidence: Source(
+        'video_evidence', 'created_at', 'user', 'status', 'type', None, 'is_anonymous',
+        ('duration_seconds', 'file_size')
+    ),
+}
+SOURCES_BY_NAME = {source.name: source for source in SOURCES.values()}
+
+DIMENSIONS = ['status', 'kind', 'severity']
+
+
+def _day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _source_fields(source):
+    """Model field (attname) -> rollup field"""
+    fields = {source.time: 'day', f'{source.user}_id': 'user_id'}
+    for dimension in DIMENSIONS:
+        if getattr(source, dimension):
+            fields[getattr(source, dimension)] = dimension
+    if source.anonymous:
+        fields[source.anonymous] = 'is_anonymous'
+    for measure in source.measures:
+        fields[measure] = measure
+    return fields
+
+
+def bucket_key(source, values, day):
+    key = {'source': source.name, 'day': day, 'user_id': values[f'{source.user}_id']}
+    for dimension in DIMENSIONS:
+        field = getattr(source, dimension)
+        key[dimension] = (values[field] or '') if field else ''
+    key['is_anonymous'] = bool(values[source.anonymous]) if source.anonymous else False
+    return key
+
+
+def contribution(source, values):
+    """(bucket key, measures) for a source row given as {model attname: value}"""
+    key = bucket_key(source, values, _day(values[source.time]))
+    measures = {measure: values[measure] or 0 for measure in source.measures}
+    return key, measures
+
+
+def instance_contribution(source, instance):
+    return contribution(source, {field: getattr(instance, field) for field in _source_fields(source)})
+
+
+def stored_contribution(model, source, pk):
+    """The contribution of the row as currently stored, or None"""
+    values = model.objects.filter(pk=pk).values(*_source_fields(source)).first()
+    return contribution(source, values) if values else None
+
+
+def apply(key, measures, sign):
+    """Add (sign=1) or remove (sign=-1) one row's contribution to its bucket"""
+    changes = {'row_count': F('row_count') + sign}
+    for measure, value in measures.items():
+        changes[measure] = F(measure) + sign * value
+    if StatsRollup.objects.filter(**key).update(**changes) or sign < 0:
+        return
+    try:
+        with transaction.atomic():
+            StatsRollup.objects.create(row_count=1, **key, **measures)
+    except IntegrityError:
+        # Created concurrently
+        StatsRollup.objects.filter(**key).update(**changes)
+
+
+def move(old, new):
+    """Move a row's contribution from `old` to `new` (either may be None)"""
+    if old == new:
+        return
+    if old:
+        apply(*old, sign=-1)
+    if new:
+        apply(*new, sign=1)
+
+
+# Rebuilding
+
+def rebuild_source(model, source):
+    """Recompute one source's buckets from its table; returns the number of buckets"""
+    fields = _source_fields(source)
+    group_by = [field for field in fields if field != source.time and field not in source.measures]
+    rows = (
+        model.objects.order_by()
+        .annotate(rollup_day=TruncDate(source.time))
+        .values('rollup_day', *group_by)
+        .annotate(rollup_count=Count('pk'), **{f'rollup_{m}': Sum(m) for m in source.measures})
+    )
+    buckets = []
+    for row in rows.iterator():
+        buckets.append(StatsRollup(
+            row_count=row['rollup_count'],
+            **bucket_key(source, row, row['rollup_day']),
+            **{measure: row[f'rollup_{measure}'] or 0 for measure in source.measures}
+        ))
+
+    with transaction.atomic():
+        StatsRollup.objects.filter(source=source.name).delete()
+        StatsRollup.objects.bulk_create(buckets, batch_size=500)
+    return len(buckets)
+
+
+def rebuild(names=None):
+    """Rebuild the named sources (all by default); returns {name: buckets}"""
+    return {
+        source.name: rebuild_source(model, source)
+        for model, source in SOURCES.items()
+        if names is None or source.name in names
+    }
+
+
+# Reading
+
+def requested(request):
+    """Whether a dashboard request should be served from rollups"""
+    value = request.query_params.get('rollup')
+    if value is None:
+        return STATS_FROM_ROLLUPS
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def stats_query(name, **filters):
+    """
+    A StatsQuery over the rollups of one source, accepting the source model's
+    field names. Time filters are applied at day granularity.
+    """
+    source = SOURCES_BY_NAME[name]
+    fields = _source_fields(source)
+    fields[source.user] = 'user'
+    queryset = StatsRollup.objects.filter(source=name)
+    query = StatsQuery(queryset, weight='row_count', fields=fields)
+    if filters:
+        query.queryset = queryset.filter(query.condition(**filters))
+    return query
@@ -0,0 +1,121 @@
+"""
+Content-addressed storage for computed routes.
+
+A route is keyed on what was asked for, not who asked: the routing profile,
+the origin cell (DIRECTIONS_PRECISION decimals, about 110 m), the
+destination (ROUTE_DESTINATION_PRECISION decimals, about 1 m) and the set of
+avoided locations. Every SafeRoute for the same trip points at one
+RouteGeometry, whose path is kept as an encoded polyline instead of the
+provider's raw JSON. The newest geometry for a key is reused without asking
+a routing engine again until it is ROUTE_CACHE_SECONDS old; then a fresh one
+is stored beside it, since older SafeRoutes still point at the old path.
+
+The GeoJSON for a geometry is built once and kept in the Django cache, so
+get_route_geojson only has to splice it into the response.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import polyline
+from .models import RouteGeometry
+from .openroute import DIRECTIONS_PRECISION, quantize
+
+ROUTE_CACHE_SECONDS = getattr(settings, 'ROUTE_CACHE_SECONDS', 24 * 3600)
+ROUTE_DESTINATION_PRECISION = 5
+ROUTE_HAZARD_PRECISION = 4
+# Full resolution of the local graph and OpenRouteService coordinates
+POLYLINE_PRECISION = 6
+DEFAULT_PROFILE = 'driving-car'
+
+
+def route_key(start, end, hazards=(), profile=DEFAULT_PROFILE):
+    """Key for a trip between [lng, lat] points avoiding (lat, lng) hazards"""
+    payload = json.dumps([
+        profile,
+        quantize(start[1], start[0], DIRECTIONS_PRECISION),
+        quantize(end[1], end[0], ROUTE_DESTINATION_PRECISION),
+        sorted({quantize(lat, lng, ROUTE_HAZARD_PRECISION) for lat, lng in hazards}),
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_key(geometry):
+    return f'route-geojson:{geometry.pk}'
+
+
+def lookup(key):
+    """The newest stored geometry for `key`, or None if missing or too old to trust"""
+    cutoff = timezone.now() - timedelta(seconds=ROUTE_CACHE_SECONDS)
+    return RouteGeometry.objects.filter(key=key, created_at__gte=cutoff).order_by('-created_at').first()
+
+
+def store(key, route_data):
+    """Save directions in OpenRouteService's shape as the newest geometry for `key`"""
+    feature = route_data['features'][0]
+    summary = feature['properties']['summary']
+    fields = {
+        'polyline': polyline.encode(
+            [(lat, lng) for lng, lat in feature['geometry']['coordinates']], POLYLINE_PRECISION
+        ),
+        'distance_m': summary['distance'],
+        'duration_s': summary['duration'],
+        'bbox': feature.get('bbox', route_data.get('bbox', [])),
+        'engine': feature['properties'].get('engine', 'openroute'),
+    }
+    return RouteGeometry.objects.create(key=key, **fields)
+
+
+def coordinates(geometry):
+    """The path of a RouteGeometry as [lng, lat] pairs"""
+    return [[lng, lat] for lat, lng in polyline.decode(geometry.polyline, POLYLINE_PRECISION)]
+
+
+def geojson_geometry(geometry):
+    """GeoJSON LineString text for a RouteGeometry, built once per row"""
+    text = cache.get(cache_key(geometry))
+    if text is None:
+        text = json.dumps({'type': 'LineString', 'coordinates': coordinates(geometry)})
+        cache.set(cache_key(geometry), text, ROUTE_CACHE_SECONDS)
+    return text
+
+
+def geojson_chunks(route):
+    """
+    A SafeRoute as the get_route_geojson response body, in pieces: the route
+    line from the prebuilt geometry text, then a point per avoided location
+    """
+    if route.geometry_id is not None:
+        line = geojson_geometry(route.geometry)
+    else:
+        line = json.dumps({'type': 'LineString', 'coordinates': route.route_data.get('route_path', [])})
+
+    yield '{"success": true, "data": {"type": "FeatureCollection", "features": ['
+    yield '{"type": "Feature", "properties": '
+    yield json.dumps({
+        'name': f'Route to {route.destination}',
+        'distance': route.route_data.get('distance'),
+        'duration': route.route_data.get('duration'),
+    })
+    yield ', "geometry": '
+    yield line
+    yield '}'
+    for location in route.avoided_locations:
+        yield ', '
+        yield json.dumps({
+            'type': 'Feature',
+            'properties': {
+                'name': f"Avoided: {location['address']}",
+                'type': location['type'],
+                'marker-color': '#ff0000'
+            },
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [location['lng'], location['lat']]
+            }
+        })
+    yield ']}}'
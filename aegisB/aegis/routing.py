@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/emergency/<str:alert_id>/', consumers.EmergencyConsumer.as_asgi()),
+    path('ws/notifications/', consumers.UserConsumer.as_asgi()),
+]
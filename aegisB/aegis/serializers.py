@@ -1,15 +1,47 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.urls import reverse
+from . import crypto, polyline, streaming, tracks
 from .models import (
     EmergencyAlert, EmergencyIncidentReport, EmergencyNotification, EmergencyReportEvidence, EmergencyResponse, IncidentUpdate, LocationUpdate, MediaCapture, NavigationSession, ResourceCategory, ExternalLink, QuizOption, QuizQuestion,
     LearningResource, SafeLocation, SafeRoute, SafetyCheckIn, SafetyCheckSettings, UserProgress, UserQuizAttempt,EmergencyContact,
-    IncidentReport, IncidentMedia, VideoEvidence,
+    IncidentReport, IncidentMedia, UploadSession, VideoEvidence,
 
 )
 
 User = get_user_model()
 
+
+class DerivativeUrlsMixin(serializers.Serializer):
+    """thumbnail_url / preview_url of media with derivatives (aegis/derivatives.py); null until they are made"""
+    thumbnail_url = serializers.SerializerMethodField()
+    preview_url = serializers.SerializerMethodField()
+
+    def derivative_url(self, obj, variant):
+        field = getattr(obj, variant)
+        if not field:
+            return None
+        if crypto.is_encrypted(field):
+            # Only the streaming endpoint can decrypt it
+            return f"{reverse('stream-media', args=[streaming.KINDS[type(obj)], obj.pk])}?variant={variant}"
+        return field.url
+
+    def get_thumbnail_url(self, obj):
+        return self.derivative_url(obj, 'thumbnail')
+
+    def get_preview_url(self, obj):
+        return self.derivative_url(obj, 'preview')
+
+class StreamUrlMixin(serializers.Serializer):
+    """stream_url: the access-checked, Range-capable download of the file (aegis/streaming.py)"""
+    stream_url = serializers.SerializerMethodField()
+
+    def get_stream_url(self, obj):
+        if streaming.source_file(obj):
+            return reverse('stream-media', args=[streaming.KINDS[type(obj)], obj.pk])
+        return None
+
 class EmergencyContactSerializer(serializers.ModelSerializer):
     photo = serializers.SerializerMethodField()
     
@@ -183,10 +215,10 @@ class UserQuizAttemptSerializer(serializers.ModelSerializer):
 
 # report
 
-class IncidentMediaSerializer(serializers.ModelSerializer):
+class IncidentMediaSerializer(StreamUrlMixin, DerivativeUrlsMixin, serializers.ModelSerializer):
     class Meta:
         model = IncidentMedia
-        fields = ('id', 'media_type', 'file', 'caption', 'created_at')
+        fields = ('id', 'media_type', 'file', 'stream_url', 'thumbnail_url', 'preview_url', 'caption', 'created_at')
         read_only_fields = ('id', 'created_at')
 
 class IncidentUpdateSerializer(serializers.ModelSerializer):
@@ -314,7 +346,7 @@ class TestAlertSerializer(serializers.Serializer):
 
 # silent capture or evidence
 
-class VideoEvidenceSerializer(serializers.ModelSerializer):
+class VideoEvidenceSerializer(StreamUrlMixin, DerivativeUrlsMixin, serializers.ModelSerializer):
     user_email = serializers.CharField(source='user.email', read_only=True)
     file_size_display = serializers.CharField(source='get_file_size_display', read_only=True)
     duration_display = serializers.CharField(source='get_duration_display', read_only=True)
@@ -324,8 +356,8 @@ class VideoEvidenceSerializer(serializers.ModelSerializer):
     class Meta:
         model = VideoEvidence
         fields = (
-            'id', 'user', 'user_email', 'title', 'video_file', 'video_url',
-            'location_lat', 'location_lng', 'location_address', 'recorded_at',
+            'id', 'user', 'user_email', 'title', 'video_file', 'video_url', 'stream_url',
+            'thumbnail_url', 'preview_url', 'location_lat', 'location_lng', 'location_address', 'recorded_at',
             'is_anonymous', 'duration_seconds', 'duration_display',
             'file_size', 'file_size_display', 'status', 'type',
             'created_at', 'updated_at', 'can_edit'
@@ -375,6 +407,8 @@ class VideoEvidenceStatusSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid status")
         return value
 
+VIDEO_EXTENSIONS = ['mp4', 'mov', 'avi', 'mkv', 'webm']
+
 class VideoUploadSerializer(serializers.Serializer):
     video_file = serializers.FileField(
         max_length=100 * 1024 * 1024,
@@ -383,12 +417,11 @@ class VideoUploadSerializer(serializers.Serializer):
     media_type = serializers.CharField(default='video')
 
     def validate_video_file(self, value):
-        allowed_extensions = ['mp4', 'mov', 'avi', 'mkv', 'webm']
         file_extension = value.name.split('.')[-1].lower()
         
-        if file_extension not in allowed_extensions:
+        if file_extension not in VIDEO_EXTENSIONS:
             raise serializers.ValidationError(
-                f"Unsupported video format. Allowed formats: {', '.join(allowed_extensions)}"
+                f"Unsupported video format. Allowed formats: {', '.join(VIDEO_EXTENSIONS)}"
             )
 
         if not value.content_type.startswith('video/'):
@@ -447,6 +480,9 @@ class EmergencyAlertSerializer(serializers.ModelSerializer):
         return None
     
     def get_responders_count(self, obj):
+        # List endpoints annotate this via EmergencyAlert.objects.with_list_data()
+        if hasattr(obj, 'responders_total'):
+            return obj.responders_total
         return obj.responses.count()
 
 class LocationUpdateSerializer(serializers.ModelSerializer):
@@ -455,12 +491,23 @@ class LocationUpdateSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['timestamp']
 
-class MediaCaptureSerializer(serializers.ModelSerializer):
+class MediaCaptureSerializer(StreamUrlMixin, DerivativeUrlsMixin, serializers.ModelSerializer):
+    # MEDIA_URL would serve the ciphertext; only the streaming endpoint can decrypt it
+    file = serializers.SerializerMethodField()
+
     class Meta:
         model = MediaCapture
-        fields = '__all__'
+        # thumbnail/preview are encrypted too; thumbnail_url/preview_url stream them
+        exclude = ['thumbnail', 'preview']
         read_only_fields = ['captured_at']
 
+    def get_file(self, obj):
+        if not obj.file:
+            return None
+        if crypto.is_encrypted(obj.file):
+            return self.get_stream_url(obj)
+        return obj.file.url
+
 class EmergencyResponseSerializer(serializers.ModelSerializer):
     responder_info = ResponderSerializer(source='responder', read_only=True)
     alert_info = EmergencyAlertSerializer(source='alert', read_only=True)
@@ -499,18 +546,97 @@ class LocationUpdateRequestSerializer(serializers.Serializer):
     altitude = serializers.FloatField(required=False)
     heading = serializers.FloatField(required=False)
 
+class LocationPointSerializer(serializers.Serializer):
+    latitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=9, decimal_places=6, min_value=-180, max_value=180)
+    timestamp = serializers.DateTimeField()
+    accuracy = serializers.FloatField(required=False)
+    speed = serializers.FloatField(required=False)
+    altitude = serializers.FloatField(required=False)
+    heading = serializers.FloatField(required=False, min_value=0, max_value=360)
+
+class LocationBatchSerializer(serializers.Serializer):
+    """
+    A buffered track, either as `points` or as an encoded `polyline` with one
+    entry in `timestamps` per point.
+    """
+    MAX_POINTS = 1000
+
+    alert_id = serializers.CharField(max_length=20, required=True)
+    points = serializers.ListField(child=serializers.DictField(), required=False, max_length=MAX_POINTS)
+    polyline = serializers.CharField(required=False)
+    timestamps = serializers.ListField(child=serializers.DateTimeField(), required=False, max_length=MAX_POINTS)
+    precision = serializers.ChoiceField(choices=[5, 6], default=5)
+
+    def validate(self, attrs):
+        if ('points' in attrs) == ('polyline' in attrs):
+            raise serializers.ValidationError('Provide either points or polyline')
+
+        if 'polyline' in attrs:
+            try:
+                coordinates = polyline.decode(attrs.pop('polyline'), attrs['precision'])
+            except ValueError as e:
+                raise serializers.ValidationError({'polyline': str(e)})
+            timestamps = attrs.pop('timestamps', [])
+            if len(timestamps) != len(coordinates):
+                raise serializers.ValidationError({'timestamps': 'Expected one timestamp per polyline point'})
+            if len(coordinates) > self.MAX_POINTS:
+                raise serializers.ValidationError({'polyline': f'At most {self.MAX_POINTS} points per batch'})
+            attrs['points'] = [
+                {'latitude': f'{lat:.6f}', 'longitude': f'{lng:.6f}', 'timestamp': timestamp}
+                for (lat, lng), timestamp in zip(coordinates, timestamps)
+            ]
+
+        points = LocationPointSerializer(data=attrs['points'], many=True)
+        if not points.is_valid():
+            raise serializers.ValidationError({'points': points.errors})
+        attrs['points'] = points.validated_data
+        return attrs
+
 class MediaUploadSerializer(serializers.Serializer):
     alert_id = serializers.CharField(max_length=20, required=True)
     media_type = serializers.ChoiceField(choices=MediaCapture.MEDIA_TYPES)
     file = serializers.FileField(required=True)
     duration = serializers.IntegerField(required=False, allow_null=True)
 
+class UploadStartSerializer(serializers.Serializer):
+    """Start of a resumable upload, for a VideoEvidence record or an alert's media"""
+    target = serializers.ChoiceField(choices=UploadSession.TARGET_CHOICES)
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    evidence_id = serializers.IntegerField(required=False)
+    alert_id = serializers.CharField(max_length=20, required=False)
+    media_type = serializers.ChoiceField(choices=MediaCapture.MEDIA_TYPES, required=False)
+    duration = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        if attrs['target'] == 'video_evidence':
+            if 'evidence_id' not in attrs:
+                raise serializers.ValidationError({'evidence_id': 'This field is required.'})
+            if attrs['filename'].split('.')[-1].lower() not in VIDEO_EXTENSIONS:
+                raise serializers.ValidationError({'filename': (
+                    f"Unsupported video format. Allowed formats: {', '.join(VIDEO_EXTENSIONS)}"
+                )})
+            if attrs['content_type'] and not attrs['content_type'].startswith('video/'):
+                raise serializers.ValidationError({'content_type': 'Uploaded file must be a video'})
+        else:
+            for field in ('alert_id', 'media_type'):
+                if field not in attrs:
+                    raise serializers.ValidationError({field: 'This field is required.'})
+        return attrs
+
 class ResponderAssignmentSerializer(serializers.Serializer):
     alert_id = serializers.CharField(max_length=20, required=True)
     responder_id = serializers.IntegerField(required=True)
 
 class EmergencyAlertDetailSerializer(EmergencyAlertSerializer):
-    location_updates = LocationUpdateSerializer(many=True, read_only=True)
+    # Latest rows only; the whole path is in `track`, downsampled
+    LOCATION_UPDATES_LIMIT = 50
+    TRACK_MAX_POINTS = 500
+
+    location_updates = serializers.SerializerMethodField()
+    track = serializers.SerializerMethodField()
     media_captures = MediaCaptureSerializer(many=True, read_only=True)
     responses = EmergencyResponseSerializer(many=True, read_only=True)
     emergency_contacts = serializers.SerializerMethodField()
@@ -519,6 +645,15 @@ class EmergencyAlertDetailSerializer(EmergencyAlertSerializer):
         fields = "__all__"
 
 
+    def get_location_updates(self, obj):
+        updates = obj.location_updates.order_by('-timestamp')[:self.LOCATION_UPDATES_LIMIT]
+        return LocationUpdateSerializer(updates, many=True).data
+
+    def get_track(self, obj):
+        request = self.context.get('request')
+        params = request.query_params if request else {}
+        return tracks.track_for_request(obj, params, max_points=self.TRACK_MAX_POINTS)
+
     def get_emergency_contacts(self, obj):
         # Use your existing EmergencyContact model
         contacts = EmergencyContact.objects.filter(
@@ -529,12 +664,12 @@ class EmergencyAlertDetailSerializer(EmergencyAlertSerializer):
     
 
 
-class EmergencyReportEvidenceSerializer(serializers.ModelSerializer):
+class EmergencyReportEvidenceSerializer(StreamUrlMixin, DerivativeUrlsMixin, serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
     
     class Meta:
         model = EmergencyReportEvidence
-        fields = ['id', 'file', 'file_type', 'uploaded_at', 'file_url']
+        fields = ['id', 'file', 'file_type', 'uploaded_at', 'file_url', 'stream_url', 'thumbnail_url', 'preview_url']
         read_only_fields = ['id', 'uploaded_at']
     
     def get_file_url(self, obj):
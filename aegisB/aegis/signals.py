@@ -0,0 +1,102 @@
+"""
+Record an AlertEvent whenever something shown by the emergency updates
+endpoint changes, so pollers can ask for changes after a cursor, keep the
+dashboard StatsRollup buckets in step with their source tables, read the
+duration and resolution of saved media files and queue their thumbnails.
+
+Bulk operations (bulk_create, queryset.update) skip these signals; code using
+them must call `record_events` itself.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import derivatives, media_probe, rollups
+
+from .models import (
+    AlertEvent, EmergencyAlert, EmergencyNotification, EmergencyResponse, LocationUpdate, MediaCapture,
+    VideoEvidence
+)
+
+
+def record_events(kind, objects):
+    """Record one event per object; objects must have `id` and `alert_id`"""
+    AlertEvent.objects.bulk_create([
+        AlertEvent(alert_id=obj.alert_id, kind=kind, object_id=obj.id)
+        for obj in objects
+        if obj.alert_id
+    ])
+
+
+@receiver(post_save, sender=EmergencyAlert)
+def alert_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        AlertEvent.objects.create(alert=instance, kind='alert', object_id=instance.id)
+
+
+@receiver(post_save, sender=LocationUpdate)
+def location_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_events('location', [instance])
+
+
+@receiver(post_save, sender=MediaCapture)
+def media_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_events('media', [instance])
+
+
+@receiver(post_save, sender=EmergencyResponse)
+def response_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_events('response', [instance])
+
+
+@receiver(post_save, sender=EmergencyNotification)
+def notification_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_events('notification', [instance])
+
+
+@receiver(post_save, sender=VideoEvidence)
+@receiver(post_save, sender=MediaCapture)
+def media_file_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        media_probe.probe_saved(instance)
+
+
+def derivatives_post_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        derivatives.schedule(instance)
+
+
+def derivatives_post_delete(sender, instance, **kwargs):
+    derivatives.delete_files(instance)
+
+
+for model in derivatives.SOURCES:
+    post_save.connect(derivatives_post_save, sender=model, dispatch_uid=f'derivatives_post_save_{model.__name__}')
+    post_delete.connect(derivatives_post_delete, sender=model, dispatch_uid=f'derivatives_post_delete_{model.__name__}')
+
+
+# Dashboard rollups
+
+def rollup_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding and instance.pk:
+        instance._rollup_previous = rollups.stored_contribution(sender, rollups.SOURCES[sender], instance.pk)
+
+
+def rollup_post_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_rollup_previous', None)
+    rollups.move(previous, rollups.instance_contribution(rollups.SOURCES[sender], instance))
+
+
+def rollup_post_delete(sender, instance, **kwargs):
+    rollups.move(rollups.instance_contribution(rollups.SOURCES[sender], instance), None)
+
+
+for model in rollups.SOURCES:
+    pre_save.connect(rollup_pre_save, sender=model, dispatch_uid=f'rollup_pre_save_{model.__name__}')
+    post_save.connect(rollup_post_save, sender=model, dispatch_uid=f'rollup_post_save_{model.__name__}')
+    post_delete.connect(rollup_post_delete, sender=model, dispatch_uid=f'rollup_post_delete_{model.__name__}')
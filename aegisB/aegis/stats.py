@@ -0,0 +1,100 @@
+"""
+Dashboard statistics in a single aggregate query.
+
+    stats = (
+        StatsQuery(VideoEvidence.objects.filter(user=user))
+        .count('total')
+        .count('anonymous', is_anonymous=True)
+        .sum('total_size', 'file_size')
+        .count_choices('by_status', 'status', VideoEvidence.STATUS_CHOICES)
+        .run()
+    )
+
+Every statistic becomes a conditional aggregate (`Count(filter=Q(...))`,
+`Sum`, `Max`, ...) in one `aggregate()` call, so the number of queries does
+not depend on how many statuses or types a dashboard shows.
+
+The same builder reads pre-aggregated tables (see aegis/rollups.py): `weight`
+names the column holding each row's record count, and `fields` maps the
+field names used by the caller onto the table's columns.
+"""
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+class StatsQuery:
+    def __init__(self, queryset, weight=None, fields=None):
+        self.queryset = queryset
+        self.weight = weight
+        self.fields = fields or {}
+        self._aggregates = {}
+        self._paths = []
+        self._breakdowns = []
+
+    def _field(self, name):
+        return self.fields.get(name, name)
+
+    def condition(self, *conditions, **lookups):
+        translated = {}
+        for lookup, value in lookups.items():
+            field, separator, rest = lookup.partition('__')
+            translated[self._field(field) + separator + rest] = value
+        return Q(*conditions, **translated)
+
+    def _count(self, condition):
+        if self.weight:
+            return Coalesce(Sum(self.weight, filter=condition or None), Value(0))
+        return Count('pk', filter=condition or None)
+
+    def _add(self, path, expression):
+        alias = f'stat_{len(self._paths)}'
+        self._aggregates[alias] = expression
+        self._paths.append((path, alias))
+        return self
+
+    def count(self, name, *conditions, **lookups):
+        """Number of rows, optionally restricted by Q objects / field lookups"""
+        return self._add((name,), self._count(self.condition(*conditions, **lookups)))
+
+    def count_choices(self, name, field, choices):
+        """{choice value: count} for every entry of a model `choices` list"""
+        for value, _ in choices:
+            self._add((name, value), self._count(self.condition(**{field: value})))
+        return self
+
+    def sum(self, name, field, *conditions, **lookups):
+        """Sum of a numeric field, 0 when there are no rows"""
+        condition = self.condition(*conditions, **lookups)
+        return self._add((name,), Coalesce(Sum(self._field(field), filter=condition or None), Value(0)))
+
+    def max(self, name, field, *conditions, **lookups):
+        condition = self.condition(*conditions, **lookups)
+        return self._add((name,), Max(self._field(field), filter=condition or None))
+
+    def min(self, name, field, *conditions, **lookups):
+        condition = self.condition(*conditions, **lookups)
+        return self._add((name,), Min(self._field(field), filter=condition or None))
+
+    def breakdown(self, name, field):
+        """[{field: value, 'count': n}, ...] for the values present; one extra GROUP BY query"""
+        self._breakdowns.append((name, field))
+        return self
+
+    def run(self):
+        result = {}
+        if self._aggregates:
+            row = self.queryset.aggregate(**self._aggregates)
+            for path, alias in self._paths:
+                target = result
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = row[alias]
+
+        for name, field in self._breakdowns:
+            column = self._field(field)
+            rows = (
+                self.queryset.order_by().values(column)
+                .annotate(count=self._count(Q())).filter(count__gt=0).order_by(column)
+            )
+            result[name] = [{field: row[column], 'count': row['count']} for row in rows]
+        return result
@@ -0,0 +1,181 @@
+"""
+Access-checked downloads of evidence files, with Range support for scrubbing
+through videos.
+
+`serve` answers conditional requests (If-None-Match, If-Modified-Since) from
+the file's size and mtime without opening it. A single `bytes=` range gets a
+206; multiple ranges fall back to the whole file. The body is a FileResponse
+over the open file. WSGI servers with a file_wrapper (gunicorn, uWSGI) send it
+with sendfile(), starting at the current offset and stopping at
+Content-Length, so the bytes never pass through Python.
+
+Behind a web server MEDIA_SENDFILE hands the transfer off entirely:
+
+- 'x-accel-redirect' (nginx): MEDIA_ACCEL_PREFIX must be an `internal`
+  location aliased to MEDIA_ROOT
+- 'x-sendfile' (Apache mod_xsendfile, lighttpd): the absolute path is sent
+
+Files encrypted at rest (aegis/crypto.py) are decrypted segment by segment
+and sent from Django, since the web server would only see ciphertext. Files
+in remote storage redirect to the storage's own URL.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+from . import crypto
+from .models import EmergencyReportEvidence, IncidentMedia, MediaCapture, VideoEvidence
+
+MEDIA_STREAM_MAX_AGE = getattr(settings, 'MEDIA_STREAM_MAX_AGE', 3600)
+
+# URL kind -> (model, original file field)
+SOURCES = {
+    'evidence': (VideoEvidence, 'video_file'),
+    'emergency': (MediaCapture, 'file'),
+    'incident': (IncidentMedia, 'file'),
+    'report': (EmergencyReportEvidence, 'file'),
+}
+KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+VARIANTS = ('thumbnail', 'preview')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    Bytes start..start+length of an open file. Keeps fileno() so a WSGI
+    file_wrapper can still sendfile() it from the current offset.
+    """
+
+    def __init__(self, f, start, length):
+        f.seek(start)
+        self.file = f
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def can_access(user, instance):
+    if isinstance(instance, VideoEvidence):
+        return instance.user_can_access(user)
+    if user.user_type in ['controller', 'admin']:
+        return True
+    if isinstance(instance, MediaCapture):
+        return instance.alert.user_id == user.id or instance.alert.responses.filter(responder=user).exists()
+    if isinstance(instance, IncidentMedia):
+        return instance.incident.user_id == user.id
+    return instance.report.agent_id == user.id or instance.report.emergency.user_id == user.id
+
+
+def source_file(instance, variant=None):
+    """The original file of an instance, or its thumbnail/preview"""
+    if variant:
+        return getattr(instance, variant)
+    return getattr(instance, SOURCES[KINDS[type(instance)]][1])
+
+
+def parse_range(header, size):
+    """
+    (first, last) byte of a single-range Range header, or None to send the
+    whole file; raises ValueError if the range starts past the end
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(size - int(last), 0), size - 1
+        if not int(last):
+            raise ValueError('Range not satisfiable')
+    if start >= size:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def serve(request, field):
+    try:
+        path = field.path
+    except NotImplementedError:
+        return HttpResponseRedirect(field.url)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('File not found')
+
+    encrypted = crypto.is_encrypted(field)
+    size = field.storage.size(field.name) if encrypted else stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        sendfile = None if encrypted else getattr(settings, 'MEDIA_SENDFILE', None)
+        if sendfile == 'x-accel-redirect':
+            # nginx does the Range handling itself
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(field.name)
+        elif sendfile == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        elif encrypted:
+            response = file_response(request, lambda: field.storage.open(field.name, 'rb'), os.path.basename(path),
+                                     size, etag, last_modified, content_type)
+            # Whole segments per read instead of FileResponse's 4 KB
+            response.block_size = crypto.SEGMENT_SIZE
+        else:
+            response = file_response(request, lambda: open(path, 'rb'), os.path.basename(path),
+                                     size, etag, last_modified, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = f'private, max-age={MEDIA_STREAM_MAX_AGE}'
+    return response
+
+
+def file_response(request, opener, filename, size, etag, last_modified, content_type):
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    # A Range for an older copy of the file gets the whole current file
+    if not if_range or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    f = opener()
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type, filename=filename)
+        response['Content-Length'] = size
+        return response
+
+    start, end = byte_range
+    response = FileResponse(FileRange(f, start, end - start + 1), status=206, content_type=content_type,
+                            filename=filename)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = end - start + 1
+    return response
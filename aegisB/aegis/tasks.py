@@ -0,0 +1,194 @@
+"""
+Background jobs for work that should not hold up a request.
+
+    @tasks.task(max_attempts=5)
+    def notify_contact(alert_id, contact_id):
+        ...
+
+    tasks.enqueue(notify_contact, alert.id, contact.id, idempotency_key=f'contact:{alert.alert_id}:{contact.id}')
+
+Jobs are plain module-level functions, referenced by dotted path, called with
+JSON-serializable arguments. A job must tolerate running more than once:
+retries re-run it after a failure, and `idempotency_key` only stops the same
+job from being queued twice.
+
+TASK_BACKEND picks where jobs run:
+
+- 'immediate': in the calling process when the surrounding transaction
+  commits. Useful for tests and scripts.
+- 'thread': on an in-process thread pool (TASK_THREADS workers) once the
+  transaction commits. Nothing survives a process restart.
+- 'database': stored as BackgroundJob rows in the caller's transaction, so a
+  job exists exactly when the data it refers to does, and executed by
+  `python manage.py run_jobs`.
+"""
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+TASK_THREADS = getattr(settings, 'TASK_THREADS', 4)
+# Jobs left 'running' this long are assumed to belong to a dead worker
+TASK_LOCK_TIMEOUT = getattr(settings, 'TASK_LOCK_TIMEOUT', 300)
+# How long in-process backends remember idempotency keys
+TASK_IDEMPOTENCY_TTL = getattr(settings, 'TASK_IDEMPOTENCY_TTL', 24 * 3600)
+
+
+def task(max_attempts=3, backoff=2.0):
+    """Mark a function as a job; failures are retried after backoff ** attempt seconds"""
+    def decorate(func):
+        func.max_attempts = max_attempts
+        func.backoff = backoff
+        return func
+    return decorate
+
+
+def task_path(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def retry_delay(func, attempt):
+    return getattr(func, 'backoff', 2.0) ** attempt
+
+
+def run_with_retries(func, args, kwargs, sleep):
+    """Call func, retrying up to its max_attempts; `sleep` waits between tries"""
+    max_attempts = getattr(func, 'max_attempts', 1)
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            logger.exception(f"Job {task_path(func)} failed (attempt {attempt}/{max_attempts})")
+            if attempt == max_attempts:
+                return None
+            sleep(retry_delay(func, attempt))
+
+
+class ImmediateBackend:
+    def submit(self, func, args, kwargs):
+        run_with_retries(func, args, kwargs, sleep=lambda seconds: None)
+
+    def enqueue(self, func, args, kwargs, idempotency_key=None):
+        def submit_once():
+            # Reserved only once committed, so a rolled back enqueue leaves the key free
+            if idempotency_key and not cache.add(f'aegis:job:{idempotency_key}', 1, TASK_IDEMPOTENCY_TTL):
+                return
+            self.submit(func, args, kwargs)
+        transaction.on_commit(submit_once)
+
+
+class ThreadBackend(ImmediateBackend):
+    def __init__(self, workers=TASK_THREADS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='aegis-jobs')
+
+    def _run(self, func, args, kwargs):
+        try:
+            run_with_retries(func, args, kwargs, sleep=time.sleep)
+        finally:
+            close_old_connections()
+
+    def submit(self, func, args, kwargs):
+        self.executor.submit(self._run, func, args, kwargs)
+
+
+class DatabaseBackend:
+    def enqueue(self, func, args, kwargs, idempotency_key=None):
+        fields = {
+            'task': task_path(func),
+            'args': list(args),
+            'kwargs': kwargs,
+            'max_attempts': getattr(func, 'max_attempts', 1),
+        }
+        if idempotency_key:
+            BackgroundJob.objects.get_or_create(idempotency_key=idempotency_key, defaults=fields)
+        else:
+            BackgroundJob.objects.create(**fields)
+
+
+BACKENDS = {
+    'immediate': ImmediateBackend,
+    'thread': ThreadBackend,
+    'database': DatabaseBackend,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    name = getattr(settings, 'TASK_BACKEND', 'thread')
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = BACKENDS[name]()
+        return _backends[name]
+
+
+def enqueue(func, *args, idempotency_key=None, **kwargs):
+    """Queue func(*args, **kwargs) to run after the current transaction commits"""
+    get_backend().enqueue(func, args, kwargs, idempotency_key=idempotency_key)
+
+
+# Database backend worker
+
+def claim(limit=10):
+    """Mark up to `limit` due jobs as running and return them"""
+    now = timezone.now()
+    due = (
+        Q(status='pending', run_after__lte=now) |
+        Q(status='running', locked_at__lt=now - timedelta(seconds=TASK_LOCK_TIMEOUT))
+    )
+    claimed = []
+    for job_id in BackgroundJob.objects.filter(due).values_list('id', flat=True)[:limit]:
+        # Another worker may have claimed it since the select
+        if BackgroundJob.objects.filter(due, id=job_id).update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        ):
+            claimed.append(BackgroundJob.objects.get(id=job_id))
+    return claimed
+
+
+def run_job(job):
+    func = None
+    try:
+        func = import_string(job.task)
+        func(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        logger.error(f"Job {job.id} {job.task} failed (attempt {job.attempts}/{job.max_attempts})")
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(func, job.attempts))
+    else:
+        job.status = 'done'
+        job.finished_at = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=['status', 'last_error', 'run_after', 'locked_at', 'finished_at'])
+    return job.status == 'done'
+
+
+def run_pending(limit=None, batch=10):
+    """Run due jobs until none are left (or `limit` were run); returns the number run"""
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim(batch if limit is None else min(batch, limit - count))
+        if not jobs:
+            break
+        for job in jobs:
+            run_job(job)
+            count += 1
+    return count
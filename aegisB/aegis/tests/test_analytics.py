@@ -0,0 +1,106 @@
+from datetime import timedelta
+import numpy as np
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, EmergencyResponse
+from .. import analytics
+
+
+class ResponseTimeAnalyticsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.victim = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password=None,
+            full_name='Victim'
+        )
+        self.controller = CustomUser.objects.create_user(
+            email='controller@example.com',
+            password=None,
+            full_name='Controller',
+            user_type='controller'
+        )
+        self.agents = [
+            CustomUser.objects.create_user(
+                email=f'agent{i}@example.com',
+                password=None,
+                full_name=f'Agent {i}',
+                user_type='agent',
+                agent_id=f'AG{i}',
+                responder_type='police'
+            )
+            for i in range(2)
+        ]
+        now = timezone.now()
+        # Agent 0 accepts after 1..10 minutes and arrives 5 minutes later;
+        # agent 1 is notified but never accepts
+        for i in range(10):
+            alert = EmergencyAlert.objects.create(user=self.victim)
+            notified = now - timedelta(hours=1)
+            EmergencyResponse.objects.create(
+                alert=alert,
+                responder=self.agents[0],
+                notified_at=notified,
+                accepted_at=notified + timedelta(minutes=i + 1),
+                arrived_at=notified + timedelta(minutes=i + 6)
+            )
+            EmergencyResponse.objects.create(alert=alert, responder=self.agents[1], notified_at=notified)
+        self.last_alert = alert
+
+    def login(self, user):
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def test_distribution(self):
+        result = analytics.distribution(np.array([60.0, np.nan, 120.0, -5.0, 180.0]))
+        self.assertEqual(result['count'], 3)
+        self.assertEqual(result['mean'], 120.0)
+        self.assertEqual(result['p50'], 120.0)
+        self.assertIsNone(analytics.distribution(np.array([np.nan]))['p90'])
+
+    def test_emergency_statistics_uses_real_response_times(self):
+        self.login(self.victim)
+        data = self.client.get(reverse('emergency-statistics')).data['data']
+        # Mean notified -> arrived is 10.5 minutes
+        self.assertEqual(data['avg_response_time'], 10.5)
+        metrics = data['response_times']['metrics']
+        self.assertEqual(metrics['notify_to_accept']['count'], 10)
+        self.assertEqual(metrics['accept_to_arrive']['p50'], 300.0)
+        self.assertEqual(data['response_times']['responses'], 20)
+
+    def test_controller_report_per_responder(self):
+        self.login(self.controller)
+        data = self.client.get(reverse('response-time-analytics'), {'days': 7}).data['data']
+        self.assertEqual(data['window_days'], 7)
+        responders = {row['responder_id']: row for row in data['responders']}
+        self.assertEqual(responders[self.agents[0].id]['metrics']['total']['count'], 10)
+        self.assertEqual(responders[self.agents[1].id]['metrics']['total']['count'], 0)
+
+        alert_data = self.client.get(
+            reverse('response-time-analytics'), {'alert_id': self.last_alert.alert_id}
+        ).data['data']
+        self.assertEqual(alert_data['responses'], 2)
+        self.assertEqual(alert_data['metrics']['notify_to_accept']['mean'], 600.0)
+
+    def test_agent_sees_only_own_times(self):
+        self.login(self.agents[0])
+        data = self.client.get(reverse('response-time-analytics')).data['data']
+        self.assertEqual(data['responses'], 10)
+        self.assertNotIn('responders', data)
+
+    def test_victim_is_forbidden(self):
+        self.login(self.victim)
+        response = self.client.get(reverse('response-time-analytics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_report_is_cached_within_bucket(self):
+        first = analytics.for_controller(30)
+        EmergencyResponse.objects.filter(responder=self.agents[1]).delete()
+        self.assertEqual(analytics.for_controller(30), first)
+        cache.clear()
+        self.assertEqual(analytics.for_controller(30)['responses'], 10)
@@ -0,0 +1,152 @@
+import base64
+import io
+import os
+import tempfile
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, MediaCapture
+from ..serializers import MediaCaptureSerializer
+from .. import crypto
+
+KEY_A = base64.urlsafe_b64encode(b'a' * 32).decode()
+KEY_B = base64.urlsafe_b64encode(b'b' * 32).decode()
+
+
+def encrypt(data, segment_size=16):
+    return b''.join(crypto.encrypt_chunks([data[:7], data[7:]], segment_size))
+
+
+def decrypt(ciphertext):
+    return crypto.DecryptingFile(io.BytesIO(ciphertext))
+
+
+class SegmentedEncryptionTest(TestCase):
+    def test_round_trip(self):
+        for size in (0, 1, 15, 16, 17, 64, 101):
+            data = os.urandom(size)
+            ciphertext = encrypt(data)
+            self.assertEqual(len(ciphertext), crypto.HEADER.size + size + max(1, -(-size // 16)) * crypto.TAG_SIZE)
+            f = decrypt(ciphertext)
+            self.assertEqual(f.size, size)
+            self.assertEqual(f.read(), data)
+
+    def test_random_access(self):
+        data = os.urandom(1000)
+        f = decrypt(encrypt(data))
+        for offset, length in ((0, 10), (15, 2), (500, 300), (990, 50), (1000, 5)):
+            f.seek(offset)
+            self.assertEqual(f.read(length), data[offset:offset + length])
+        self.assertEqual(f.seek(-10, io.SEEK_END), 990)
+
+    def test_every_file_gets_its_own_data_key(self):
+        data = bytes(64)
+        self.assertNotEqual(encrypt(data)[:crypto.HEADER.size], encrypt(data)[:crypto.HEADER.size])
+
+    def test_tampering_is_detected(self):
+        ciphertext = encrypt(os.urandom(64))
+        sealed = 16 + crypto.TAG_SIZE
+        body = ciphertext[crypto.HEADER.size:]
+        flipped = bytearray(ciphertext)
+        flipped[-1] ^= 1
+        dropped_last = ciphertext[:-sealed]
+        swapped = ciphertext[:crypto.HEADER.size] + body[sealed:2 * sealed] + body[:sealed] + body[2 * sealed:]
+        for damaged in (bytes(flipped), dropped_last, swapped):
+            with self.assertRaises(crypto.DecryptionError):
+                decrypt(damaged).read()
+        with self.assertRaises(crypto.DecryptionError):
+            decrypt(ciphertext[:10])
+
+    def test_key_rotation(self):
+        with override_settings(MEDIA_ENCRYPTION_KEY=KEY_A):
+            ciphertext = encrypt(b'evidence')
+        with override_settings(MEDIA_ENCRYPTION_KEY=KEY_B):
+            with self.assertRaises(crypto.DecryptionError):
+                decrypt(ciphertext)
+        with override_settings(MEDIA_ENCRYPTION_KEY=KEY_B, MEDIA_ENCRYPTION_OLD_KEYS=[KEY_A]):
+            self.assertEqual(decrypt(ciphertext).read(), b'evidence')
+            self.assertEqual(crypto.key_id(), crypto.HEADER.unpack(encrypt(b'')[:crypto.HEADER.size])[2].hex())
+
+    @override_settings(MEDIA_ENCRYPTION_KEY=None)
+    def test_no_master_key(self):
+        # Never falls back to a key derived from something committed, like SECRET_KEY
+        with self.assertRaises(ImproperlyConfigured):
+            encrypt(b'evidence')
+
+
+class EncryptedMediaTest(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        self.content = os.urandom(3 * crypto.SEGMENT_SIZE + 100)
+        self.media = MediaCapture.objects.create(alert=self.alert, media_type='video',
+                                                 file=ContentFile(self.content, name='v.webm'))
+
+    def test_stored_encrypted(self):
+        with open(self.media.file.path, 'rb') as f:
+            stored = f.read()
+        self.assertTrue(stored.startswith(crypto.MAGIC))
+        self.assertNotIn(self.content[:64], stored)
+        self.assertEqual(self.media.file.size, len(self.content))
+        with self.media.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_files_from_before_encryption_still_open(self):
+        name = 'old.wav'
+        with open(os.path.join(self.tmp.name, name), 'wb') as f:
+            f.write(b'RIFF plaintext')
+        with crypto.storage.open(name) as f:
+            self.assertEqual(f.read(), b'RIFF plaintext')
+        self.assertEqual(crypto.storage.size(name), 14)
+
+    def test_local_path_is_a_temporary_plaintext_copy(self):
+        with crypto.local_path(self.media.file) as path:
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(path))
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_streamed_decrypted(self):
+        url = reverse('stream-media', args=['emergency', self.media.id])
+        start = crypto.SEGMENT_SIZE - 10
+        response = self.client.get(url, HTTP_RANGE=f'bytes={start}-{start + 19}')
+        self.assertEqual(response.status_code, 206)
+        # The web server would only have ciphertext to send
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(b''.join(response.streaming_content), self.content[start:start + 20])
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_serialized_file_is_the_stream_url(self):
+        data = MediaCaptureSerializer(self.media).data
+        url = reverse('stream-media', args=['emergency', self.media.id])
+        self.assertEqual(data['file'], url)
+        self.assertEqual(data['stream_url'], url)
+
+    def test_no_serialized_field_points_at_ciphertext(self):
+        self.media.thumbnail.save('v.thumb.webp', ContentFile(b'thumbnail'), save=False)
+        self.media.preview.save('v.preview.webm', ContentFile(b'preview'), save=False)
+        self.media.save()
+        data = MediaCaptureSerializer(self.media).data
+        self.assertTrue(data['thumbnail_url'].startswith(reverse('stream-media', args=['emergency', self.media.id])))
+        for name, value in data.items():
+            if isinstance(value, str):
+                self.assertFalse(value.startswith(settings.MEDIA_URL), name)
@@ -0,0 +1,126 @@
+import io
+import os
+import tempfile
+import imageio_ffmpeg
+import numpy as np
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, MediaCapture, VideoEvidence
+from .. import derivatives
+from .test_media_probe import wav
+
+
+def jpeg(size=(2000, 1500)):
+    output = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+def mp4(path, seconds=3, size=(160, 128), fps=10):
+    writer = imageio_ffmpeg.write_frames(path, size, fps=fps, codec='libx264', pix_fmt_out='yuv420p')
+    writer.send(None)
+    for i in range(seconds * fps):
+        writer.send(np.full((size[1], size[0], 3), i * 255 // (seconds * fps), dtype=np.uint8))
+    writer.close()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class DerivativesTest(TestCase):
+    def setUp(self):
+        # The immediate task backend remembers idempotency keys here
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name, TASK_BACKEND='immediate')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+
+    def open_image(self, field):
+        with field.open('rb') as f:
+            return Image.open(io.BytesIO(f.read()))
+
+    def test_photo_thumbnail_and_preview(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = MediaCapture.objects.create(alert=self.alert, media_type='photo',
+                                                file=ContentFile(jpeg(), name='p.jpg'))
+        photo.refresh_from_db()
+        self.assertEqual(os.path.dirname(photo.thumbnail.name), os.path.dirname(photo.file.name))
+        self.assertTrue(photo.thumbnail.name.endswith('.thumb.webp'))
+        thumbnail, preview = self.open_image(photo.thumbnail), self.open_image(photo.preview)
+        self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (320, 240)))
+        self.assertEqual(preview.size, (1280, 960))
+        self.assertLess(photo.thumbnail.size, 5000)
+
+        thumbnail_path = photo.thumbnail.path
+        photo.delete()
+        self.assertFalse(os.path.exists(thumbnail_path))
+
+    def test_video_poster_and_contact_sheet(self):
+        content = mp4(os.path.join(self.tmp.name, 'source.mp4'))
+        with self.captureOnCommitCallbacks(execute=True):
+            evidence = VideoEvidence.objects.create(user=self.user, video_file=ContentFile(content, name='clip.mp4'))
+        evidence.refresh_from_db()
+        poster, sheet = self.open_image(evidence.thumbnail), self.open_image(evidence.preview)
+        self.assertEqual(poster.size, (160, 128))
+        columns, rows = derivatives.SHEET_COLUMNS, derivatives.SHEET_ROWS
+        gap = derivatives.SHEET_GAP
+        self.assertEqual(sheet.size, (columns * 160 + (columns - 1) * gap, rows * 128 + (rows - 1) * gap))
+        # Frames come from through the video, which gets brighter
+        sheet = sheet.convert('L')
+        self.assertLess(sheet.getpixel((10, 10)), sheet.getpixel((sheet.width - 10, sheet.height - 10)))
+
+    def test_no_derivatives_for_audio_or_unreadable_files(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            audio = MediaCapture.objects.create(alert=self.alert, media_type='audio', file=ContentFile(wav(1), name='a.wav'))
+        self.assertEqual(callbacks, [])
+        self.assertFalse(derivatives.generate(audio))
+
+        broken = MediaCapture.objects.create(alert=self.alert, media_type='photo', file=ContentFile(b'nope', name='p.jpg'))
+        self.assertFalse(derivatives.generate(broken))
+        broken = MediaCapture.objects.create(alert=self.alert, media_type='video', file=ContentFile(b'nope', name='v.mp4'))
+        self.assertFalse(derivatives.generate(broken))
+        self.assertFalse(broken.thumbnail)
+
+
+@override_settings(TASK_BACKEND='immediate')
+class DerivativeUrlsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+
+    def test_media_list_has_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            MediaCapture.objects.create(alert=self.alert, media_type='photo', file=ContentFile(jpeg(), name='p.jpg'))
+        MediaCapture.objects.create(alert=self.alert, media_type='audio', file=ContentFile(wav(1), name='a.wav'))
+        response = self.client.get(reverse('get-media'), {'alert_id': self.alert.alert_id})
+        audio, photo = sorted(response.data['data'], key=lambda media: media['media_type'])
+        # Alert media is encrypted at rest, so only the streaming endpoint can serve it
+        stream_url = reverse('stream-media', args=['emergency', photo['id']])
+        self.assertEqual(photo['thumbnail_url'], stream_url + '?variant=thumbnail')
+        self.assertEqual(photo['preview_url'], stream_url + '?variant=preview')
+        self.assertIsNone(audio['thumbnail_url'])
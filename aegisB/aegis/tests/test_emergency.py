@@ -0,0 +1,298 @@
+import math
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework.authtoken.models import Token
+from accounts.models import CustomUser
+from ..models import AlertEvent, EmergencyAlert, EmergencyNotification, EmergencyResponse, LocationUpdate
+from .. import location_ingest, notifications, polyline, tracks
+
+
+class EmergencyUpdatesTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.alert = EmergencyAlert.objects.create(
+            user=self.user,
+            initial_latitude=23.8103,
+            initial_longitude=90.4125
+        )
+        self.url = reverse('emergency-updates', kwargs={'alert_id': self.alert.alert_id})
+
+    def settle(self):
+        """Age every event past the window in which a cursor is held back"""
+        AlertEvent.objects.update(created_at=timezone.now() - timedelta(seconds=AlertEvent.CURSOR_SETTLE_SECONDS + 1))
+
+    def test_full_poll_returns_cursor(self):
+        self.settle()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data['data']['cursor'], 0)
+
+    def test_unchanged_poll_is_not_modified_in_one_query(self):
+        self.settle()
+        cursor = self.client.get(self.url).data['data']['cursor']
+        # One query to authenticate the token, one to check the cursor
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_delta_returns_only_changes(self):
+        self.settle()
+        cursor = self.client.get(self.url).data['data']['cursor']
+        location = LocationUpdate.objects.create(alert=self.alert, latitude=23.81, longitude=90.41)
+        notification = EmergencyNotification.objects.create(
+            user=self.user, alert=self.alert, notification_type='location_update'
+        )
+        self.settle()
+
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertIsNone(data['alert'])
+        self.assertEqual([item['id'] for item in data['location_updates']], [location.id])
+        self.assertEqual(data['media_captures'], [])
+        self.assertEqual(len(data['notifications']), 1)
+        self.assertGreater(data['cursor'], cursor)
+
+        # Delta polls have no side effects
+        notification.refresh_from_db()
+        self.assertFalse(notification.is_read)
+
+        response = self.client.get(self.url, {'since': data['cursor']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cursor_waits_for_late_commits(self):
+        self.settle()
+        cursor = self.client.get(self.url).data['data']['cursor']
+        first = LocationUpdate.objects.create(alert=self.alert, latitude=23.81, longitude=90.41)
+        second = LocationUpdate.objects.create(alert=self.alert, latitude=23.82, longitude=90.42)
+        # Both events are too young to rule out an earlier id still committing
+        oldest = AlertEvent.objects.get(kind='location', object_id=first.id)
+
+        data = self.client.get(self.url, {'since': cursor}).data['data']
+        self.assertEqual(data['cursor'], oldest.id - 1)
+        # Young events are sent again until they settle, so a late commit is not skipped
+        data = self.client.get(self.url, {'since': data['cursor']}).data['data']
+        self.assertEqual({item['id'] for item in data['location_updates']}, {first.id, second.id})
+
+        self.settle()
+        data = self.client.get(self.url, {'since': data['cursor']}).data['data']
+        self.assertEqual(data['cursor'], AlertEvent.objects.latest('id').id)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NotificationFanOutTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        self.location = LocationUpdate.objects.create(alert=self.alert, latitude=23.81, longitude=90.41)
+
+    def add_responders(self, count, offset=0):
+        for i in range(offset, offset + count):
+            responder = CustomUser.objects.create_user(
+                email=f'agent{i}@example.com',
+                password=None,
+                full_name=f'Agent {i}',
+                user_type='agent',
+                agent_id=f'AG{i}',
+                responder_type='police',
+                status='busy'
+            )
+            EmergencyResponse.objects.create(alert=self.alert, responder=responder)
+
+    def notify(self):
+        notifications.notify_responders(self.alert, notifications.suspicious_deactivation(self.alert, 3))
+
+    def test_fan_out_cost_is_constant(self):
+        self.add_responders(2)
+        with self.assertNumQueries(5):
+            self.notify()
+
+        self.add_responders(18, offset=2)
+        with self.assertNumQueries(5):
+            self.notify()
+
+        self.assertEqual(
+            EmergencyNotification.objects.filter(alert=self.alert, notification_type='alert_activated').count(),
+            22
+        )
+
+    def test_cancel_responses(self):
+        self.add_responders(3)
+        self.alert.status = 'cancelled'
+        self.alert.cancelled_at = self.alert.activated_at
+        self.alert.save()
+
+        notifications.cancel_responses(self.alert)
+
+        self.assertFalse(self.alert.responses.exclude(status='cancelled').exists())
+        self.assertFalse(CustomUser.objects.filter(user_type='agent').exclude(status='available').exists())
+        self.assertEqual(
+            EmergencyNotification.objects.filter(alert=self.alert, notification_type='alert_resolved').count(),
+            3
+        )
+
+
+class ResponderAssignmentTest(APITestCase):
+    def test_unknown_eta_is_left_out(self):
+        user = CustomUser.objects.create_user(email='victim@example.com', password='password123', full_name='Victim')
+        alert = EmergencyAlert.objects.create(user=user, initial_latitude=23.8103, initial_longitude=90.4125)
+        # No location, so no ETA
+        responder = CustomUser.objects.create_user(
+            email='agent@example.com', password=None, full_name='Agent', user_type='agent', agent_id='AG1',
+            responder_type='police'
+        )
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        response = self.client.post(reverse('responder-assign'), {'alert_id': alert.alert_id, 'responder_id': responder.id})
+        self.assertEqual(response.status_code, 200, response.data)
+
+        messages = list(EmergencyNotification.objects.filter(alert=alert).values_list('message', flat=True))
+        self.assertEqual(sorted(messages), [
+            'Responder Agent has been assigned to your emergency.',
+            f'You have been assigned to emergency {alert.alert_id}.',
+        ])
+
+
+class LocationIngestTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        self.start = timezone.now()
+
+    def ingest(self, seconds, latitude, longitude=90.4125):
+        now = self.start + timedelta(seconds=seconds)
+        _, location_update = location_ingest.ingest(
+            self.alert, {'latitude': latitude, 'longitude': longitude}, now=now
+        )
+        return location_update is not None
+
+    def test_persists_on_distance_or_time_threshold(self):
+        self.assertTrue(self.ingest(0, 23.81000))
+        # ~2m away a second later: only the hot slot moves
+        self.assertFalse(self.ingest(1, 23.81002))
+        self.assertEqual(location_ingest.latest_location(self.alert)['latitude'], 23.81002)
+        # ~22m from the last stored position
+        self.assertTrue(self.ingest(2, 23.81020))
+        self.assertFalse(self.ingest(5, 23.81021))
+        # Standing still, but the interval has passed
+        self.assertTrue(self.ingest(12, 23.81021))
+        self.assertEqual(LocationUpdate.objects.filter(alert=self.alert).count(), 3)
+
+    def test_late_sample_does_not_move_hot_slot_back(self):
+        # Two workers: the later sample is handled first
+        self.ingest(0, 23.81000)
+        self.ingest(4, 23.81004)
+        self.ingest(3, 23.81003)
+        self.assertEqual(location_ingest.latest_location(self.alert)['latitude'], 23.81004)
+
+    def test_update_location_skips_per_responder_notifications(self):
+        url = reverse('update-location')
+        first = self.client.post(url, {
+            'alert_id': self.alert.alert_id, 'latitude': 23.81, 'longitude': 90.41
+        }, format='json')
+        second = self.client.post(url, {
+            'alert_id': self.alert.alert_id, 'latitude': 23.81001, 'longitude': 90.41
+        }, format='json')
+
+        self.assertTrue(first.data['persisted'])
+        self.assertFalse(second.data['persisted'])
+        self.assertEqual(LocationUpdate.objects.filter(alert=self.alert).count(), 1)
+        self.assertFalse(EmergencyNotification.objects.filter(notification_type='location_update').exists())
+
+
+class LocationBatchTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        self.url = reverse('update-location-batch')
+        self.start = timezone.now().replace(microsecond=0)
+
+    def point(self, second):
+        return {
+            'latitude': round(23.81 + second * 0.00001, 6),
+            'longitude': 90.41,
+            'timestamp': (self.start + timedelta(seconds=second)).isoformat(),
+            'accuracy': 5.0
+        }
+
+    def test_flush_300_points_in_one_insert(self):
+        points = [self.point(second) for second in reversed(range(300))]
+        points.append(self.point(10))  # duplicate timestamp
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'alert_id': self.alert.alert_id, 'points': points}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 300)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "aegis_locationupdate"')]
+        # One statement, unless the backend caps parameters per query (SQLite)
+        fields = [f for f in LocationUpdate._meta.concrete_fields if not f.primary_key]
+        batch_size = connection.ops.bulk_batch_size(fields, points)
+        self.assertEqual(len(inserts), math.ceil(300 / batch_size))
+
+        # Re-sending the batch is a no-op
+        response = self.client.post(self.url, {'alert_id': self.alert.alert_id, 'points': points[:50]}, format='json')
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(LocationUpdate.objects.filter(alert=self.alert).count(), 300)
+
+        latest = location_ingest.latest_location(self.alert)
+        self.assertEqual(latest['latitude'], self.point(299)['latitude'])
+
+    def test_resend_after_compaction(self):
+        points = [self.point(second) for second in range(20)]
+        self.client.post(self.url, {'alert_id': self.alert.alert_id, 'points': points}, format='json')
+        tracks.compact_alert(self.alert, self.start + timedelta(seconds=10))
+
+        response = self.client.post(self.url, {'alert_id': self.alert.alert_id, 'points': points}, format='json')
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(LocationUpdate.objects.filter(alert=self.alert).count(), 10)
+        self.assertEqual(len(tracks.load_track(self.alert)['t']), 20)
+
+    def test_polyline_track(self):
+        points = [self.point(second) for second in range(3)]
+        response = self.client.post(self.url, {
+            'alert_id': self.alert.alert_id,
+            'polyline': polyline.encode([(p['latitude'], p['longitude']) for p in points], 6),
+            'precision': 6,
+            'timestamps': [p['timestamp'] for p in points]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stored = LocationUpdate.objects.filter(alert=self.alert).order_by('timestamp')
+        self.assertEqual([float(u.latitude) for u in stored], [p['latitude'] for p in points])
+
+    def test_polyline_needs_matching_timestamps(self):
+        response = self.client.post(self.url, {
+            'alert_id': self.alert.alert_id,
+            'polyline': polyline.encode([(23.81, 90.41), (23.82, 90.42)]),
+            'timestamps': [self.start.isoformat()]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import tempfile
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..distance import haversine_km
+from ..models import EmergencyAlert
+from .. import gazetteer
+
+
+class GazetteerIndexTest(SimpleTestCase):
+    def test_nearest_matches_brute_force(self):
+        rng = random.Random(7)
+        places = [(f'Place {i}', rng.uniform(20.6, 26.6), rng.uniform(88.0, 92.7)) for i in range(2000)]
+        index = gazetteer.GazetteerIndex.from_places(places, cell_degrees=0.05)
+        lats = np.array([lat for _, lat, _ in places])
+        lngs = np.array([lng for _, _, lng in places])
+
+        for _ in range(200):
+            lat, lng = rng.uniform(20.0, 27.0), rng.uniform(87.5, 93.0)
+            distances = haversine_km(lat, lng, lats, lngs)
+            place = index.nearest(lat, lng, max_distance_km=25)
+            if distances.min() > 25:
+                self.assertIsNone(place)
+                continue
+            self.assertAlmostEqual(place.distance_km, distances.min(), delta=0.01)
+
+    def test_labels(self):
+        index = gazetteer.GazetteerIndex.from_places([
+            ('Gulshan, Dhaka', 23.7925, 90.4078),
+            ('Chattogram', 22.3569, 91.7832),
+        ])
+        self.assertEqual(index.nearest(23.79, 90.41).label, 'Gulshan, Dhaka')
+        self.assertEqual(index.nearest(22.36, 91.78).label, 'Chattogram')
+        self.assertIsNone(index.nearest(25.0, 89.0))
+
+    def test_place_label(self):
+        self.assertEqual(gazetteer.place_label({'name': 'Gulshan', 'district': 'Dhaka', 'division': 'Dhaka'}),
+                         'Gulshan, Dhaka')
+        self.assertEqual(gazetteer.place_label({'label': 'Motijheel C/A', 'name': 'Motijheel'}), 'Motijheel C/A')
+
+    def test_save_and_memory_map(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'places.geojson')
+            with open(source, 'w') as output:
+                json.dump({'type': 'FeatureCollection', 'features': [
+                    {'geometry': {'type': 'Point', 'coordinates': [90.3742, 23.7461]},
+                     'properties': {'name': 'Dhanmondi', 'district': 'Dhaka'}},
+                    {'geometry': {'type': 'LineString', 'coordinates': [[90.0, 23.0], [90.1, 23.1]]},
+                     'properties': {'name': 'Road'}},
+                ]}, output)
+            path = os.path.join(tmp, 'index')
+            call_command('build_gazetteer', source, output=path, stdout=open(os.devnull, 'w'))
+
+            loaded = gazetteer.GazetteerIndex.load(path)
+            self.assertEqual(len(loaded), 1)
+            self.assertIsInstance(loaded.points.base, np.memmap)
+            with override_settings(GAZETTEER_PATH=path):
+                self.assertEqual(gazetteer.describe(23.7465, 90.3745), 'Dhanmondi, Dhaka')
+                self.assertEqual(gazetteer.describe('23.80', '90.38'), '6.0 km from Dhanmondi, Dhaka')
+                self.assertIsNone(gazetteer.describe('23.80', '90.38', gazetteer.GAZETTEER_NEAR_KM))
+                self.assertIsNone(gazetteer.describe('', None))
+
+    def test_bundled_places(self):
+        with override_settings(GAZETTEER_PATH=None):
+            self.assertEqual(gazetteer.describe(23.7930, 90.4080), 'Gulshan, Dhaka')
+            self.assertEqual(gazetteer.describe(24.8950, 91.8690), 'Sylhet')
+
+
+@override_settings(GAZETTEER_PATH=None, OPENROUTE_BASE_URL='http://127.0.0.1:9')
+class OfflineAddressTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def test_reverse_geocode_without_network(self):
+        response = self.client.post(reverse('reverse-geocode'), {'latitude': 23.7330, 'longitude': 90.4172}, format='json')
+        self.assertEqual(response.data['data']['address'], 'Motijheel, Dhaka')
+
+    def test_activation_fills_address(self):
+        response = self.client.post(reverse('activate-emergency'), {
+            'activation_method': 'button', 'latitude': 22.3570, 'longitude': 91.7830,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        alert = EmergencyAlert.objects.get(alert_id=response.data['alert_id'])
+        self.assertEqual(alert.initial_address, 'Chattogram')
+
+    def test_far_from_any_place_falls_back_to_nearest(self):
+        # Out in the haor, 20 km from Sunamganj, with OpenRouteService unreachable
+        response = self.client.post(reverse('reverse-geocode'), {'latitude': 24.90, 'longitude': 91.30}, format='json')
+        self.assertEqual(response.data['data']['address'], '20.8 km from Sunamganj, Sylhet')
+
+        response = self.client.post(reverse('activate-emergency'), {
+            'activation_method': 'button', 'latitude': 24.90, 'longitude': 91.30,
+        }, format='json')
+        alert = EmergencyAlert.objects.get(alert_id=response.data['alert_id'])
+        self.assertEqual(alert.initial_address, '20.8 km from Sunamganj, Sylhet')
@@ -0,0 +1,105 @@
+from django.test import TestCase
+from accounts import geohash
+from accounts.models import CustomUser
+from ..distance import eta_minutes, haversine_km, top_k
+from ..geo import (
+    calculate_distance, calculate_eta_based_on_distance, nearest_responders, nearest_responders_anywhere
+)
+from ..models import EmergencyAlert, EmergencyResponse
+from ..views import assign_nearby_responders
+
+
+class GeohashTest(TestCase):
+    def test_encode_known_value(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_decode_round_trip(self):
+        lat, lng = geohash.decode(geohash.encode(23.8103, 90.4125))
+        self.assertAlmostEqual(lat, 23.8103, places=4)
+        self.assertAlmostEqual(lng, 90.4125, places=4)
+
+    def test_ring_sizes(self):
+        x, y = geohash.cell_xy(23.8103, 90.4125, 5)
+        self.assertEqual(len(geohash.ring(x, y, 0, 5)), 1)
+        self.assertEqual(len(geohash.ring(x, y, 1, 5)), 8)
+        self.assertEqual(len(geohash.ring(x, y, 3, 5)), 24)
+
+
+class DistanceTest(TestCase):
+    def test_matches_scalar_versions(self):
+        points = [(23.81, 90.41), (22.35, 91.78), (24.89, 91.87)]
+        distances = haversine_km(23.8103, 90.4125, [p[0] for p in points], [p[1] for p in points])
+        for (lat, lng), distance in zip(points, distances):
+            self.assertAlmostEqual(distance, calculate_distance(23.8103, 90.4125, lat, lng), places=9)
+
+        types = ['police', 'volunteer', 'unknown']
+        etas = eta_minutes(distances, types)
+        for distance, responder_type, eta in zip(distances, types, etas):
+            self.assertEqual(eta, calculate_eta_based_on_distance(distance, responder_type))
+
+    def test_top_k_orders_and_skips_missing(self):
+        distances = [5.0, float('nan'), 1.0, 3.0, 2.0]
+        self.assertEqual(list(top_k(distances, 3)), [2, 4, 3])
+        self.assertEqual(list(top_k(distances, 10)), [2, 4, 3, 0, 1])
+        self.assertEqual(len(top_k(distances, 0)), 0)
+
+
+class NearestRespondersTest(TestCase):
+    def create_agent(self, i, lat, lng, responder_type='police', status='available'):
+        return CustomUser.objects.create_user(
+            email=f'agent{i}@example.com',
+            password='password123',
+            full_name=f'Agent {i}',
+            user_type='agent',
+            agent_id=f'AG{i}',
+            responder_type=responder_type,
+            status=status,
+            latitude=lat,
+            longitude=lng,
+        )
+
+    def test_geohash_kept_in_sync(self):
+        agent = self.create_agent(1, 23.81, 90.41)
+        self.assertEqual(agent.geohash, geohash.encode(23.81, 90.41))
+        agent.latitude = None
+        agent.save()
+        self.assertIsNone(agent.geohash)
+
+    def test_returns_nearest_first(self):
+        far = self.create_agent(1, 23.95, 90.60)
+        near = self.create_agent(2, 23.811, 90.413)
+        middle = self.create_agent(3, 23.85, 90.45)
+        self.create_agent(4, 23.812, 90.412, status='busy')
+
+        result = nearest_responders(23.8103, 90.4125, 2)
+        self.assertEqual([responder for responder, _ in result], [near, middle])
+        self.assertLess(result[0][1], result[1][1])
+
+        everyone = nearest_responders(23.8103, 90.4125, 10)
+        self.assertEqual([responder for responder, _ in everyone], [near, middle, far])
+
+    def test_filters_type_exclusions_and_radius(self):
+        police = self.create_agent(1, 23.811, 90.413)
+        medic = self.create_agent(2, 23.82, 90.42, responder_type='medical')
+        self.create_agent(3, 22.35, 91.78)  # Chattogram, ~215km away
+
+        result = nearest_responders(23.8103, 90.4125, 5, responder_type='medical')
+        self.assertEqual([responder for responder, _ in result], [medic])
+
+        result = nearest_responders(23.8103, 90.4125, 5, exclude_ids=[police.id])
+        self.assertEqual([responder for responder, _ in result], [medic])
+
+    def test_sos_falls_back_to_far_responders(self):
+        near = self.create_agent(1, 23.811, 90.413)
+        far = self.create_agent(2, 22.35, 91.78)  # Chattogram, ~215km away
+        self.create_agent(3, 24.89, 91.87, status='busy')
+
+        self.assertEqual([responder for responder, _ in nearest_responders(23.8103, 90.4125, 3)], [near])
+        result = nearest_responders_anywhere(23.8103, 90.4125, 3, exclude_ids=[near.id])
+        self.assertEqual([responder for responder, _ in result], [far])
+        self.assertAlmostEqual(result[0][1], calculate_distance(23.8103, 90.4125, 22.35, 91.78))
+
+        victim = CustomUser.objects.create_user(email='victim@example.com', password='password123', full_name='Victim')
+        alert = EmergencyAlert.objects.create(user=victim, initial_latitude=23.8103, initial_longitude=90.4125)
+        self.assertEqual(assign_nearby_responders(alert), [near, far])
+        self.assertEqual(EmergencyResponse.objects.filter(alert=alert).count(), 2)
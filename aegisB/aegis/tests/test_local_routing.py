@@ -0,0 +1,172 @@
+import os
+import tempfile
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, SafeRoute
+from .. import local_routing
+
+SPACING = 0.001
+ORIGIN = (23.70, 90.35)
+
+
+def grid_ways(side=5, **tags):
+    """A side x side grid of two-way residential streets about 110 m apart"""
+    tags = {'highway': 'residential', **tags}
+    ways = []
+    for i in range(side):
+        ways.append(([(ORIGIN[0] + i * SPACING, ORIGIN[1] + j * SPACING) for j in range(side)], tags))
+        ways.append(([(ORIGIN[0] + j * SPACING, ORIGIN[1] + i * SPACING) for j in range(side)], tags))
+    return ways
+
+
+def at(row, col):
+    """[lng, lat] of a grid intersection"""
+    return [round(ORIGIN[1] + col * SPACING, 7), round(ORIGIN[0] + row * SPACING, 7)]
+
+
+OSM_EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="23.7000" lon="90.3500"/>
+  <node id="2" lat="23.7000" lon="90.3510"/>
+  <node id="3" lat="23.7010" lon="90.3510"/>
+  <node id="4" lat="23.7010" lon="90.3500"/>
+  <way id="10">
+    <nd ref="1"/><nd ref="2"/><nd ref="3"/>
+    <tag k="highway" v="primary"/>
+    <tag k="oneway" v="yes"/>
+  </way>
+  <way id="11">
+    <nd ref="3"/><nd ref="4"/><nd ref="1"/>
+    <tag k="highway" v="residential"/>
+  </way>
+  <way id="12">
+    <nd ref="1"/><nd ref="3"/>
+    <tag k="waterway" v="canal"/>
+  </way>
+</osm>
+"""
+
+
+class RoadGraphTest(SimpleTestCase):
+    def setUp(self):
+        self.graph = local_routing.RoadGraph.from_ways(grid_ways())
+
+    def route_nodes(self, route):
+        return [tuple(point) for point in route['features'][0]['geometry']['coordinates'][1:-1]]
+
+    def test_route_matches_openroute_shape(self):
+        route = self.graph.route(at(0, 0), at(4, 4))
+        feature = route['features'][0]
+        self.assertEqual(feature['geometry']['type'], 'LineString')
+        self.assertEqual(feature['geometry']['coordinates'][0], at(0, 0))
+        self.assertEqual(feature['geometry']['coordinates'][-1], at(4, 4))
+        summary = feature['properties']['summary']
+        # Eight blocks whichever way round
+        self.assertAlmostEqual(summary['distance'], 8 * (111.2 * 0.0009 + 111.2 * 0.0011) / 2 * 1000, delta=80)
+        self.assertAlmostEqual(summary['duration'], summary['distance'] / (20 / 3.6), delta=1)
+        self.assertEqual(len(feature['bbox']), 4)
+
+    def test_hazards_are_steered_round_not_cut(self):
+        graph = local_routing.RoadGraph.from_ways(grid_ways(side=11))
+        # Straight along the bottom row unless something happened on it
+        direct = graph.route(at(0, 0), at(0, 10))
+        self.assertIn(tuple(at(0, 5)), self.route_nodes(direct))
+
+        hazard = (at(0, 5)[1], at(0, 5)[0])
+        detour = graph.route(at(0, 0), at(0, 10), hazards=[hazard])
+        self.assertNotIn(tuple(at(0, 5)), self.route_nodes(detour))
+        self.assertGreater(detour['features'][0]['properties']['summary']['distance'],
+                           direct['features'][0]['properties']['summary']['distance'])
+
+        # A trip starting right at the hazard still gets a route
+        self.assertIsNotNone(graph.route(at(0, 5), at(0, 10), hazards=[hazard]))
+
+    def test_off_graph_and_disconnected(self):
+        self.assertIsNone(self.graph.route(at(0, 0), [91.8, 22.3]))
+        graph = local_routing.RoadGraph.from_ways(grid_ways(side=3) + [
+            ([(ORIGIN[0] + 0.01, ORIGIN[1] + 0.01), (ORIGIN[0] + 0.011, ORIGIN[1] + 0.01)], {'highway': 'service'}),
+        ])
+        self.assertIsNone(graph.route(at(0, 0), [ORIGIN[1] + 0.01, ORIGIN[0] + 0.011]))
+
+    def test_build_from_osm_extract(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'city.osm')
+            with open(source, 'w') as output:
+                output.write(OSM_EXTRACT)
+            path = os.path.join(tmp, 'graph')
+            call_command('build_road_graph', source, output=path, stdout=open(os.devnull, 'w'))
+            graph = local_routing.RoadGraph.load(path)
+
+        # 2 one-way edges plus 2 two-way segments
+        self.assertEqual((graph.meta['nodes'], graph.meta['edges']), (4, 6))
+        self.assertEqual(graph.meta['max_speed_kmh'], 40)
+        # A* reads the mapped arrays in place
+        for view, array in zip(graph.search_arrays(), (graph.indptr, graph.indices, graph.seconds, graph.points)):
+            self.assertTrue(np.shares_memory(np.asarray(view), array))
+        forward = graph.route([90.3500, 23.7000], [90.3510, 23.7010])
+        backward = graph.route([90.3510, 23.7010], [90.3500, 23.7000])
+        # The one-way primary is quicker but can only be used one way
+        self.assertLess(forward['features'][0]['properties']['summary']['duration'],
+                        backward['features'][0]['properties']['summary']['duration'])
+        self.assertIn([90.3510, 23.7000], forward['features'][0]['geometry']['coordinates'])
+        self.assertIn([90.3500, 23.7010], backward['features'][0]['geometry']['coordinates'])
+
+
+class FindSafeRouteLocalTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.graph_path = os.path.join(cls.tmp.name, 'graph')
+        local_routing.RoadGraph.from_ways(grid_ways(side=11)).save(cls.graph_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=at(0, 5)[1], initial_longitude=at(0, 5)[0])
+
+    def find_route(self):
+        start, end = at(0, 0), at(0, 10)
+        return self.client.post(reverse('find-safe-route'), {
+            'destination': 'Office',
+            'destination_lat': end[1], 'destination_lng': end[0],
+            'current_lat': start[1], 'current_lng': start[0],
+        }, format='json')
+
+    def assert_local_route(self, response):
+        self.assertTrue(response.data['success'], response.data)
+        self.assertEqual(response.data['data']['destination'], 'Office')
+        self.assertNotIn(at(0, 5), response.data['data']['route_path'])
+        route = SafeRoute.objects.get(id=response.data['data']['route_id'])
+        self.assertEqual(route.geometry.engine, 'local')
+
+    def test_local_backend_preferred(self):
+        with override_settings(ROUTING_GRAPH_PATH=self.graph_path, ROUTING_BACKEND='local',
+                               OPENROUTE_BASE_URL='http://127.0.0.1:9'):
+            self.assert_local_route(self.find_route())
+
+    def test_falls_back_to_local_when_openroute_is_down(self):
+        with override_settings(ROUTING_GRAPH_PATH=self.graph_path, ROUTING_BACKEND='openroute',
+                               OPENROUTE_BASE_URL='http://127.0.0.1:9'):
+            self.assert_local_route(self.find_route())
+
+    def test_no_route_without_graph_or_service(self):
+        with override_settings(ROUTING_GRAPH_PATH=None, OPENROUTE_BASE_URL='http://127.0.0.1:9'):
+            response = self.find_route()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
@@ -0,0 +1,153 @@
+import io
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import wave
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, MediaCapture, StatsRollup, VideoEvidence
+from .. import media_probe, rollups
+
+
+def box(kind, payload):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def tkhd(width, height):
+    return box(b'tkhd', bytes(4 + 20 + 52) + struct.pack('>II', width << 16, height << 16))
+
+
+def mp4(seconds, width=1280, height=720):
+    """ftyp, a big mdat, then moov at the end as most phones write it"""
+    mvhd = box(b'mvhd', bytes(4 + 8) + struct.pack('>II', 600, int(seconds * 600)) + bytes(80))
+    moov = box(b'moov', mvhd + box(b'trak', tkhd(0, 0)) + box(b'trak', tkhd(width, height)))
+    return box(b'ftyp', b'isom' + bytes(4)) + box(b'mdat', bytes(50000)) + moov
+
+
+def wav(seconds, rate=8000):
+    output = io.BytesIO()
+    with wave.open(output, 'wb') as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes(bytes(int(seconds * rate) * 2))
+    return output.getvalue()
+
+
+# MPEG-1 layer III, 128 kbps, 44.1 kHz, stereo: 417 byte frames
+MP3_FRAME = b'\xff\xfb\x90\x00' + bytes(413)
+
+
+def image(kind, size=(640, 360)):
+    output = io.BytesIO()
+    Image.new('RGB', size).save(output, kind)
+    return output.getvalue()
+
+
+class ProbeFileTest(SimpleTestCase):
+    def probe(self, data):
+        return media_probe.probe_file(io.BytesIO(data))
+
+    def test_mp4(self):
+        self.assertEqual(self.probe(mp4(12.5)), (12.5, 1280, 720))
+        # Audio-only files have no size
+        audio = box(b'ftyp', b'M4A ' + bytes(4)) + box(b'moov', box(b'mvhd', bytes(12) + struct.pack('>II', 1000, 3000)))
+        self.assertEqual(self.probe(audio), (3.0, None, None))
+
+    def test_wav(self):
+        self.assertEqual(self.probe(wav(2.5)), (2.5, None, None))
+
+    def test_mp3(self):
+        id3 = b'ID3\x04\x00\x00\x00\x00\x00\x0a' + bytes(10)
+        self.assertAlmostEqual(self.probe(id3 + MP3_FRAME * 100).duration, 100 * 417 * 8 / 128000)
+        xing = b'\xff\xfb\x90\x00' + bytes(32) + b'Xing' + struct.pack('>II', 1, 1000) + bytes(365)
+        self.assertAlmostEqual(self.probe(xing + MP3_FRAME * 10).duration, 1000 * 1152 / 44100)
+
+    def test_images(self):
+        for kind in ('PNG', 'GIF', 'JPEG'):
+            self.assertEqual(self.probe(image(kind)), (None, 640, 360))
+
+    def test_unknown_or_corrupt(self):
+        self.assertIsNone(self.probe(b'\x1aE\xdf\xa3' + bytes(100)))  # WebM
+        self.assertIsNone(self.probe(mp4(10)[:-40]))
+        self.assertIsNone(self.probe(b''))
+
+
+class ProbeSavedMediaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name, TASK_BACKEND='immediate')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+
+    def test_video_evidence_duration(self):
+        evidence = VideoEvidence.objects.create(user=self.user, video_file=ContentFile(mp4(42.7), name='clip.mp4'))
+        self.assertEqual(evidence.duration_seconds, 42)
+        evidence.refresh_from_db()
+        self.assertEqual(evidence.duration_seconds, 42)
+
+    def test_media_capture_fields(self):
+        audio = MediaCapture.objects.create(alert=self.alert, media_type='audio', file=ContentFile(wav(3), name='a.wav'))
+        photo = MediaCapture.objects.create(alert=self.alert, media_type='photo', file=ContentFile(image('JPEG'), name='p.jpg'))
+        video = MediaCapture.objects.create(alert=self.alert, media_type='video', duration=9,
+                                            file=ContentFile(mp4(12), name='v.mp4'))
+        audio.refresh_from_db()
+        photo.refresh_from_db()
+        video.refresh_from_db()
+        self.assertEqual((audio.duration, audio.resolution), (3, ''))
+        self.assertEqual((photo.duration, photo.resolution), (None, '640x360'))
+        # What the client said is kept
+        self.assertEqual((video.duration, video.resolution), (9, '1280x720'))
+
+    def test_unreadable_files_are_probed_in_the_background(self):
+        found = media_probe.MediaInfo(5.0, 640, 480)
+        content = b'\x1aE\xdf\xa3' + bytes(100)
+        probed = []
+
+        def probe_external(path):
+            # Alert media is encrypted at rest; ffprobe gets a decrypted copy
+            with open(path, 'rb') as f:
+                probed.append(f.read())
+            return found
+
+        with mock.patch.object(media_probe, 'probe_external', side_effect=probe_external):
+            with self.captureOnCommitCallbacks(execute=True):
+                video = MediaCapture.objects.create(alert=self.alert, media_type='video',
+                                                    file=ContentFile(content, name='v.webm'))
+            self.assertEqual(video.duration, None)
+        self.assertEqual(probed, [content])
+        video.refresh_from_db()
+        self.assertEqual((video.duration, video.resolution), (5, '640x480'))
+
+    def test_background_probe_updates_duration_rollup(self):
+        with mock.patch.object(media_probe, 'probe_external', return_value=media_probe.MediaInfo(61.0, None, None)):
+            with self.captureOnCommitCallbacks(execute=True):
+                VideoEvidence.objects.create(user=self.user, video_file=ContentFile(bytes(100), name='clip.webm'))
+        rollup = StatsRollup.objects.get(source='video_evidence')
+        self.assertEqual((rollup.row_count, rollup.duration_seconds), (1, 61))
+
+        rollups.rebuild(['video_evidence'])
+        self.assertEqual(StatsRollup.objects.get(source='video_evidence').duration_seconds, 61)
+
+    def test_moviepy_is_not_imported_by_models(self):
+        code = (
+            "import django, os, sys; os.environ['DJANGO_SETTINGS_MODULE'] = 'aegisB.settings'; django.setup(); "
+            "import aegis.models, aegis.views; print('moviepy' in sys.modules)"
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr)
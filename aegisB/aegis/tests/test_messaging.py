@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from django.test import TestCase, override_settings
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, EmergencyContact, OutboundMessage
+from .. import messaging
+
+LOCMEM = {'BACKEND': 'aegis.tests.test_messaging.LocMemBackend', 'BATCH_SIZE': 4}
+
+
+class LocMemBackend(messaging.BaseBackend):
+    """Keeps sent messages in `outbox` and batch sizes in `batches`"""
+    name = 'locmem'
+    outbox = []
+    batches = []
+
+    def send_batch(self, channel, messages):
+        LocMemBackend.batches.append(len(messages))
+        LocMemBackend.outbox.extend(messages)
+        return [{'status': 'sent', 'provider_id': f'locmem-{message.id}'} for message in messages]
+
+
+class FlakyBackend(messaging.BaseBackend):
+    """Fails every recipient ending in 9 until `healed`"""
+    name = 'flaky'
+    healed = False
+
+    def send_batch(self, channel, messages):
+        return [
+            {'status': 'failed', 'error': 'unreachable'}
+            if message.recipient.endswith('9') and not FlakyBackend.healed else {'status': 'sent'}
+            for message in messages
+        ]
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        GatewayHandler.requests.append((self.headers.get('Authorization'), payload))
+        results = [
+            {'reference': message['reference'], 'id': f"gw-{message['reference']}",
+             'status': 'failed' if message['to'] == 'bad' else 'queued', 'error': 'invalid number'}
+            for message in payload['messages']
+        ]
+        body = json.dumps({'results': results}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MessagingTest(TestCase):
+    def setUp(self):
+        LocMemBackend.outbox.clear()
+        LocMemBackend.batches.clear()
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password=None,
+            full_name='Victim'
+        )
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        for i in range(10):
+            EmergencyContact.objects.create(
+                user=self.user,
+                name=f'Contact {i}',
+                phone=f'+88017000000{i}',
+                email=f'contact{i}@example.com' if i < 3 else None
+            )
+
+    def queue_alert(self):
+        return messaging.queue(
+            'emergency_alert',
+            messaging.contact_recipients(EmergencyContact.objects.filter(user=self.user)),
+            messaging.alert_context(self.alert),
+            alert=self.alert
+        )
+
+    @override_settings(MESSAGING={'sms': LOCMEM, 'email': LOCMEM})
+    def test_batched_delivery_records_status(self):
+        messages = self.queue_alert()
+        self.assertEqual(len(messages), 13)
+        self.assertEqual(len({message.body for message in messages}), 1)
+        self.assertIn(self.alert.alert_id, messages[0].body)
+
+        self.assertEqual(messaging.deliver(messages), 0)
+        self.assertEqual(sorted(LocMemBackend.batches), [2, 3, 4, 4])
+        sent = OutboundMessage.objects.filter(alert=self.alert, status='sent')
+        self.assertEqual(sent.count(), 13)
+        self.assertTrue(all(message.provider_message_id.startswith('locmem-') for message in sent))
+
+    @override_settings(MESSAGING={'sms': {'BACKEND': 'aegis.tests.test_messaging.FlakyBackend'}, 'email': LOCMEM})
+    def test_retry_resends_only_failures(self):
+        FlakyBackend.healed = False
+        self.queue_alert()
+        self.assertEqual(messaging.deliver_pending(alert=self.alert), 1)
+        failed = OutboundMessage.objects.get(status='failed')
+        self.assertEqual(failed.error, 'unreachable')
+
+        FlakyBackend.healed = True
+        self.assertEqual(messaging.deliver_pending(alert=self.alert), 0)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('sent', 2))
+        self.assertEqual(OutboundMessage.objects.filter(attempts=1).count(), 12)
+
+    def test_http_backend_batches_over_one_session(self):
+        GatewayHandler.requests.clear()
+        server = HTTPServer(('127.0.0.1', 0), GatewayHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/batch'
+            config = {'BACKEND': 'aegis.messaging.HTTPBackend', 'OPTIONS': {'url': url, 'token': 'secret'},
+                      'BATCH_SIZE': 50}
+            with override_settings(MESSAGING={'sms': config}):
+                messages = messaging.queue('alert_test', [('sms', 'bad', None)] + [
+                    ('sms', f'+8801700{i:06d}', None) for i in range(120)
+                ], {'name': 'Victim', 'time': 'now'})
+                self.assertEqual(messaging.deliver(messages), 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(sorted(len(payload['messages']) for _, payload in GatewayHandler.requests), [21, 50, 50])
+        self.assertEqual(GatewayHandler.requests[0][0], 'Bearer secret')
+        bad = OutboundMessage.objects.get(recipient='bad')
+        self.assertEqual((bad.status, bad.error), ('failed', 'invalid number'))
+        self.assertEqual(OutboundMessage.objects.filter(status='sent', provider='http').count(), 120)
+
+    def test_rate_limiter(self):
+        limiter = messaging.RateLimiter(rate=200, burst=10)
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.acquire(10)
+        # The first 10 are the burst, the next 20 take 0.1 s at 200/s
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
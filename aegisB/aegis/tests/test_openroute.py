@@ -0,0 +1,169 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert
+from .. import openroute
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenRouteService: fixed answers, with optional injected failures"""
+    hits = []
+    fail_next = []
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, body=None):
+        url = urlparse(self.path)
+        StubHandler.hits.append((url.path, parse_qs(url.query), body, self.headers.get('Authorization')))
+        if StubHandler.fail_next:
+            return self.reply(*StubHandler.fail_next.pop(0))
+        if url.path == '/geocode/search':
+            text = parse_qs(url.query)['text'][0]
+            if 'nowhere' in text.lower():
+                return self.reply(200, {'features': []})
+            return self.reply(200, {'features': [{
+                'geometry': {'coordinates': [90.40, 23.75]},
+                'properties': {'label': 'Dhanmondi, Dhaka'},
+            }]})
+        if url.path == '/geocode/reverse':
+            return self.reply(200, {'features': [{'properties': {'label': 'Gulshan, Dhaka'}}]})
+        if url.path.startswith('/v2/directions/'):
+            return self.reply(200, {'features': [{
+                'geometry': {'coordinates': body['coordinates']},
+                'properties': {'summary': {'distance': 5200, 'duration': 900}},
+                'bbox': [90.40, 23.75, 90.42, 23.81],
+            }]})
+        return self.reply(404, {})
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+
+    def log_message(self, *args):
+        pass
+
+
+class OpenRouteClientTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.settings_override = override_settings(
+            OPENROUTE_BASE_URL=f'http://127.0.0.1:{cls.server.server_port}',
+            OPENROUTE_API_KEY='test-key',
+            # Send every lookup to the stub rather than the offline gazetteer
+            GAZETTEER_PATH=None,
+            GAZETTEER_SOURCE=None,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubHandler.hits.clear()
+        StubHandler.fail_next.clear()
+        self.client_ = openroute.get_client()
+        for cache in (self.client_.geocode_cache, self.client_.reverse_cache, self.client_.directions_cache):
+            cache.clear()
+        # Keep retry backoff out of the test run time
+        self.client_.session.adapters['http://'].max_retries.backoff_factor = 0
+
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def test_geocode_cached_on_normalized_text(self):
+        first = self.client_.geocode('Dhanmondi  Lake')
+        second = self.client_.geocode('  dhanmondi lake ')
+        self.assertEqual(first, second)
+        self.assertIsNone(self.client_.geocode('Nowhere'))
+        self.assertIsNone(self.client_.geocode('nowhere'))
+        self.assertEqual(len(StubHandler.hits), 2)
+        self.assertEqual(StubHandler.hits[0][3], 'test-key')
+
+    def test_retries_server_errors(self):
+        StubHandler.fail_next.extend([(503, {}), (502, {})])
+        self.assertEqual(self.client_.reverse_geocode(23.7925, 90.4078), 'Gulshan, Dhaka')
+        self.assertEqual(len(StubHandler.hits), 3)
+
+    def test_errors_are_raised_and_not_cached(self):
+        StubHandler.fail_next.append((403, {'error': 'bad key'}))
+        with self.assertRaises(openroute.OpenRouteError) as raised:
+            self.client_.geocode('Gulshan')
+        self.assertEqual(raised.exception.status, 403)
+        self.assertIsNotNone(self.client_.geocode('Gulshan'))
+
+    def test_ttl_cache_expiry_and_lru(self):
+        cache = openroute.TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.ttl = -1
+        cache.set('d', 4)
+        self.assertIsNone(cache.get('d'))
+
+    def test_reverse_geocode_endpoint(self):
+        url = reverse('reverse-geocode')
+        for lat, lng in (('23.79251', '90.40781'), (23.79253, 90.40779)):
+            response = self.client.post(url, {'latitude': lat, 'longitude': lng}, format='json')
+            self.assertEqual(response.data['data']['address'], 'Gulshan, Dhaka')
+        # Both points round to the same ~11 m cell
+        self.assertEqual(len(StubHandler.hits), 1)
+
+        StubHandler.fail_next.extend([(500, {})] * 3)
+        response = self.client.post(url, {'latitude': '23.70001', 'longitude': '90.30001'}, format='json')
+        self.assertEqual(response.data['data']['address'], 'Location (23.7000, 90.3000)')
+
+    def test_find_safe_route_reuses_cached_route(self):
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=23.78, initial_longitude=90.41)
+        url = reverse('find-safe-route')
+        for lat in (23.81031, 23.81042):
+            response = self.client.post(
+                url, {'destination': 'Dhanmondi', 'current_lat': lat, 'current_lng': 90.4125}, format='json'
+            )
+            self.assertTrue(response.data['success'], response.data)
+            self.assertEqual(response.data['data']['distance'], '5.2 km')
+
+        paths = [hit[0] for hit in StubHandler.hits]
+        self.assertEqual(paths, ['/geocode/search', '/v2/directions/driving-car'])
+        self.assertIn('options', StubHandler.hits[1][2])
+        # The route is asked for from the exact start, not the rounded cache cell
+        self.assertEqual(StubHandler.hits[1][2]['coordinates'][0], [90.4125, 23.81031])
+
+    def test_find_safe_route_falls_back_without_avoidance(self):
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=23.78, initial_longitude=90.41)
+        StubHandler.fail_next.extend([(200, {'features': [{
+            'geometry': {'coordinates': [90.40, 23.75]},
+            'properties': {'label': 'Dhanmondi, Dhaka'},
+        }]}), (404, {'error': {'code': 2009}})])
+        response = self.client.post(reverse('find-safe-route'), {'destination': 'Dhanmondi'}, format='json')
+        self.assertTrue(response.data['success'])
+        self.assertNotIn('options', StubHandler.hits[-1][2])
@@ -0,0 +1,89 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, LearningResource, ResourceCategory
+
+
+class CursorPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_envelope_pages_cover_every_alert_once(self):
+        alerts = [EmergencyAlert.objects.create(user=self.user) for _ in range(25)]
+
+        seen = []
+        url = reverse('get-emergecy-list') + '?page_size=10'
+        while url:
+            data = self.client.get(url).data
+            self.assertTrue(data['success'])
+            self.assertNotIn('count', data)
+            self.assertLessEqual(len(data['data']), 10)
+            seen.extend(item['alert_id'] for item in data['data'])
+            url = data['next']
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(set(seen), {alert.alert_id for alert in alerts})
+
+    def test_count_is_opt_in(self):
+        for _ in range(3):
+            EmergencyAlert.objects.create(user=self.user)
+        url = reverse('get-emergecy-list')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'page_size': 2})
+        self.assertFalse([q for q in queries if q['sql'].startswith('SELECT COUNT(')])
+
+        data = self.client.get(url, {'page_size': 2, 'with_count': 1}).data
+        self.assertEqual((data['count'], len(data['data'])), (3, 2))
+
+    def test_page_size_is_capped(self):
+        for _ in range(3):
+            EmergencyAlert.objects.create(user=self.user)
+        data = self.client.get(reverse('get-emergecy-list'), {'page_size': 10000}).data
+        self.assertEqual(len(data['data']), 3)
+        self.assertIsNone(data['next'])
+
+    def test_plain_list_endpoint_uses_link_header(self):
+        for i in range(5):
+            CustomUser.objects.create_user(
+                email=f'agent{i}@example.com',
+                password=None,
+                full_name=f'Agent {i}',
+                user_type='agent',
+                agent_id=f'AG{i}',
+                responder_type='police'
+            )
+
+        response = self.client.get(reverse('get-responders'), {'page_size': 3})
+        self.assertEqual(len(response.data), 3)
+        self.assertIn('rel="next"', response['Link'])
+
+        next_url = response['Link'].split(';')[0].strip('<>')
+        response = self.client.get(next_url)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotIn('rel="next"', response['Link'])
+        self.assertIn('rel="prev"', response['Link'])
+
+    def test_learning_resources_with_equal_rank(self):
+        category = ResourceCategory.objects.create(name='Safety')
+        for i in range(7):
+            LearningResource.objects.create(category=category, title=f'Resource {i}', resource_type='article',
+                                            is_published=True)
+
+        seen = []
+        url = reverse('learning-resources-list') + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            seen.extend(item['title'] for item in response.data)
+            links = [link for link in response.get('Link', '').split(', ') if link.endswith('rel="next"')]
+            url = links[0].split(';')[0].strip('<>') if links else None
+
+        self.assertEqual(seen, [f'Resource {i}' for i in range(7)])
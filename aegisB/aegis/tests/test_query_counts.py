@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, EmergencyResponse
+
+
+class AlertListQueryCountTest(APITestCase):
+    """List endpoints must not issue per-row queries as the number of alerts grows"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.responder = CustomUser.objects.create_user(
+            email='agent@example.com',
+            password=None,
+            full_name='Agent',
+            user_type='agent',
+            agent_id='AG1',
+            responder_type='police'
+        )
+
+    def add_alerts(self, count):
+        for i in range(count):
+            alert = EmergencyAlert.objects.create(
+                user=self.user,
+                status='active' if i % 2 else 'resolved'
+            )
+            EmergencyResponse.objects.create(alert=alert, responder=self.responder)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def assert_constant_queries(self, url_name):
+        url = reverse(url_name)
+        self.add_alerts(2)
+        few, _ = self.count_queries(url)
+        self.add_alerts(10)
+        many, response = self.count_queries(url)
+        self.assertEqual(few, many)
+        return response
+
+    def test_emergency_list(self):
+        response = self.assert_constant_queries('get-emergecy-list')
+        self.assertEqual(len(response.data['data']), 12)
+        self.assertEqual(response.data['data'][0]['responders_count'], 1)
+
+    def test_active_emergencies(self):
+        response = self.assert_constant_queries('active-emergencies')
+        self.assertEqual(response.data['count'], 6)
+
+    def test_emergency_history(self):
+        response = self.assert_constant_queries('emergency-history')
+        self.assertEqual(response.data['count'], 6)
+
+    def test_alert_history(self):
+        response = self.assert_constant_queries('alert-history')
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(response.data[0]['user_info']['email'], 'victim@example.com')
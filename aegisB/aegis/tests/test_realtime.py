@@ -0,0 +1,94 @@
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from accounts.models import CustomUser
+from ..middleware import TokenAuthMiddleware
+from ..models import EmergencyAlert
+from ..routing import websocket_urlpatterns
+
+application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+
+class RealtimeTest(TransactionTestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.other = CustomUser.objects.create_user(
+            email='other@example.com',
+            password='password123',
+            full_name='Other'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.other_token = Token.objects.create(user=self.other)
+        self.alert = EmergencyAlert.objects.create(
+            user=self.user,
+            initial_latitude=23.8103,
+            initial_longitude=90.4125
+        )
+
+    def post_location(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        return client.post(reverse('update-location'), {
+            'alert_id': self.alert.alert_id,
+            'latitude': 23.8105,
+            'longitude': 90.4127,
+        }, format='json')
+
+    async def test_rejects_missing_or_foreign_token(self):
+        communicator = WebsocketCommunicator(application, f'/ws/emergency/{self.alert.alert_id}/')
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+        communicator = WebsocketCommunicator(
+            application, f'/ws/emergency/{self.alert.alert_id}/?token={self.other_token.key}'
+        )
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+    async def test_location_update_pushed_after_commit(self):
+        alert_socket = WebsocketCommunicator(
+            application, f'/ws/emergency/{self.alert.alert_id}/',
+            headers=[(b'authorization', f'Token {self.token.key}'.encode())]
+        )
+        connected, _ = await alert_socket.connect()
+        self.assertTrue(connected)
+
+        response = await sync_to_async(self.post_location)()
+        self.assertEqual(response.status_code, 200)
+
+        event = await alert_socket.receive_json_from(timeout=2)
+        self.assertEqual(event['type'], 'location.updated')
+        self.assertEqual(event['alert_id'], self.alert.alert_id)
+        self.assertAlmostEqual(event['data']['latitude'], 23.8105)
+        await alert_socket.disconnect()
+
+    async def test_clients_can_only_send_stamped_chat(self):
+        alert_socket = WebsocketCommunicator(
+            application, f'/ws/emergency/{self.alert.alert_id}/',
+            headers=[(b'authorization', f'Token {self.token.key}'.encode())]
+        )
+        connected, _ = await alert_socket.connect()
+        self.assertTrue(connected)
+
+        # An attempt to pass off a server event is refused, not broadcast
+        await alert_socket.send_json_to({'message': {'type': 'alert.resolved', 'alert_id': self.alert.alert_id}})
+        reply = await alert_socket.receive_json_from(timeout=2)
+        self.assertIn('error', reply)
+
+        await alert_socket.send_json_to({'message': 'On my way out of the building'})
+        event = await alert_socket.receive_json_from(timeout=2)
+        self.assertEqual(event['type'], 'chat.message')
+        self.assertEqual(event['message'], 'On my way out of the building')
+        self.assertEqual(event['sender']['id'], self.user.id)
+        self.assertTrue(await alert_socket.receive_nothing())
+        await alert_socket.disconnect()
@@ -0,0 +1,186 @@
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, IncidentReport, VideoEvidence
+from .. import risk
+
+GULSHAN = (23.7925, 90.4078)
+
+
+class RiskSurfaceTest(SimpleTestCase):
+    def setUp(self):
+        self.now = time.time()
+        self.surface = risk.RiskSurface.empty(now=self.now)
+        self.surface.deposit([GULSHAN[0]], [GULSHAN[1]], [2.0], [self.now])
+
+    def test_deposit_spreads_over_neighbouring_cells(self):
+        cell = risk.RISK_CELL_DEGREES
+        values = self.surface.values(
+            [GULSHAN[0], GULSHAN[0] + cell, GULSHAN[0] + cell, GULSHAN[0] + 3 * cell],
+            [GULSHAN[1], GULSHAN[1], GULSHAN[1] + cell, GULSHAN[1]],
+            self.now,
+        )
+        self.assertEqual(values.tolist(), [2.0, 1.0, 0.5, 0.0])
+        # Outside the grid is simply safe
+        self.assertEqual(self.surface.values([10.0], [10.0], self.now).tolist(), [0.0])
+
+    def test_time_decay(self):
+        later = self.now + risk.HALF_LIFE_SECONDS
+        self.assertAlmostEqual(self.surface.values([GULSHAN[0]], [GULSHAN[1]], later)[0], 1.0, places=5)
+
+        # An incident a half-life old when deposited counts half as much
+        surface = risk.RiskSurface.empty(now=self.now)
+        surface.deposit([GULSHAN[0]], [GULSHAN[1]], [2.0], [self.now - risk.HALF_LIFE_SECONDS])
+        self.assertAlmostEqual(surface.values([GULSHAN[0]], [GULSHAN[1]], self.now)[0], 1.0, places=5)
+
+        # Rebasing folds the decay in without changing what readers see
+        self.surface.rebase(later)
+        self.assertAlmostEqual(self.surface.values([GULSHAN[0]], [GULSHAN[1]], later)[0], 1.0, places=5)
+
+    def test_score_route(self):
+        through = [[GULSHAN[1] - 0.01, GULSHAN[0]], [GULSHAN[1] + 0.01, GULSHAN[0]]]
+        elsewhere = [[91.78, 22.35], [91.80, 22.36]]
+        risky = self.surface.score(through, self.now)
+        safe = self.surface.score(elsewhere, self.now)
+        self.assertEqual(safe, {'exposure': 0.0, 'peak': 0.0, 'safety_rating': 5.0})
+        self.assertEqual(risky['peak'], 2.0)
+        self.assertLess(risky['safety_rating'], 5.0)
+        self.assertGreaterEqual(risky['safety_rating'], 1.0)
+        self.assertEqual(self.surface.score([], self.now)['safety_rating'], 5.0)
+
+    def test_tile_is_png(self):
+        png = self.surface.tile(12, 3076, 1756, now=self.now)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+
+
+class RefreshTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'risk.npz')
+        self.settings_override = override_settings(RISK_SURFACE_PATH=self.path)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        risk._loaded.clear()
+
+    def value_at(self, surface, lat, lng):
+        return float(surface.values([lat], [lng])[0])
+
+    def test_incremental_refresh(self):
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=GULSHAN[0], initial_longitude=GULSHAN[1])
+        EmergencyAlert.objects.create(user=self.user, status='false_alarm', initial_latitude=22.35, initial_longitude=91.78)
+        EmergencyAlert.objects.create(user=self.user)
+        surface, added = risk.refresh()
+        self.assertEqual(added, 1)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertAlmostEqual(self.value_at(surface, *GULSHAN), 1.0, places=3)
+        self.assertEqual(self.value_at(surface, 22.35, 91.78), 0)
+
+        IncidentReport.objects.create(
+            user=self.user, incident_type='robbery', title='Robbery', description='',
+            incident_date=timezone.now(), latitude=GULSHAN[0], longitude=GULSHAN[1], priority='urgent'
+        )
+        VideoEvidence.objects.create(
+            user=self.user, location_lat=GULSHAN[0], location_lng=GULSHAN[1],
+            recorded_at=timezone.now() - timedelta(days=risk.RISK_HALF_LIFE_DAYS)
+        )
+        surface, added = risk.refresh()
+        self.assertEqual(added, 2)
+        self.assertAlmostEqual(self.value_at(surface, *GULSHAN), 1.0 + 2.0 + 0.25, places=3)
+
+        # Nothing new, nothing added; the saved file is what readers load
+        self.assertEqual(risk.refresh()[1], 0)
+        risk._loaded.clear()
+        self.assertAlmostEqual(self.value_at(risk.get_surface(), *GULSHAN), 3.25, places=3)
+
+    def test_rebuild_drops_deleted_rows(self):
+        alert = EmergencyAlert.objects.create(user=self.user, initial_latitude=GULSHAN[0], initial_longitude=GULSHAN[1])
+        risk.refresh()
+        alert.delete()
+        self.assertGreater(self.value_at(risk.refresh()[0], *GULSHAN), 0)
+        self.assertEqual(self.value_at(risk.refresh(rebuild=True)[0], *GULSHAN), 0)
+
+    @override_settings(TASK_BACKEND='immediate')
+    def test_stale_surface_refreshes_in_background(self):
+        risk.refresh()
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=GULSHAN[0], initial_longitude=GULSHAN[1])
+        risk.get_surface().meta['refreshed_at'] -= risk.RISK_REFRESH_SECONDS + 1
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            stale = risk.get_surface()
+        self.assertEqual(self.value_at(stale, *GULSHAN), 0)
+        self.assertGreater(self.value_at(risk.get_surface(), *GULSHAN), 0)
+
+    @override_settings(TASK_BACKEND='immediate')
+    def test_cold_start_answers_empty_and_builds_in_background(self):
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=GULSHAN[0], initial_longitude=GULSHAN[1])
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(0):
+                cold = risk.get_surface()
+        self.assertEqual(self.value_at(cold, *GULSHAN), 0)
+        self.assertGreater(self.value_at(risk.get_surface(), *GULSHAN), 0)
+
+    def test_readers_are_not_blocked_by_a_refresh(self):
+        first = risk.refresh()[0]
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=GULSHAN[0], initial_longitude=GULSHAN[1])
+        seen = []
+
+        def add_new_rows(surface):
+            # Mid-refresh, from another thread: the previous grid is still served
+            reader = threading.Thread(target=lambda: seen.append(risk.get_surface()))
+            reader.start()
+            reader.join(5)
+            return original(surface)
+
+        original = risk.add_new_rows
+        with mock.patch.object(risk, 'add_new_rows', side_effect=add_new_rows):
+            refreshed = risk.refresh()[0]
+        self.assertEqual(seen, [first])
+        self.assertIs(risk.get_surface(), refreshed)
+
+
+@override_settings(RISK_SURFACE_PATH=None)
+class RiskTileTest(APITestCase):
+    def setUp(self):
+        risk._loaded.clear()
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def test_tile(self):
+        EmergencyAlert.objects.create(user=self.user, initial_latitude=GULSHAN[0], initial_longitude=GULSHAN[1])
+        response = self.client.get(reverse('risk-tile', args=[12, 3076, 1756]), HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+
+    def test_invalid_tile(self):
+        response = self.client.get(reverse('risk-tile', args=[2, 4, 0]), HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        response = self.client.get(reverse('risk-tile', args=[12, 3076, 1756]), HTTP_ACCEPT='image/png')
+        self.assertEqual(response.status_code, 401)
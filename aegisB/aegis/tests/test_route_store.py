@@ -0,0 +1,161 @@
+import copy
+import json
+import os
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from django.apps import apps as global_apps
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, RouteGeometry, SafeRoute
+from .. import local_routing, route_store
+from .test_local_routing import at, grid_ways
+
+
+class RouteStoreTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.route_data = local_routing.RoadGraph.from_ways(grid_ways()).route(at(0, 0), at(4, 4))
+
+    def test_key_folds_nearby_origins_and_hazard_order(self):
+        key = route_store.route_key([90.4121, 23.8103], [90.3742, 23.7461], [(23.79, 90.40), (23.75, 90.38)])
+        self.assertEqual(key, route_store.route_key(
+            [90.41214, 23.81032], [90.3742, 23.7461], [(23.75, 90.38), (23.79, 90.40), (23.79, 90.40)]
+        ))
+        self.assertNotEqual(key, route_store.route_key([90.4125, 23.8103], [90.3742, 23.7461], [(23.79, 90.40)]))
+        self.assertNotEqual(key, route_store.route_key(
+            [90.4125, 23.8103], [90.3742, 23.7461], [(23.79, 90.40), (23.75, 90.38)], profile='foot-walking'
+        ))
+
+    def test_store_round_trips_path(self):
+        geometry = route_store.store('k', self.route_data)
+        feature = self.route_data['features'][0]
+        self.assertEqual(route_store.coordinates(geometry), feature['geometry']['coordinates'])
+        self.assertEqual(geometry.distance_m, feature['properties']['summary']['distance'])
+        self.assertEqual(geometry.engine, 'local')
+        self.assertLess(len(geometry.polyline), len(json.dumps(feature['geometry']['coordinates'])) / 3)
+        self.assertEqual(json.loads(route_store.geojson_geometry(geometry)),
+                         {'type': 'LineString', 'coordinates': feature['geometry']['coordinates']})
+
+    def test_stale_geometry_is_superseded_not_changed(self):
+        geometry = route_store.store('k', self.route_data)
+        self.assertEqual(route_store.lookup('k'), geometry)
+        RouteGeometry.objects.filter(pk=geometry.pk).update(
+            created_at=timezone.now() - timedelta(seconds=route_store.ROUTE_CACHE_SECONDS + 1)
+        )
+        self.assertIsNone(route_store.lookup('k'))
+
+        rerouted = copy.deepcopy(self.route_data)
+        rerouted['features'][0]['geometry']['coordinates'].reverse()
+        fresh = route_store.store('k', rerouted)
+        self.assertNotEqual(fresh.pk, geometry.pk)
+        self.assertEqual(route_store.lookup('k'), fresh)
+        # Routes planned on the old geometry still get the path they were shown
+        old = RouteGeometry.objects.get(pk=geometry.pk)
+        self.assertEqual(old.polyline, geometry.polyline)
+        self.assertNotEqual(route_store.geojson_geometry(old), route_store.geojson_geometry(fresh))
+
+    def test_migration_moves_legacy_paths(self):
+        user = CustomUser.objects.create_user(email='victim@example.com', password='password123', full_name='Victim')
+        path = self.route_data['features'][0]['geometry']['coordinates']
+        route = SafeRoute.objects.create(user=user, destination='Office', route_data={
+            'distance': '0.9 km', 'route_path': path, 'raw_route_data': self.route_data,
+        })
+        migration = import_module('aegis.migrations.0021_route_geometry')
+        migration.move_paths_to_geometry(global_apps, None)
+
+        route.refresh_from_db()
+        self.assertEqual(route.route_data, {'distance': '0.9 km'})
+        self.assertEqual(route_store.coordinates(route.geometry), path)
+        self.assertEqual(route.geometry.engine, 'local')
+        # Legacy geometries are never handed out for new requests
+        self.assertIsNone(route_store.lookup(route_store.route_key(at(0, 0), at(4, 4))))
+
+
+class SharedRouteTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.graph_path = os.path.join(cls.tmp.name, 'graph')
+        local_routing.RoadGraph.from_ways(grid_ways(side=11)).save(cls.graph_path)
+        cls.settings_override = override_settings(
+            ROUTING_GRAPH_PATH=cls.graph_path, ROUTING_BACKEND='local', OPENROUTE_BASE_URL='http://127.0.0.1:9'
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.users = []
+        for name in ('victim', 'friend'):
+            user = CustomUser.objects.create_user(
+                email=f'{name}@example.com',
+                password='password123',
+                full_name=name.title()
+            )
+            self.users.append((user, Token.objects.create(user=user).key))
+
+    def find_route(self, token, start=at(0, 0)):
+        end = at(0, 10)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token)
+        response = self.client.post(reverse('find-safe-route'), {
+            'destination': 'Office',
+            'destination_lat': end[1], 'destination_lng': end[0],
+            'current_lat': start[1], 'current_lng': start[0],
+        }, format='json')
+        self.assertTrue(response.data['success'], response.data)
+        return response.data['data']
+
+    def test_identical_trips_share_one_geometry(self):
+        first = self.find_route(self.users[0][1])
+        with self.settings(ROUTING_GRAPH_PATH=None):
+            # Nothing could route this now; the stored geometry answers
+            second = self.find_route(self.users[1][1], start=[at(0, 0)[0] + 0.0001, at(0, 0)[1]])
+        self.assertEqual(second['route_path'], first['route_path'])
+        self.assertEqual(second['distance'], first['distance'])
+        self.assertEqual(RouteGeometry.objects.count(), 1)
+        self.assertEqual(RouteGeometry.objects.get().routes.count(), 2)
+        route = SafeRoute.objects.get(id=first['route_id'])
+        self.assertNotIn('route_path', route.route_data)
+        self.assertNotIn('raw_route_data', route.route_data)
+
+    def test_avoidance_set_is_part_of_the_key(self):
+        direct = self.find_route(self.users[0][1])
+        user, token = self.users[1]
+        EmergencyAlert.objects.create(user=user, initial_latitude=at(0, 5)[1], initial_longitude=at(0, 5)[0])
+        detour = self.find_route(token)
+        self.assertIn(at(0, 5), direct['route_path'])
+        self.assertNotIn(at(0, 5), detour['route_path'])
+        self.assertEqual(RouteGeometry.objects.count(), 2)
+
+    def test_route_geojson(self):
+        user, token = self.users[0]
+        EmergencyAlert.objects.create(user=user, initial_latitude=at(0, 5)[1], initial_longitude=at(0, 5)[0],
+                                      initial_address='Market')
+        data = self.find_route(token)
+        response = self.client.post(reverse('route-geojson'), {'route_id': data['route_id']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertTrue(body['success'])
+        line, avoided = body['data']['features']
+        self.assertEqual(line['properties'], {'name': 'Route to Office', 'distance': data['distance'],
+                                              'duration': data['duration']})
+        self.assertEqual(line['geometry'], {'type': 'LineString', 'coordinates': data['route_path']})
+        self.assertEqual(avoided['properties']['name'], 'Avoided: Market')
+        self.assertEqual(avoided['geometry']['coordinates'], at(0, 5))
+
+    def test_route_geojson_not_found(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.users[0][1])
+        response = self.client.post(reverse('route-geojson'), {'route_id': 999}, format='json')
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,147 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from .. import rollups
+from ..models import EmergencyAlert, IncidentReport, StatsRollup, VideoEvidence
+
+
+class StatisticsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='controller@example.com',
+            password='password123',
+            full_name='Controller',
+            user_type='controller'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def add_evidence(self, count):
+        VideoEvidence.objects.bulk_create([
+            VideoEvidence(
+                user=self.user,
+                video_file='video_evidence/clip.mp4',
+                duration_seconds=60,
+                file_size=1024,
+                is_anonymous=bool(i % 2),
+                status='verified' if i % 3 == 0 else 'pending',
+                type='robbery'
+            )
+            for i in range(count)
+        ])
+
+    def get(self, url_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(url_name))
+        return len(queries), response.data
+
+    def test_video_evidence_statistics(self):
+        self.add_evidence(2)
+        few, _ = self.get('video-evidence-statistics')
+        self.add_evidence(10)
+        many, data = self.get('video-evidence-statistics')
+
+        self.assertEqual(few, many)
+        self.assertEqual(data['total_videos'], 12)
+        self.assertEqual(data['total_duration_seconds'], 720)
+        self.assertEqual(data['total_file_size'], 12 * 1024)
+        self.assertEqual(data['anonymous_count'], 6)
+        self.assertEqual(data['recent_count'], 12)
+        self.assertEqual(data['status_statistics'], {'verified': 5, 'pending': 7, 'under_review': 0, 'rejected': 0})
+        self.assertEqual(data['type_statistics']['robbery'], 12)
+
+    def test_empty_video_evidence_statistics(self):
+        _, data = self.get('video-evidence-statistics')
+        self.assertEqual(data['total_duration_seconds'], 0)
+        self.assertEqual(data['average_duration_seconds'], 0)
+
+    def test_incident_statistics(self):
+        _, data = self.get('incident-statistics')
+        self.assertEqual(data['total_reports'], 0)
+        self.assertIsNone(data['last_submission'])
+
+        for status in ('submitted', 'submitted', 'resolved'):
+            IncidentReport.objects.create(
+                user=self.user,
+                incident_type=IncidentReport.INCIDENT_TYPES[0][0],
+                title='Report',
+                description='Details',
+                incident_date=timezone.now(),
+                status=status
+            )
+        queries, data = self.get('incident-statistics')
+        self.assertLessEqual(queries, 3)
+        self.assertEqual(data['total_reports'], 3)
+        self.assertEqual(data['status_counts']['submitted'], 2)
+        self.assertEqual(data['status_counts']['dismissed'], 0)
+        self.assertEqual(data['type_counts'][IncidentReport.INCIDENT_TYPES[0][0]], 3)
+        self.assertIsNotNone(data['last_submission'])
+
+
+class StatsRollupTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='controller@example.com',
+            password='password123',
+            full_name='Controller',
+            user_type='controller'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def buckets(self):
+        return sorted(
+            StatsRollup.objects.filter(row_count__gt=0).values_list(
+                'source', 'day', 'user_id', 'status', 'kind', 'severity', 'is_anonymous',
+                'row_count', 'duration_seconds', 'file_size'
+            )
+        )
+
+    def make_changes(self):
+        evidence = [
+            VideoEvidence.objects.create(
+                user=self.user,
+                video_file='video_evidence/clip.mp4',
+                duration_seconds=30 * (i + 1),
+                file_size=100,
+                type='robbery' if i % 2 else 'assault'
+            )
+            for i in range(4)
+        ]
+        evidence[0].status = 'verified'
+        evidence[0].save()
+        evidence[1].duration_seconds = 500
+        evidence[1].save()
+        evidence[2].delete()
+
+        alert = EmergencyAlert.objects.create(user=self.user)
+        alert.status = 'resolved'
+        alert.save()
+        EmergencyAlert.objects.create(user=self.user)
+
+    def test_incremental_matches_rebuild(self):
+        self.make_changes()
+        incremental = self.buckets()
+        self.assertTrue(incremental)
+
+        rollups.rebuild()
+        self.assertEqual(self.buckets(), incremental)
+
+    def test_endpoints_match_raw_tables(self):
+        self.make_changes()
+        for url_name in ('video-evidence-statistics', 'emergency-statistics', 'incident-statistics'):
+            raw = self.client.get(reverse(url_name)).data
+            rolled = self.client.get(reverse(url_name), {'rollup': 'true'}).data
+            self.assertEqual(rolled, raw, url_name)
+
+    def test_rollup_queries_do_not_touch_source_tables(self):
+        self.make_changes()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('video-evidence-statistics'), {'rollup': 'true'})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('aegis_statsrollup', sql)
+        self.assertNotIn('aegis_videoevidence', sql)
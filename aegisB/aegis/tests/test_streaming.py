@@ -0,0 +1,151 @@
+import os
+import tempfile
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, EmergencyResponse, MediaCapture, VideoEvidence
+from ..streaming import parse_range
+
+CONTENT = bytes(range(256)) * 40
+
+
+def body(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+class ParseRangeTest(APITestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_ignored_ranges_send_everything(self):
+        for header in (None, '', 'bytes=-', 'bytes=5-1', 'bytes=0-1,5-9', 'items=0-1'):
+            self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=-0'):
+            with self.assertRaises(ValueError):
+                parse_range(header, 1000)
+
+
+class MediaStreamTest(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.evidence = VideoEvidence.objects.create(
+            user=self.user, title='Clip', video_file=ContentFile(CONTENT, name='clip.mp4')
+        )
+        self.url = reverse('stream-media', args=['evidence', self.evidence.id])
+
+    def login(self, email, **fields):
+        user = CustomUser.objects.create_user(
+            email=email,
+            password='password123',
+            full_name=email.split('@')[0],
+            **fields
+        )
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        return user
+
+    def test_whole_file(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='video/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(body(response), CONTENT)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(CONTENT)}')
+        self.assertEqual(response['Content-Length'], '1000')
+        self.assertEqual(body(response), CONTENT[1000:2000])
+
+    def test_suffix_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body(response), CONTENT[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A Range against an older copy of the file gets the current file whole
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body(response), CONTENT)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_access_control(self):
+        self.login('stranger@example.com')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        response = self.client.get(reverse('get-video-evidence', args=[self.evidence.id]))
+        self.assertEqual(response.status_code, 403)
+
+        self.login('controller@example.com', user_type='controller')
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_alert_media_for_responders(self):
+        alert = EmergencyAlert.objects.create(user=self.user)
+        media = MediaCapture.objects.create(alert=alert, media_type='audio',
+                                            file=ContentFile(CONTENT, name='a.wav'))
+        url = reverse('stream-media', args=['emergency', media.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        agent = self.login('agent@example.com', user_type='agent', agent_id='AG1',
+                           responder_type='police')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        EmergencyResponse.objects.create(alert=alert, responder=agent)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_variants(self):
+        response = self.client.get(self.url, {'variant': 'thumbnail'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'variant': 'original'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('stream-media', args=['nope', 1])).status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected/')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.evidence.video_file.name)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.tmp.name, self.evidence.video_file.name))
+
+    def test_serializer_stream_url(self):
+        response = self.client.get(reverse('get-video-evidence', args=[self.evidence.id]))
+        self.assertEqual(response.data['stream_url'], self.url)
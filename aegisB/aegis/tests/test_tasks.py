@@ -0,0 +1,137 @@
+import threading
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import BackgroundJob, EmergencyAlert, EmergencyContact, EmergencyNotification
+from .. import tasks
+
+CALLS = []
+
+
+@tasks.task(max_attempts=2, backoff=0)
+def flaky(fail_times):
+    CALLS.append(fail_times)
+    if len(CALLS) <= fail_times:
+        raise RuntimeError('temporary failure')
+
+
+@override_settings(TASK_BACKEND='database')
+class DatabaseBackendTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_idempotency_key(self):
+        tasks.enqueue(flaky, 0, idempotency_key='once')
+        tasks.enqueue(flaky, 0, idempotency_key='once')
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(BackgroundJob.objects.get().status, 'done')
+
+    def test_retry_then_succeed(self):
+        tasks.enqueue(flaky, 1)
+        tasks.run_pending(limit=1)
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.status, 'pending')
+        self.assertIn('temporary failure', job.last_error)
+
+        tasks.run_pending(limit=1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.attempts, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        tasks.enqueue(flaky, 5)
+        tasks.run_pending()
+        tasks.run_pending()
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(len(CALLS), 2)
+
+
+class ThreadBackendTest(TestCase):
+    def test_runs_on_pool_after_commit(self):
+        done = threading.Event()
+        backend = tasks.ThreadBackend(workers=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            backend.enqueue(done.set, (), {})
+        self.assertTrue(done.wait(5))
+
+
+class ImmediateBackendTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+        cache.clear()
+
+    def test_rollback_leaves_idempotency_key_free(self):
+        backend = tasks.ImmediateBackend()
+        with self.captureOnCommitCallbacks():
+            backend.enqueue(flaky, (0,), {}, idempotency_key='once')
+        # The transaction rolled back: its callbacks never run
+        self.assertEqual(CALLS, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            backend.enqueue(flaky, (0,), {}, idempotency_key='once')
+            backend.enqueue(flaky, (0,), {}, idempotency_key='once')
+        self.assertEqual(CALLS, [0])
+
+
+class ActivationJobsTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        for i in range(3):
+            CustomUser.objects.create_user(
+                email=f'agent{i}@example.com',
+                password=None,
+                full_name=f'Agent {i}',
+                user_type='agent',
+                agent_id=f'AG{i}',
+                responder_type='police',
+                status='available'
+            )
+            EmergencyContact.objects.create(user=self.user, name=f'Contact {i}', phone=f'+880170000000{i}')
+
+    def activate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('activate-emergency'), {'activation_method': 'button', 'is_silent': True}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    @override_settings(TASK_BACKEND='database')
+    def test_activation_queues_fan_out(self):
+        response = self.activate()
+        alert = EmergencyAlert.objects.get(alert_id=response.data['alert_id'])
+        self.assertEqual(response.data['responders_assigned'], 0)
+        self.assertEqual(response.data['contacts_notified'], 3)
+        self.assertEqual(alert.responses.count(), 0)
+        self.assertEqual(BackgroundJob.objects.count(), 2)
+
+        # Responder dispatch and one batched send to all contacts
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(alert.outbound_messages.filter(status='sent').count(), 3)
+        self.assertEqual(alert.responses.count(), 3)
+        notification = EmergencyNotification.objects.get(user=self.user, notification_type='alert_activated')
+        self.assertEqual(notification.data['responders_count'], 3)
+        self.assertFalse(BackgroundJob.objects.exclude(status='done').exists())
+
+        # Re-running dispatch does not assign anyone twice
+        tasks.run_job(BackgroundJob.objects.filter(task__endswith='dispatch_alert').get())
+        self.assertEqual(alert.responses.count(), 3)
+
+    @override_settings(TASK_BACKEND='immediate')
+    def test_immediate_backend(self):
+        response = self.activate()
+        alert = EmergencyAlert.objects.get(alert_id=response.data['alert_id'])
+        self.assertEqual(alert.responses.count(), 3)
+        self.assertEqual(BackgroundJob.objects.count(), 0)
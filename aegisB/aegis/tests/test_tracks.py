@@ -0,0 +1,96 @@
+from datetime import timedelta
+import numpy as np
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, LocationTrackChunk, LocationUpdate
+from .. import polyline, tracks
+
+
+def create_track(alert, count, start, step_seconds=1):
+    LocationUpdate.objects.bulk_create([
+        LocationUpdate(
+            alert=alert,
+            latitude=round(23.81 + i * 0.00001, 6),
+            longitude=round(90.41 + (i % 7) * 0.000003, 6),
+            accuracy=5.0 if i % 2 else None,
+            timestamp=start + timedelta(seconds=i * step_seconds)
+        )
+        for i in range(count)
+    ])
+
+
+class TrackStorageTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        self.start = timezone.now().replace(microsecond=0) - timedelta(hours=2)
+
+    def test_compact_round_trip(self):
+        create_track(self.alert, 100, self.start)
+        before = tracks.load_track(self.alert)
+
+        compacted = tracks.compact_alert(self.alert, self.start + timedelta(seconds=60))
+        self.assertEqual(compacted, 60)
+        self.assertEqual(LocationUpdate.objects.filter(alert=self.alert).count(), 40)
+        self.assertEqual(LocationTrackChunk.objects.get(alert=self.alert).point_count, 60)
+
+        after = tracks.load_track(self.alert)
+        self.assertEqual(len(after['t']), 100)
+        np.testing.assert_allclose(after['lat'], before['lat'], atol=1e-9)
+        np.testing.assert_allclose(after['lng'], before['lng'], atol=1e-9)
+        np.testing.assert_allclose(after['t'], before['t'], atol=1e-3)
+        np.testing.assert_array_equal(np.isnan(after['accuracy']), np.isnan(before['accuracy']))
+
+    def test_douglas_peucker(self):
+        # A straight line collapses to its ends, a corner survives
+        x = np.array([0.0, 1.0, 2.0, 3.0, 3.0, 3.0])
+        y = np.array([0.0, 0.0, 0.0, 0.0, 1.0, 2.0])
+        self.assertEqual(list(tracks.douglas_peucker(x, y, 0.1)), [0, 3, 5])
+
+    def test_time_buckets_and_max_points(self):
+        create_track(self.alert, 600, self.start)
+        track = tracks.load_track(self.alert)
+
+        bucketed = tracks.downsample(track, bucket_seconds=60, max_points=None)
+        self.assertEqual(len(bucketed['t']), 11)
+
+        bounded = tracks.downsample(track, max_points=100)
+        self.assertEqual(len(bounded['t']), 100)
+        self.assertEqual(bounded['t'][0], track['t'][0])
+        self.assertEqual(bounded['t'][-1], track['t'][-1])
+
+
+class TrackEndpointTest(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.alert = EmergencyAlert.objects.create(user=self.user)
+        create_track(self.alert, 2000, timezone.now() - timedelta(hours=1))
+
+    def test_map_data_track_is_bounded(self):
+        url = reverse('emergency-map-data', kwargs={'alert_id': self.alert.alert_id})
+        response = self.client.get(url, {'max_points': 200})
+        track = response.data['data']['track']
+        self.assertEqual(track['total_points'], 2000)
+        self.assertEqual(track['returned_points'], 200)
+        self.assertEqual(len(polyline.decode(track['polyline'], 6)), 200)
+        self.assertEqual(len(track['timestamps']), 200)
+
+    def test_detail_bounds_location_updates(self):
+        url = reverse('emergency-details', kwargs={'alert_id': self.alert.alert_id})
+        data = self.client.get(url).data['data']
+        self.assertEqual(len(data['location_updates']), 50)
+        self.assertEqual(data['track']['returned_points'], 500)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import tempfile
+import zlib
+from datetime import timedelta
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from accounts.models import CustomUser
+from ..models import EmergencyAlert, EmergencyNotification, MediaCapture, UploadSession, VideoEvidence
+from .. import uploads
+
+
+class ResumableUploadTest(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.tmp.name, 'media'),
+            UPLOAD_TEMP_DIR=os.path.join(self.tmp.name, 'partial'),
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.user = CustomUser.objects.create_user(
+            email='victim@example.com',
+            password='password123',
+            full_name='Victim'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.evidence = VideoEvidence.objects.create(user=self.user)
+        self.content = os.urandom(300 * 1024)
+
+    def start(self, **data):
+        data = {'target': 'video_evidence', 'evidence_id': self.evidence.id, 'filename': 'clip.mp4',
+                'size': len(self.content), 'content_type': 'video/mp4', **data}
+        return self.client.post(reverse('start-upload'), data, format='json')
+
+    def put(self, upload_id, offset, chunk, **headers):
+        return self.client.generic('PUT', reverse('upload-chunk', args=[upload_id]), chunk,
+                                   content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def finalize(self, upload_id, **data):
+        return self.client.post(reverse('finalize-upload', args=[upload_id]), data, format='json')
+
+    def upload(self, upload_id, chunk_size=100 * 1024):
+        for offset in range(0, len(self.content), chunk_size):
+            response = self.put(upload_id, offset, self.content[offset:offset + chunk_size])
+            self.assertEqual(response.status_code, 200, response.data)
+
+    def test_chunked_upload_attaches_video(self):
+        upload_id = self.start().data['data']['upload_id']
+        self.upload(upload_id)
+        response = self.finalize(upload_id, crc32=zlib.crc32(self.content))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['data']['status'], 'complete')
+
+        self.evidence.refresh_from_db()
+        self.assertEqual(self.evidence.file_size, len(self.content))
+        self.assertTrue(self.evidence.video_file.name.endswith('.mp4'))
+        with self.evidence.video_file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        # The part file was moved, not copied
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'partial')), [])
+
+        self.assertEqual(self.finalize(upload_id).status_code, 409)
+        self.assertEqual(self.start().status_code, 400)
+
+    def test_resume_after_dropped_chunk(self):
+        upload_id = self.start().data['data']['upload_id']
+        self.assertEqual(self.put(upload_id, 0, self.content[:100 * 1024]).data['data']['offset'], 100 * 1024)
+
+        # A chunk cut off mid-way is not accepted, nor is one at the wrong place
+        session = UploadSession.objects.get(upload_id=upload_id)
+        with self.assertRaises(uploads.UploadError):
+            uploads.write_chunk(session, 100 * 1024, mock.Mock(read=mock.Mock(side_effect=[b'x' * 10, b''])), 1000)
+        response = self.put(upload_id, 200 * 1024, self.content[200 * 1024:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['data']['offset'], 100 * 1024)
+
+        # The client asks where to carry on from
+        offset = self.client.get(reverse('upload-chunk', args=[upload_id])).data['data']['offset']
+        self.assertEqual(self.put(upload_id, offset, self.content[offset:]).status_code, 200)
+        self.assertEqual(self.finalize(upload_id, crc32=zlib.crc32(self.content)).status_code, 200)
+        self.evidence.refresh_from_db()
+        with self.evidence.video_file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+
+    def test_checksums(self):
+        upload_id = self.start().data['data']['upload_id']
+        chunk = self.content[:1024]
+        response = self.put(upload_id, 0, chunk, HTTP_X_CHUNK_SHA256=hashlib.sha256(b'other').hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['data']['offset'], 0)
+        response = self.put(upload_id, 0, chunk, HTTP_X_CHUNK_SHA256=hashlib.sha256(chunk).hexdigest())
+        self.assertEqual(response.data['data']['offset'], 1024)
+
+        self.assertEqual(self.finalize(upload_id).status_code, 400)
+        self.put(upload_id, 1024, self.content[1024:])
+        self.assertEqual(self.finalize(upload_id, crc32=zlib.crc32(b'other')).status_code, 400)
+        self.assertEqual(self.finalize(upload_id, crc32=zlib.crc32(self.content)).status_code, 200)
+
+    def test_media_capture_for_alert(self):
+        alert = EmergencyAlert.objects.create(user=self.user)
+        response = self.start(target='media_capture', alert_id=alert.alert_id, media_type='audio',
+                              filename='recording.m4a', content_type='audio/mp4', duration=30)
+        self.assertEqual(response.status_code, 201, response.data)
+        upload_id = response.data['data']['upload_id']
+        self.upload(upload_id)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200, response.data)
+
+        media = MediaCapture.objects.get(id=response.data['data']['media_id'])
+        self.assertEqual((media.alert, media.media_type, media.duration), (alert, 'audio', 30))
+        self.assertEqual((media.file_size, media.mime_type), (len(self.content), 'audio/mp4'))
+        self.assertTrue(media.file.name.startswith(f'emergency/{alert.alert_id}/'))
+        self.assertTrue(EmergencyNotification.objects.filter(alert=alert, notification_type='media_uploaded').exists())
+
+    def test_validation(self):
+        self.assertEqual(self.start(filename='clip.exe').status_code, 400)
+        self.assertEqual(self.start(size=uploads.UPLOAD_MAX_SIZE + 1).status_code, 413)
+        self.assertEqual(self.start(target='media_capture').status_code, 400)
+        self.assertEqual(self.start(evidence_id=self.evidence.id + 1).status_code, 404)
+
+        upload_id = self.start().data['data']['upload_id']
+        self.assertEqual(self.put(upload_id, 0, self.content + b'extra').status_code, 400)
+        other = CustomUser.objects.create_user(email='other@example.com', password='password123', full_name='Other')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=other).key)
+        self.assertEqual(self.put(upload_id, 0, self.content[:10]).status_code, 404)
+
+    def test_purge_abandoned_uploads(self):
+        upload_id = self.start().data['data']['upload_id']
+        session = UploadSession.objects.get(upload_id=upload_id)
+        self.assertEqual(uploads.purge_expired(), 0)
+        later = timezone.now() + timedelta(seconds=uploads.UPLOAD_SESSION_SECONDS + 1)
+        self.assertEqual(uploads.purge_expired(now=later), 1)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(uploads.part_path(session)))
+
+    def test_multipart_upload_still_works(self):
+        video = SimpleUploadedFile('clip.mp4', self.content, content_type='video/mp4')
+        response = self.client.post(reverse('upload-video-file', args=[self.evidence.id]), {'video_file': video})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.evidence.refresh_from_db()
+        self.assertEqual(self.evidence.file_size, len(self.content))
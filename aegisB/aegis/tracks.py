@@ -0,0 +1,272 @@
+"""
+Compact storage and downsampling of victim location tracks.
+
+Old LocationUpdate rows are folded into LocationTrackChunk rows: positions as
+delta-encoded int32 micro-degrees, time as int32 millisecond deltas from the
+chunk start, and the optional sensor readings as float32 (NaN when missing),
+all zlib-compressed. `load_track` reads chunks and remaining rows back into
+NumPy arrays, and `downsample` reduces a track to what a map can show.
+"""
+import math
+import struct
+import zlib
+
+import numpy as np
+from django.db import transaction
+
+from . import polyline
+from .models import LocationTrackChunk, LocationUpdate
+
+# Points per stored chunk
+CHUNK_POINTS = 4096
+# Upper bound on points returned to clients when nothing else is requested
+DEFAULT_MAX_POINTS = 1000
+
+MICRODEGREES = 1_000_000
+METERS_PER_DEGREE = 111_320
+SENSOR_FIELDS = ['accuracy', 'speed', 'altitude', 'heading']
+_HEADER = struct.Struct('<I')
+
+
+def empty_track():
+    track = {'t': np.empty(0), 'lat': np.empty(0), 'lng': np.empty(0)}
+    for field in SENSOR_FIELDS:
+        track[field] = np.empty(0)
+    return track
+
+
+def _epoch(value):
+    return value.timestamp()
+
+
+# Encoding
+
+def pack(track):
+    """Encode a track (dict of equal-length arrays, sorted by time) into chunk bytes"""
+    count = len(track['t'])
+    lat = np.round(track['lat'] * MICRODEGREES).astype(np.int64)
+    lng = np.round(track['lng'] * MICRODEGREES).astype(np.int64)
+    t = np.round((track['t'] - track['t'][0]) * 1000).astype(np.int64)
+
+    parts = [_HEADER.pack(count)]
+    for column in (lat, lng, t):
+        parts.append(np.diff(column, prepend=0).astype('<i4').tobytes())
+    for field in SENSOR_FIELDS:
+        parts.append(np.asarray(track[field], dtype='<f4').tobytes())
+    return zlib.compress(b''.join(parts))
+
+
+def unpack(data, start_time):
+    """Decode chunk bytes back into a track"""
+    raw = zlib.decompress(bytes(data))
+    (count,) = _HEADER.unpack_from(raw)
+    offset = _HEADER.size
+
+    columns = []
+    for _ in range(3):
+        columns.append(np.cumsum(np.frombuffer(raw, dtype='<i4', count=count, offset=offset), dtype=np.int64))
+        offset += 4 * count
+    track = {
+        'lat': columns[0] / MICRODEGREES,
+        'lng': columns[1] / MICRODEGREES,
+        't': _epoch(start_time) + columns[2] / 1000,
+    }
+    for field in SENSOR_FIELDS:
+        track[field] = np.frombuffer(raw, dtype='<f4', count=count, offset=offset).astype(np.float64)
+        offset += 4 * count
+    return track
+
+
+def compacted_times(alert, first, last):
+    """Epoch milliseconds of the alert's compacted points between two datetimes"""
+    times = set()
+    for chunk in alert.track_chunks.filter(start_time__lte=last, end_time__gte=first):
+        t = unpack(chunk.data, chunk.start_time)['t']
+        times.update(np.round(t * 1000).astype(np.int64).tolist())
+    return times
+
+
+def rows_to_track(rows):
+    """Build a track from LocationUpdate values() dicts"""
+    track = {
+        't': np.array([_epoch(row['timestamp']) for row in rows], dtype=np.float64),
+        'lat': np.array([float(row['latitude']) for row in rows], dtype=np.float64),
+        'lng': np.array([float(row['longitude']) for row in rows], dtype=np.float64),
+    }
+    for field in SENSOR_FIELDS:
+        track[field] = np.array(
+            [np.nan if row[field] is None else row[field] for row in rows], dtype=np.float64
+        )
+    return track
+
+
+def concat(tracks):
+    tracks = [track for track in tracks if len(track['t'])]
+    if not tracks:
+        return empty_track()
+    merged = {key: np.concatenate([track[key] for track in tracks]) for key in tracks[0]}
+    # Sort by time and drop repeated timestamps (a point re-sent after compaction)
+    _, first = np.unique(merged['t'], return_index=True)
+    return {key: values[first] for key, values in merged.items()}
+
+
+def load_track(alert):
+    """The alert's full track, compacted and live rows together, ordered by time"""
+    parts = [unpack(chunk.data, chunk.start_time) for chunk in alert.track_chunks.all()]
+    rows = LocationUpdate.objects.filter(alert=alert).order_by('timestamp').values(
+        'timestamp', 'latitude', 'longitude', *SENSOR_FIELDS
+    )
+    parts.append(rows_to_track(list(rows)))
+    return concat(parts)
+
+
+# Compaction
+
+def compact_alert(alert, before):
+    """
+    Move the alert's LocationUpdate rows older than `before` into chunks.
+    Returns the number of rows compacted.
+    """
+    with transaction.atomic():
+        rows = list(
+            LocationUpdate.objects.select_for_update()
+            .filter(alert=alert, timestamp__lt=before)
+            .order_by('timestamp')
+            .values('id', 'timestamp', 'latitude', 'longitude', *SENSOR_FIELDS)
+        )
+        if not rows:
+            return 0
+
+        chunks = []
+        for start in range(0, len(rows), CHUNK_POINTS):
+            batch = rows[start:start + CHUNK_POINTS]
+            chunks.append(LocationTrackChunk(
+                alert=alert,
+                start_time=batch[0]['timestamp'],
+                end_time=batch[-1]['timestamp'],
+                point_count=len(batch),
+                data=pack(rows_to_track(batch)),
+            ))
+        LocationTrackChunk.objects.bulk_create(chunks)
+        LocationUpdate.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+# Downsampling
+
+def tolerance_for_zoom(zoom, latitude):
+    """Ground size of one web-map pixel (256px tiles) in meters at the given zoom"""
+    return 156543.03392 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def _project(track):
+    """Local equirectangular projection to meters, good enough at city scale"""
+    lat0 = math.radians(float(np.mean(track['lat'])))
+    x = track['lng'] * METERS_PER_DEGREE * math.cos(lat0)
+    y = track['lat'] * METERS_PER_DEGREE
+    return x, y
+
+
+def douglas_peucker(x, y, tolerance):
+    """Indices of the points kept by Douglas-Peucker simplification"""
+    count = len(x)
+    if count <= 2:
+        return np.arange(count)
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(dx * py - dy * px) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def time_buckets(t, seconds):
+    """Indices of the last point in each `seconds`-wide time bucket"""
+    if not len(t):
+        return np.arange(0)
+    buckets = np.floor((t - t[0]) / seconds).astype(np.int64)
+    last = np.flatnonzero(np.diff(buckets, append=buckets[-1] + 1))
+    return last
+
+
+def select(track, indices):
+    return {key: values[indices] for key, values in track.items()}
+
+
+def downsample(track, tolerance_m=None, bucket_seconds=None, max_points=DEFAULT_MAX_POINTS):
+    """
+    Reduce a track for display: optional time bucketing, then Douglas-Peucker
+    at tolerance_m, then an even stride if it is still above max_points. The
+    first and last points are always kept.
+    """
+    if len(track['t']) <= 2:
+        return track
+    if bucket_seconds and bucket_seconds > 0:
+        indices = time_buckets(track['t'], bucket_seconds)
+        if indices[0] != 0:
+            indices = np.concatenate([[0], indices])
+        track = select(track, indices)
+    if tolerance_m and len(track['t']) > 2:
+        x, y = _project(track)
+        track = select(track, douglas_peucker(x, y, tolerance_m))
+    count = len(track['t'])
+    if max_points and count > max_points:
+        indices = np.unique(np.round(np.linspace(0, count - 1, max(max_points, 2))).astype(np.int64))
+        track = select(track, indices)
+    return track
+
+
+def track_payload(track, total_points):
+    """Compact JSON form: a precision-6 polyline plus unix timestamps"""
+    return {
+        'polyline': polyline.encode(zip(track['lat'], track['lng']), 6),
+        'precision': 6,
+        'timestamps': [round(float(t), 3) for t in track['t']],
+        'total_points': total_points,
+        'returned_points': len(track['t']),
+    }
+
+
+def track_for_request(alert, params, max_points=DEFAULT_MAX_POINTS):
+    """
+    Load and downsample an alert's track from request query params:
+    zoom, tolerance_m, bucket_seconds, max_points.
+    """
+    track = load_track(alert)
+    total = len(track['t'])
+
+    def number(name, cast, default=None):
+        try:
+            return cast(params[name]) if name in params else default
+        except (TypeError, ValueError):
+            return default
+
+    tolerance_m = number('tolerance_m', float)
+    zoom = number('zoom', int)
+    if tolerance_m is None and zoom is not None and total:
+        tolerance_m = tolerance_for_zoom(zoom, float(np.mean(track['lat'])))
+    max_points = min(max(number('max_points', int, max_points), 2), 5000)
+
+    track = downsample(
+        track,
+        tolerance_m=tolerance_m,
+        bucket_seconds=number('bucket_seconds', float),
+        max_points=max_points,
+    )
+    return track_payload(track, total)
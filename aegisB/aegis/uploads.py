@@ -0,0 +1,182 @@
+"""
+Resumable chunked uploads for VideoEvidence and MediaCapture.
+
+    POST /uploads/                        start (target, size, filename, ...)
+    GET  /uploads/<upload_id>/            how many bytes have arrived
+    PUT  /uploads/<upload_id>/            one chunk, starting at the Upload-Offset header
+    POST /uploads/<upload_id>/finalize/   attach the file
+
+Each UploadSession has a part file in UPLOAD_TEMP_DIR. A chunk must start
+where the last accepted one ended. It is copied from the request stream in
+UPLOAD_READ_SIZE pieces, so a worker only holds one piece in memory. A client
+that loses its connection asks for the offset and sends the rest.
+
+The session row carries a running CRC-32 of the accepted bytes. Finalize can
+therefore check the whole file against the client's CRC-32 without reading it
+again. A chunk can also be checked on its own with an X-Chunk-SHA256 header.
+Finalize moves the part file into storage; on FileSystemStorage that is a
+rename.
+"""
+import hashlib
+import os
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from . import crypto
+from .models import MediaCapture, UploadSession
+
+UPLOAD_MAX_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 100 * 1024 * 1024)
+UPLOAD_CHUNK_MAX_SIZE = getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+UPLOAD_READ_SIZE = 64 * 1024
+# Unfinished uploads untouched for this long are deleted by purge_expired
+UPLOAD_SESSION_SECONDS = getattr(settings, 'UPLOAD_SESSION_SECONDS', 24 * 3600)
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class PartFile(File):
+    """A finished part file; storage backends that can move files will"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def temp_dir():
+    return getattr(settings, 'UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'upload_sessions'))
+
+
+def part_path(session):
+    return os.path.join(temp_dir(), f'{session.upload_id}.part')
+
+
+def start(user, target, filename, size, content_type='', **fields):
+    """New UploadSession; `fields` are evidence for video_evidence, alert, media_type and duration for media_capture"""
+    if size > UPLOAD_MAX_SIZE:
+        raise UploadError(f'File size cannot exceed {UPLOAD_MAX_SIZE // (1024 * 1024)}MB', status=413)
+    session = UploadSession.objects.create(
+        user=user, target=target, filename=os.path.basename(filename), total_size=size,
+        content_type=content_type, **fields
+    )
+    os.makedirs(temp_dir(), exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session, offset, stream, length, sha256=None):
+    """
+    Append `length` bytes read from `stream` at `offset`; returns the new
+    offset. Nothing is accepted unless the whole chunk arrives and matches.
+    """
+    if session.status != 'uploading':
+        raise UploadError('Upload already finalized', status=409)
+    if offset != session.received:
+        raise UploadError(f'Chunk must start at offset {session.received}', status=409)
+    if length <= 0:
+        raise UploadError('Empty chunk')
+    if length > UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError(f'Chunks cannot exceed {UPLOAD_CHUNK_MAX_SIZE} bytes', status=413)
+    if offset + length > session.total_size:
+        raise UploadError('Chunk runs past the end of the file')
+
+    crc = session.crc32
+    digest = hashlib.sha256()
+    remaining = length
+    try:
+        output = open(part_path(session), 'r+b')
+    except FileNotFoundError:
+        raise UploadError('Upload expired', status=410)
+    with output:
+        output.seek(offset)
+        while remaining:
+            piece = stream.read(min(UPLOAD_READ_SIZE, remaining))
+            if not piece:
+                raise UploadError('Incomplete chunk')
+            crc = zlib.crc32(piece, crc)
+            digest.update(piece)
+            output.write(piece)
+            remaining -= len(piece)
+
+    if sha256 and digest.hexdigest() != sha256.lower():
+        raise UploadError('Chunk checksum mismatch')
+
+    # Anything written past `received` by a broken or losing request is
+    # overwritten by the next accepted chunk
+    advanced = UploadSession.objects.filter(pk=session.pk, status='uploading', received=offset).update(
+        received=offset + length, crc32=crc, updated_at=timezone.now()
+    )
+    if not advanced:
+        session.refresh_from_db()
+        raise UploadError(f'Chunk must start at offset {session.received}', status=409)
+    session.received = offset + length
+    session.crc32 = crc
+    return session.received
+
+
+def finalize(session, crc32=None):
+    """Attach the finished file to its target; returns the VideoEvidence or new MediaCapture"""
+    if session.status != 'uploading':
+        raise UploadError('Upload already finalized', status=409)
+    if session.received != session.total_size:
+        raise UploadError(f'Upload incomplete: {session.received} of {session.total_size} bytes received')
+    if crc32 is not None and crc32 != session.crc32:
+        raise UploadError('File checksum mismatch')
+    if session.target == 'video_evidence' and session.evidence.video_file:
+        raise UploadError('Video file already uploaded for this evidence')
+
+    # Only one finalize request gets to move the file
+    if not UploadSession.objects.filter(pk=session.pk, status='uploading').update(status='complete'):
+        raise UploadError('Upload already finalized', status=409)
+    path = part_path(session)
+    try:
+        os.truncate(path, session.total_size)
+        with open(path, 'rb') as part:
+            upload = PartFile(part, name=session.filename)
+            if session.target == 'video_evidence':
+                target = session.evidence
+                target.video_file = upload
+                target.file_size = session.total_size
+                target.save()
+            else:
+                target = MediaCapture.objects.create(
+                    alert=session.alert,
+                    media_type=session.media_type,
+                    file=upload,
+                    file_size=session.total_size,
+                    duration=session.duration,
+                    mime_type=session.content_type,
+                    # The storage encrypts the file; see aegis/crypto.py
+                    is_encrypted=True,
+                    encryption_key=crypto.key_id()
+                )
+                session.media_capture = target
+    except Exception:
+        UploadSession.objects.filter(pk=session.pk).update(status='uploading')
+        raise
+
+    session.status = 'complete'
+    session.save(update_fields=['status', 'media_capture', 'updated_at'])
+    if os.path.exists(path):
+        os.remove(path)
+    return target
+
+
+def purge_expired(now=None):
+    """Delete unfinished uploads idle for UPLOAD_SESSION_SECONDS, and their part files"""
+    cutoff = (now or timezone.now()) - timedelta(seconds=UPLOAD_SESSION_SECONDS)
+    expired = UploadSession.objects.filter(status='uploading', updated_at__lt=cutoff)
+    count = 0
+    for session in expired.iterator():
+        path = part_path(session)
+        if os.path.exists(path):
+            os.remove(path)
+        session.delete()
+        count += 1
+    return count
@@ -81,10 +81,15 @@ urlpatterns = [
     path('emergency/activate/', views.activate_emergency, name='activate-emergency'),
     path('emergency/deactivate/', views.deactivate_emergency, name='deactivate-emergency'),
     path('emergency/update-location/', views.update_location, name='update-location'),
+    path('emergency/update-location/batch/', views.update_location_batch, name='update-location-batch'),
     path('emergency/upload-media/', views.upload_media, name='upload-media'),
+    path('uploads/', views.start_upload, name='start-upload'),
+    path('uploads/<uuid:upload_id>/', views.upload_chunk, name='upload-chunk'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_upload, name='finalize-upload'),
     path('emergency/get-media/', views.get_media, name='get-media'),
     path('emergency/history/', views.get_emergency_history, name='emergency-history'),
     path('emergency/statistics/', views.emergency_statistics, name='emergency-statistics'),
+    path('emergency/response-times/', views.response_time_analytics, name='response-time-analytics'),
     path('emergency/assign-responder/', views.assign_responder, name='responder-assign'),
 
     path('emergency/<str:alert_id>/', views.get_emergency_details, name='emergency-details'),
@@ -120,6 +125,8 @@ urlpatterns = [
     path('safe-locations/', views.get_safe_locations, name='safe-locations'),
     path('safe-locations/create/', views.create_safe_location, name='create-safe-location'),
     path('find-safe-route/', views.find_safe_route, name='find-safe-route'),
+    path('risk/tiles/<int:z>/<int:x>/<int:y>.png', views.RiskTileView.as_view(), name='risk-tile'),
+    path('media/<slug:kind>/<int:pk>/', views.MediaStreamView.as_view(), name='stream-media'),
     path('start-navigation/', views.start_navigation, name='start-navigation'),
     path('route-geojson/', views.get_route_geojson, name='route-geojson'),
     path('reverse-geocode/', views.reverse_geocode, name='reverse-geocode'),
@@ -3,26 +3,27 @@ from rest_framework.decorators import api_view, permission_classes, parser_class
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.utils import timezone
-from aegisB.settings import OPENROUTE_API_KEY
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db import transaction
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Sum, Max, Min
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from datetime import timedelta
 import json
 import logging
 import math
-import requests
 
 
 
 
 
 from .models import (
+    AlertEvent,
     DeactivationAttempt,
     EmergencyAlert,
     EmergencyContact,
@@ -40,6 +41,7 @@ from .models import (
     SafeRoute,
     SafetyCheckIn,
     SafetyCheckSettings,
+    UploadSession,
     UserProgress,
     UserQuizAttempt,
     QuizQuestion,
@@ -62,6 +64,7 @@ from .serializers import (
     EmergencyReportEvidenceSerializer,
     EmergencyResponseSerializer,
     IncidentUpdateSerializer,
+    LocationBatchSerializer,
     LocationUpdateRequestSerializer,
     LocationUpdateSerializer,
     ManualCheckInSerializer,
@@ -72,6 +75,7 @@ from .serializers import (
     SafetyCheckSettingsSerializer,
     SafetyStatisticsSerializer,
     TestAlertSerializer,
+    UploadStartSerializer,
     UserWithContactsSerializer,
     PhoneLookupSerializer,
     UserLookupSerializer,
@@ -92,6 +96,14 @@ from .serializers import (
     VideoEvidenceUpdateSerializer,
     VideoUploadSerializer,
 )
+from .distance import coordinates, eta_minutes, haversine_km
+from .geo import nearest_responders, nearest_responders_anywhere
+from . import (
+    analytics, crypto, events, gazetteer, local_routing, location_ingest, messaging, notifications, openroute,
+    risk, rollups, route_store, streaming, tasks, tracks, uploads
+)
+from .stats import StatsQuery
+from .pagination import LinkHeaderCursorPagination, LinkHeaderPageNumberPagination, envelope, paginate, paginate_list
 
 User = get_user_model()
 
@@ -223,10 +235,7 @@ def emergency_contact_detail(request, pk):
 def test_emergency_alert(request, pk):
     try:
         contact = EmergencyContact.objects.get(pk=pk, user=request.user)
-        # Here you would integrate with your alert service (Twilio, etc.)
-        # For now, just return a success message
-        print('test successful')
-        print(contact.phone, contact.email)
+        messaging.send_to_contact(contact, 'alert_test', request.user)
         filters = Q()
         if contact.email:
             filters |= Q(email=contact.email)
@@ -236,7 +245,7 @@ def test_emergency_alert(request, pk):
 
         if send_to is None:
             return Response({
-                'message': f'Test alert sent to {contact.name} is not available in aegis, Thank You',
+                'message': f'Test alert sent to {contact.name} by SMS, they are not available in aegis, Thank You',
             })
         else:
             EmergencyNotification.objects.create(
@@ -293,6 +302,8 @@ def resource_categories(request):
 class LearningResourceListView(ListAPIView):
     serializer_class = LearningResourceSerializer
     permission_classes = [AllowAny]
+    # Most resources share the default rank of 0, which a cursor can't page through
+    pagination_class = LinkHeaderPageNumberPagination
 
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.user_type == 'controller' :
@@ -322,7 +333,7 @@ class LearningResourceListView(ListAPIView):
         
         return queryset.select_related('category').prefetch_related(
             'external_links', 'quiz_questions__options'
-        ).order_by('order', 'created_at')
+        ).order_by('order', 'created_at', 'id')
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -785,9 +796,10 @@ def submit_incident_report(request):
 class IncidentReportListView(ListAPIView):
     serializer_class = IncidentReportSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LinkHeaderCursorPagination
 
     def get_queryset(self):
-        return IncidentReport.objects.all().prefetch_related('media', 'updates').order_by('-created_at')
+        return IncidentReport.objects.all().prefetch_related('media', 'updates')
 
 class IncidentReportDetailView(RetrieveAPIView):
     serializer_class = IncidentReportSerializer
@@ -822,29 +834,25 @@ def upload_incident_media(request, incident_id):
 @permission_classes([IsAuthenticated])
 def incident_statistics(request):
 
-    total_reports = IncidentReport.objects.all().count()
-    
-    status_counts = {
-        'submitted': IncidentReport.objects.filter(status='submitted').count(),
-        'under_review': IncidentReport.objects.filter(status='under_review').count(),
-        'resolved': IncidentReport.objects.filter(status='resolved').count(),
-        'dismissed': IncidentReport.objects.filter(status='dismissed').count(),
-    }
-    
-    type_counts = {
-        incident_type: IncidentReport.objects.filter(
-            incident_type=incident_type
-        ).count()
-        for incident_type, _ in IncidentReport.INCIDENT_TYPES
-    }
+    if rollups.requested(request):
+        stats_query = rollups.stats_query('incident_report')
+    else:
+        stats_query = StatsQuery(IncidentReport.objects.all()).max('last_submission', 'created_at')
+    
+    stats = (
+        stats_query
+        .count('total_reports')
+        .count_choices('status_counts', 'status', IncidentReport.STATUS_CHOICES)
+        .count_choices('type_counts', 'incident_type', IncidentReport.INCIDENT_TYPES)
+        .run()
+    )
+    if 'last_submission' not in stats:
+        # Rollups only know the day; the created_at index answers this directly
+        stats['last_submission'] = IncidentReport.objects.order_by('-created_at').values_list(
+            'created_at', flat=True
+        ).first()
     
-    return Response({
-        'total_reports': total_reports,
-        'status_counts': status_counts,
-        'type_counts': type_counts,
-        'last_submission': IncidentReport.objects.filter(
-        ).order_by('-created_at').first().created_at if total_reports > 0 else None
-    })
+    return Response(stats)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -927,6 +935,7 @@ def manual_check_in(request):
                 'message': f'You don\'t have any emergecy conact to notify, Please add one to be safe Thank You',
             })
     else: 
+        messaging.send_to_contact(contact, 'safety_check', request.user)
         filters = Q()
         if contact.email:
             filters |= Q(email=contact.email)
@@ -936,7 +945,7 @@ def manual_check_in(request):
 
         if send_to is None:
             return Response({
-                'message': f'Test alert sent to {contact.name} is not available in aegis, Thank You',
+                'message': f'Check-in sent to {contact.name} by SMS, they are not available in aegis, Thank You',
             })
         else:
             EmergencyNotification.objects.create(
@@ -990,49 +999,25 @@ def safety_statistics(request):
     # Calculate statistics for the last 30 days
     thirty_days_ago = timezone.now() - timedelta(days=30)
 
-    total_check_ins = SafetyCheckIn.objects.filter(
-        user=request.user,
-        created_at__gte=thirty_days_ago
-    ).count()
-
-    successful_check_ins = SafetyCheckIn.objects.filter(
-        user=request.user,
-        status='safe',
-        created_at__gte=thirty_days_ago
-    ).count()
-
-    missed_check_ins = SafetyCheckIn.objects.filter(
-        user=request.user,
-        status='missed',
-        created_at__gte=thirty_days_ago
-    ).count()
+    recent = Q(created_at__gte=thirty_days_ago)
+    statistics = (
+        StatsQuery(SafetyCheckIn.objects.filter(user=request.user))
+        .count('total_check_ins', recent)
+        .count('successful_check_ins', recent, status='safe')
+        .count('missed_check_ins', recent, status='missed')
+        .max('last_check_in', 'responded_at', status='safe')
+        .min('next_check_in', 'scheduled_at', status='pending')
+        .run()
+    )
 
-    emergency_alerts = EmergencyAlert.objects.filter(
+    statistics['emergency_alerts'] = EmergencyAlert.objects.filter(
         user=request.user,
         activated_at__gte=thirty_days_ago
     ).count()
 
-    response_rate = (successful_check_ins / total_check_ins * 100) if total_check_ins > 0 else 100
-
-    last_check_in = SafetyCheckIn.objects.filter(
-        user=request.user,
-        status='safe'
-    ).order_by('-responded_at').first()
-
-    next_check_in = SafetyCheckIn.objects.filter(
-        user=request.user,
-        status='pending'
-    ).order_by('scheduled_at').first()
-
-    statistics = {
-        'total_check_ins': total_check_ins,
-        'successful_check_ins': successful_check_ins,
-        'missed_check_ins': missed_check_ins,
-        'emergency_alerts': emergency_alerts,
-        'response_rate': round(response_rate, 1),
-        'last_check_in': last_check_in.responded_at if last_check_in else None,
-        'next_check_in': next_check_in.scheduled_at if next_check_in else None
-    }
+    total_check_ins = statistics['total_check_ins']
+    response_rate = (statistics['successful_check_ins'] / total_check_ins * 100) if total_check_ins > 0 else 100
+    statistics['response_rate'] = round(response_rate, 1)
 
     serializer = SafetyStatisticsSerializer(statistics)
     return Response(serializer.data)
@@ -1047,7 +1032,7 @@ def check_in_history(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def alert_history(request):
-    alerts = EmergencyAlert.objects.filter(user=request.user).order_by('-created_at')[:20]
+    alerts = EmergencyAlert.objects.with_list_data().filter(user=request.user).order_by('-activated_at')[:20]
     serializer = EmergencyAlertSerializer(alerts, many=True)
     return Response(serializer.data)
 
@@ -1063,9 +1048,12 @@ def submit_video_evidence(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     try:
+        data = serializer.validated_data
+        if not data.get('location_address'):
+            data['location_address'] = gazetteer.describe(data.get('location_lat'), data.get('location_lng')) or ''
         evidence = VideoEvidence.objects.create(
             user=request.user,
-            **serializer.validated_data
+            **data
         )
         
         full_serializer = VideoEvidenceSerializer(evidence, context={'request': request})
@@ -1130,9 +1118,9 @@ def upload_video_file(request, evidence_id):
 def list_video_evidence(request):
     
     if request.user.user_type == 'controller':
-        evidence = VideoEvidence.objects.all().order_by('-recorded_at')
+        evidence = VideoEvidence.objects.all()
     else:
-        evidence = VideoEvidence.objects.filter(user=request.user).order_by('-recorded_at')
+        evidence = VideoEvidence.objects.filter(user=request.user)
     
     # Filtering options
     status_filter = request.query_params.get('status')
@@ -1155,8 +1143,7 @@ def list_video_evidence(request):
     if date_to:
         evidence = evidence.filter(recorded_at__date__lte=date_to)
     
-    serializer = VideoEvidenceSerializer(evidence, many=True, context={'request': request})
-    return Response(serializer.data)
+    return paginate_list(request, evidence, '-recorded_at', VideoEvidenceSerializer, context={'request': request})
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1164,11 +1151,11 @@ def get_video_evidence(request, evidence_id):
     
     try:
         evidence = VideoEvidence.objects.get(id=evidence_id)
-        # if not evidence.user_can_access(request.user):
-        #     return Response(
-        #         {'error': 'Access denied'},
-        #         status=status.HTTP_403_FORBIDDEN
-        #     )
+        if not evidence.user_can_access(request.user):
+            return Response(
+                {'error': 'Access denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         serializer = VideoEvidenceSerializer(evidence, context={'request': request})
         return Response(serializer.data)
     except VideoEvidence.DoesNotExist:
@@ -1277,31 +1264,29 @@ def delete_video_evidence(request, evidence_id):
 @permission_classes([IsAuthenticated])
 def video_evidence_statistics(request):
 
-    if request.user.user_type == 'controller':
-        user_evidence = VideoEvidence.objects.all()
+    scope = {} if request.user.user_type == 'controller' else {'user': request.user}
+    if rollups.requested(request):
+        stats_query = rollups.stats_query('video_evidence', **scope)
     else:
-        user_evidence = VideoEvidence.objects.filter(user=request.user)
-    
-    total_videos = user_evidence.count()
-    total_duration = sum(evidence.duration_seconds for evidence in user_evidence)
-    total_file_size = sum(evidence.file_size for evidence in user_evidence)
-    anonymous_count = user_evidence.filter(is_anonymous=True).count()
-    
-    # Status statistics
-    status_stats = {
-        status: user_evidence.filter(status=status).count()
-        for status, _ in VideoEvidence.STATUS_CHOICES
-    }
-    
-    # Type statistics
-    type_stats = {
-        evidence_type: user_evidence.filter(type=evidence_type).count()
-        for evidence_type, _ in VideoEvidence.EVIDENCE_TYPE
-    }
+        stats_query = StatsQuery(VideoEvidence.objects.filter(**scope))
     
     # Recent activity (last 7 days)
     week_ago = timezone.now() - timezone.timedelta(days=7)
-    recent_count = user_evidence.filter(created_at__gte=week_ago).count()
+    
+    stats = (
+        stats_query
+        .count('total_videos')
+        .sum('total_duration', 'duration_seconds')
+        .sum('total_file_size', 'file_size')
+        .count('anonymous_count', is_anonymous=True)
+        .count('recent_count', created_at__gte=week_ago)
+        .count_choices('status_statistics', 'status', VideoEvidence.STATUS_CHOICES)
+        .count_choices('type_statistics', 'type', VideoEvidence.EVIDENCE_TYPE)
+        .run()
+    )
+    total_videos = stats['total_videos']
+    total_duration = stats['total_duration']
+    total_file_size = stats['total_file_size']
     
     return Response({
         'total_videos': total_videos,
@@ -1309,11 +1294,11 @@ def video_evidence_statistics(request):
         'total_duration_display': f"{total_duration // 3600}h {(total_duration % 3600) // 60}m",
         'total_file_size': total_file_size,
         'total_file_size_display': f"{total_file_size / (1024 * 1024 * 1024):.2f} GB",
-        'anonymous_count': anonymous_count,
-        'recent_count': recent_count,
+        'anonymous_count': stats['anonymous_count'],
+        'recent_count': stats['recent_count'],
         'average_duration_seconds': total_duration / total_videos if total_videos > 0 else 0,
-        'status_statistics': status_stats,
-        'type_statistics': type_stats,
+        'status_statistics': stats['status_statistics'],
+        'type_statistics': stats['type_statistics'],
     })
 
 
@@ -1340,7 +1325,9 @@ def activate_emergency(request):
                     activation_method=serializer.validated_data['activation_method'],
                     initial_latitude=serializer.validated_data.get('latitude'),
                     initial_longitude=serializer.validated_data.get('longitude'),
-                    initial_address=serializer.validated_data.get('address', ''),
+                    initial_address=serializer.validated_data.get('address') or gazetteer.describe(
+                        serializer.validated_data.get('latitude'), serializer.validated_data.get('longitude')
+                    ) or '',
                     is_silent=serializer.validated_data['is_silent'],
                     emergency_type=serializer.validated_data.get('emergency_type', 'general'),
                     description=serializer.validated_data.get('description', '')
@@ -1356,25 +1343,10 @@ def activate_emergency(request):
                         speed=serializer.validated_data.get('speed')
                     )
                 
-                # Find and assign nearby responders
-                assigned_responders = assign_nearby_responders(alert)
-                
-                # Notify emergency contacts
-                notified_contacts = notify_emergency_contacts(alert)
-                
-                # Create notification for user
-                EmergencyNotification.objects.create(
-                    user=request.user,
-                    alert=alert,
-                    notification_type='alert_activated',
-                    title='Emergency Alert Activated',
-                    message=f'Emergency alert {alert.alert_id} has been activated. {len(assigned_responders)} responders notified.',
-                    data={
-                        'responders_count': len(assigned_responders),
-                        'contacts_notified': notified_contacts,
-                        'alert_id': alert.alert_id
-                    }
-                )
+                # Responder assignment and contact messages run as background
+                # jobs once the alert is committed, so the SOS returns at once
+                tasks.enqueue(dispatch_alert, alert.id, idempotency_key=f'dispatch:{alert.alert_id}')
+                tasks.enqueue(notify_emergency_contacts, alert.id, idempotency_key=f'contacts:{alert.alert_id}')
                 
                 logger.info(f"Emergency activated: {alert.alert_id} by user {request.user.email}")
 
@@ -1382,8 +1354,9 @@ def activate_emergency(request):
                 'success': True,
                 'alert_id': alert.alert_id,
                 'message': 'Emergency activated successfully',
-                'responders_assigned': len(assigned_responders),
-                'contacts_notified': notified_contacts,
+                # Assigned so far; dispatch may still be running
+                'responders_assigned': alert.responses.count(),
+                'contacts_notified': emergency_contacts(alert.user).count(),
                 'fake_screen_active': alert.fake_screen_active,
                 'activated_at': alert.activated_at.isoformat()
             }, status=status.HTTP_201_CREATED)
@@ -1454,6 +1427,12 @@ def deactivate_emergency(request):
                 
                 # Notify responders about cancellation
                 notify_responders_cancellation(alert)
+                events.publish(
+                    events.ALERT_CANCELLED,
+                    alert,
+                    {'status': alert.status, 'cancelled_at': alert.cancelled_at.isoformat()},
+                    user_ids=alert.responses.values_list('responder_id', flat=True),
+                )
                 
                 # Create notification
                 EmergencyNotification.objects.create(
@@ -1538,25 +1517,82 @@ def update_location(request):
                     'error': 'Cannot update location for inactive emergency'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            location_update = LocationUpdate.objects.create(
-                alert=alert,
-                latitude=serializer.validated_data['latitude'],
-                longitude=serializer.validated_data['longitude'],
-                accuracy=serializer.validated_data.get('accuracy'),
-                speed=serializer.validated_data.get('speed'),
-                altitude=serializer.validated_data.get('altitude'),
-                heading=serializer.validated_data.get('heading')
-            )
+            # Keep the latest sample hot; a LocationUpdate row (and its sync event)
+            # is only written once the victim has moved or enough time has passed
+            sample, location_update = location_ingest.ingest(alert, serializer.validated_data)
             
-            # Notify responders about location update
-            notify_responders_location_update(alert, location_update)
+            # Push every sample to connected responders instead of notification rows
+            events.publish(events.LOCATION_UPDATED, alert, sample)
             
             logger.info(f"Location updated for alert {alert.alert_id}")
             
             return Response({
                 'success': True,
                 'message': 'Location updated successfully',
-                'timestamp': location_update.timestamp.isoformat()
+                'timestamp': sample['timestamp'],
+                'persisted': location_update is not None
+            })
+            
+        except EmergencyAlert.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Emergency alert not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'success': False,
+        'errors': serializer.errors
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser])
+def update_location_batch(request):
+    """
+    Upload a track buffered while offline, in one request
+    POST /api/aegis/emergency/update-location/batch/
+    {
+        "alert_id": "EMG-ABC12345",
+        "points": [
+            {"latitude": 23.8105, "longitude": 90.4127, "timestamp": "2025-10-17T12:00:00Z", "accuracy": 15.5},
+            ...
+        ]
+    }
+    or, more compactly:
+    {
+        "alert_id": "EMG-ABC12345",
+        "polyline": "_p~iF~ps|U_ulLnnqC",
+        "precision": 5,
+        "timestamps": ["2025-10-17T12:00:00Z", "2025-10-17T12:00:01Z"]
+    }
+    Points already stored for the same timestamp are skipped, so retries are safe.
+    """
+    serializer = LocationBatchSerializer(data=request.data)
+    if serializer.is_valid():
+        try:
+            alert = get_object_or_404(EmergencyAlert, alert_id=serializer.validated_data['alert_id'], user=request.user)
+            
+            # Check if alert is active
+            if alert.status != 'active':
+                return Response({
+                    'success': False,
+                    'error': 'Cannot update location for inactive emergency'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            points = serializer.validated_data['points']
+            created, latest = location_ingest.ingest_batch(alert, points)
+            if latest:
+                events.publish(events.LOCATION_UPDATED, alert, latest)
+            
+            logger.info(f"Stored {len(created)} of {len(points)} buffered locations for alert {alert.alert_id}")
+            
+            return Response({
+                'success': True,
+                'message': 'Locations uploaded successfully',
+                'received': len(points),
+                'created': len(created),
+                'skipped': len(points) - len(created)
             })
             
         except EmergencyAlert.DoesNotExist:
@@ -1612,29 +1648,12 @@ def upload_media(request):
                 file_size=media_file.size,
                 duration=serializer.validated_data.get('duration'),
                 mime_type=media_file.content_type,
-                # In production, you would encrypt the file and store the key
+                # The storage encrypts the file; see aegis/crypto.py
                 is_encrypted=True,
-                encryption_key="encrypted_key_placeholder"  
-            )
-            
-            # Notify responders about new media
-            notify_responders_media_upload(alert, media_capture)
-            
-            # Create notification
-            EmergencyNotification.objects.create(
-                user=request.user,
-                alert=alert,
-                notification_type='media_uploaded',
-                title='Media Captured',
-                message=f'New {media_capture.media_type} captured and uploaded.',
-                data={
-                    'media_type': media_capture.media_type,
-                    'file_size': media_capture.file_size,
-                    'captured_at': media_capture.captured_at.isoformat()
-                }
+                encryption_key=crypto.key_id()
             )
             
-            logger.info(f"Media uploaded for alert {alert.alert_id}: {media_capture.media_type}")
+            announce_media_upload(request.user, alert, media_capture)
             
             return Response({
                 'success': True,
@@ -1656,16 +1675,181 @@ def upload_media(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 
 
+
+def upload_status(session):
+    return {
+        'upload_id': str(session.upload_id),
+        'target': session.target,
+        'offset': session.received,
+        'size': session.total_size,
+        'status': session.status,
+        'chunk_size': uploads.UPLOAD_CHUNK_MAX_SIZE,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_upload(request):
+    """
+    Start a resumable upload
+    POST /api/aegis/uploads/
+    {"target": "video_evidence", "evidence_id": 12, "filename": "clip.mp4", "size": 52428800, "content_type": "video/mp4"}
+    {"target": "media_capture", "alert_id": "EMG-ABC12345", "media_type": "audio", "filename": "a.m4a", "size": 1048576}
+    """
+    serializer = UploadStartSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    fields = {}
+    if data['target'] == 'video_evidence':
+        try:
+            fields['evidence'] = VideoEvidence.objects.get(id=data['evidence_id'], user=request.user)
+        except VideoEvidence.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Video evidence record not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        if fields['evidence'].video_file:
+            return Response({
+                'success': False,
+                'error': 'Video file already uploaded for this evidence'
+            }, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        try:
+            alert = EmergencyAlert.objects.get(alert_id=data['alert_id'], user=request.user)
+        except EmergencyAlert.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': 'Emergency alert not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        if alert.status != 'active':
+            return Response({
+                'success': False,
+                'error': 'Cannot upload media for inactive emergency'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        fields.update(alert=alert, media_type=data['media_type'], duration=data.get('duration'))
+
+    try:
+        session = uploads.start(
+            request.user, data['target'], data['filename'], data['size'], data['content_type'], **fields
+        )
+    except uploads.UploadError as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=e.status)
+
+    logger.info(f"Upload {session.upload_id} started: {session.total_size} bytes for {session.target}")
+    return Response({
+        'success': True,
+        'data': upload_status(session)
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def upload_chunk(request, upload_id):
+    """
+    GET /api/aegis/uploads/<upload_id>/ - bytes received so far, to resume from
+    PUT /api/aegis/uploads/<upload_id>/ - raw chunk bytes as the body, with
+        Upload-Offset: <where the chunk starts> and optionally
+        X-Chunk-SHA256: <hex digest of the chunk>
+    """
+    try:
+        session = UploadSession.objects.get(upload_id=upload_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'PUT':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Upload-Offset header is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        try:
+            # Read straight from the request stream, never request.data
+            uploads.write_chunk(session, offset, request.stream, length, request.headers.get('X-Chunk-SHA256'))
+        except uploads.UploadError as e:
+            return Response({
+                'success': False,
+                'error': str(e),
+                'data': upload_status(session)
+            }, status=e.status)
+
+    return Response({
+        'success': True,
+        'data': upload_status(session)
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_upload(request, upload_id):
+    """
+    Attach a fully uploaded file to its evidence record or alert
+    POST /api/aegis/uploads/<upload_id>/finalize/
+    {"crc32": 2768625435}  (optional, CRC-32 of the whole file)
+    """
+    try:
+        session = UploadSession.objects.select_related('evidence', 'alert').get(upload_id=upload_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Upload not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    crc32 = request.data.get('crc32')
+    if crc32 is not None:
+        try:
+            crc32 = int(crc32)
+        except (TypeError, ValueError):
+            return Response({
+                'success': False,
+                'error': 'crc32 must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        target = uploads.finalize(session, crc32)
+    except uploads.UploadError as e:
+        return Response({
+            'success': False,
+            'error': str(e),
+            'data': upload_status(session)
+        }, status=e.status)
+
+    logger.info(f"Upload {session.upload_id} finalized: {session.total_size} bytes for {session.target}")
+    data = upload_status(session)
+    if session.target == 'video_evidence':
+        data['evidence'] = VideoEvidenceSerializer(target, context={'request': request}).data
+    else:
+        announce_media_upload(request.user, session.alert, target)
+        data.update(media_id=target.id, media_type=target.media_type, file_size=target.file_size)
+    return Response({
+        'success': True,
+        'data': data
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_emergency_details(request, alert_id):
     """
     Get detailed emergency information
-    GET /api/aegis/emergency/EMG-ABC12345/
+    GET /api/aegis/emergency/EMG-ABC12345/?zoom=15
+    The `track` is downsampled; see get_emergency_map_data for its parameters.
     """
     try:
         alert = get_object_or_404(EmergencyAlert, alert_id=alert_id)
-        serializer = EmergencyAlertDetailSerializer(alert)
+        serializer = EmergencyAlertDetailSerializer(alert, context={'request': request})
         return Response({
             'success': True,
             'data': serializer.data
@@ -1681,12 +1865,12 @@ def get_emergency_details(request, alert_id):
 @permission_classes([IsAuthenticated])
 def get_active_emergencies(request):
 
-    alerts = EmergencyAlert.objects.filter(status='active').order_by('-activated_at')
+    alerts = EmergencyAlert.objects.with_list_data().filter(status='active').order_by('-activated_at')
     serializer = EmergencyAlertSerializer(alerts, many=True)
     
     return Response({
         'success': True,
-        'count': alerts.count(),
+        'count': len(serializer.data),
         'data': serializer.data
     })
 
@@ -1698,12 +1882,12 @@ def get_emergency_history(request):
     Get user's emergency history
     GET /api/aegis/emergency/history/
     """
-    alerts = EmergencyAlert.objects.filter(user=request.user).exclude(status='active').order_by('-activated_at')
+    alerts = EmergencyAlert.objects.with_list_data().filter(user=request.user).exclude(status='active').order_by('-activated_at')
     serializer = EmergencyAlertSerializer(alerts, many=True)
     
     return Response({
         'success': True,
-        'count': alerts.count(),
+        'count': len(serializer.data),
         'data': serializer.data
     })
 
@@ -1818,6 +2002,20 @@ def update_response_status(request):
             }
         )
         
+        events.publish(
+            events.RESPONSE_STATUS_CHANGED,
+            response.alert,
+            {
+                'response_id': response.id,
+                'responder_id': request.user.id,
+                'responder_name': request.user.full_name,
+                'status': new_status,
+                'eta_minutes': response.eta_minutes,
+                'updated_at': now.isoformat(),
+            },
+            user_ids=[response.alert.user_id],
+        )
+        
         # If response is completed, check if all responses are completed
         if new_status == 'completed':
             check_emergency_completion(response.alert)
@@ -1845,23 +2043,30 @@ def assign_nearby_responders(alert):
     """
     if not alert.initial_latitude or not alert.initial_longitude:
         # If no location, assign any available responders
-        available_responders = User.objects.filter(
-            user_type='agent',
-            status='available'
-        )[:3]
+        available_responders = [
+            (responder, None)
+            for responder in User.objects.filter(user_type='agent', status='available')[:3]
+        ]
     else:
-        # Find available responders (simplified - in production use geospatial queries)
-        available_responders = User.objects.filter(
-            user_type='agent',
-            status='available',
-            latitude__isnull=False,
-            longitude__isnull=False
-        )[:3]
+        available_responders = nearest_responders(alert.initial_latitude, alert.initial_longitude, 3)
+        if len(available_responders) < 3:
+            # Nobody close enough: an SOS still goes to the nearest agents, however far away
+            available_responders += nearest_responders_anywhere(
+                alert.initial_latitude, alert.initial_longitude, 3 - len(available_responders),
+                exclude_ids=[responder.id for responder, _ in available_responders]
+            )
+    
+    etas = eta_minutes(
+        [distance or 0 for _, distance in available_responders],
+        [responder.responder_type for responder, _ in available_responders],
+    )
     
     assigned = []
-    for i, responder in enumerate(available_responders):
-        # Calculate ETA based on distance (simplified)
-        eta = calculate_eta(alert, responder, i)
+    for i, (responder, distance) in enumerate(available_responders):
+        if distance is not None:
+            eta = int(etas[i])
+        else:
+            eta = calculate_eta(alert, responder, i)
         
         try:
             response = EmergencyResponse.objects.create(
@@ -1879,7 +2084,7 @@ def assign_nearby_responders(alert):
                 alert=alert,
                 notification_type='responder_assigned',
                 title='New Emergency Assignment',
-                message=f'You have been assigned to emergency {alert.alert_id}. Estimated arrival: {eta} minutes',
+                message=f'You have been assigned to emergency {alert.alert_id}.' + arrival_sentence(eta, 'Estimated arrival'),
                 data={
                     'alert_id': alert.alert_id,
                     'eta_minutes': eta,
@@ -1897,113 +2102,92 @@ def assign_nearby_responders(alert):
     return assigned
 
 
-def notify_emergency_contacts(alert):
-    
-    contacts = EmergencyContact.objects.filter(
-        user=alert.user, 
-        is_emergency_contact=True
-    )
-    
-    notified_count = 0
-    for contact in contacts:
-        try:
-            # In production, implement actual SMS/email sending
-            send_emergency_notification(contact, alert)
-            notified_count += 1
-            
-            logger.info(f"Notified emergency contact: {contact.name} ({contact.phone})")
-            
-        except Exception as e:
-            logger.error(f"Failed to notify {contact.name}: {str(e)}")
-    
-    return notified_count
-
-
-def send_emergency_notification(contact, alert):
-    # SMS message template
-    message = f"""
-🚨 EMERGENCY ALERT 🚨
-
-{alert.user.full_name} has activated an emergency alert.
-
-Alert ID: {alert.alert_id}
-Time: {alert.activated_at.strftime('%Y-%m-%d %H:%M:%S')}
-Location: {alert.initial_address or 'Location being tracked'}
-Emergency Type: {alert.emergency_type.title()}
-
-Please check the Aegis app for real-time updates.
-
-Stay safe,
-Aegis Emergency Response System
+@tasks.task(max_attempts=3)
+def dispatch_alert(alert_id):
     """
+    Background job queued by activate_emergency: assign nearby responders and
+    tell the user how many are on the way
+    """
+    alert = EmergencyAlert.objects.select_related('user').get(id=alert_id)
+    if alert.status != 'active' or alert.responses.exists():
+        return
     
-    # TODO: Integrate with SMS service (Twilio, etc.)
-    # TODO: Integrate with email service if contact has email
-    print(f"SENDING SMS to {contact.phone}: {message}")
-    
-    return True
-
-
-def notify_responders_cancellation(alert):
-
-    for response in alert.responses.all():
-        response.status = 'cancelled'
-        response.completed_at = timezone.now()
-        response.save()
-        
-        # Update responder status back to available
-        responder = response.responder
-        responder.status = 'available'
-        responder.save()
+    with transaction.atomic():
+        assigned_responders = assign_nearby_responders(alert)
         
         EmergencyNotification.objects.create(
-            user=response.responder,
+            user=alert.user,
             alert=alert,
-            notification_type='alert_resolved',
-            title='Emergency Cancelled',
-            message=f'Emergency {alert.alert_id} has been cancelled by the user.',
+            notification_type='alert_activated',
+            title='Emergency Alert Activated',
+            message=f'Emergency alert {alert.alert_id} has been activated. {len(assigned_responders)} responders notified.',
             data={
-                'cancelled_at': alert.cancelled_at.isoformat(),
+                'responders_count': len(assigned_responders),
+                'contacts_notified': emergency_contacts(alert.user).count(),
                 'alert_id': alert.alert_id
             }
         )
 
 
-def notify_responders_location_update(alert, location_update):
+def emergency_contacts(user):
+    return EmergencyContact.objects.filter(user=user, is_emergency_contact=True)
 
-    for response in alert.responses.all():
-        EmergencyNotification.objects.create(
-            user=response.responder,
+
+@tasks.task(max_attempts=3)
+def notify_emergency_contacts(alert_id):
+    """
+    Background job: message every emergency contact with one rendering of the
+    alert template; a retry only resends the messages that failed
+    """
+    alert = EmergencyAlert.objects.select_related('user').get(id=alert_id)
+    if not alert.outbound_messages.filter(template='emergency_alert').exists():
+        messaging.queue(
+            'emergency_alert',
+            messaging.contact_recipients(emergency_contacts(alert.user)),
+            messaging.alert_context(alert),
             alert=alert,
-            notification_type='location_update',
-            title='Location Updated',
-            message=f'Updated location received for emergency {alert.alert_id}',
-            data={
-                'alert_id': alert.alert_id,
-                'latitude': float(location_update.latitude),
-                'longitude': float(location_update.longitude),
-                'timestamp': location_update.timestamp.isoformat(),
-                'accuracy': location_update.accuracy
-            }
+            sender=alert.user
         )
+    
+    failed = messaging.deliver_pending(alert=alert, template='emergency_alert')
+    if failed:
+        raise RuntimeError(f"{failed} emergency contact messages failed for {alert.alert_id}")
 
 
-def notify_responders_media_upload(alert, media_capture):
+def notify_responders_cancellation(alert):
+    notifications.cancel_responses(alert)
 
-    for response in alert.responses.all():
-        EmergencyNotification.objects.create(
-            user=response.responder,
-            alert=alert,
-            notification_type='media_uploaded',
-            title='New Media Uploaded',
-            message=f'New {media_capture.media_type} uploaded for emergency {alert.alert_id}',
-            data={
-                'media_type': media_capture.media_type,
-                'media_id': media_capture.id,
-                'file_size': media_capture.file_size,
-                'captured_at': media_capture.captured_at.isoformat()
-            }
-        )
+
+def notify_responders_media_upload(alert, media_capture):
+    notifications.notify_responders(alert, notifications.media_uploaded(alert, media_capture))
+
+
+def announce_media_upload(user, alert, media_capture):
+    """Tell responders, live subscribers and the user about newly stored media"""
+    # Notify responders about new media
+    notify_responders_media_upload(alert, media_capture)
+    events.publish(events.MEDIA_UPLOADED, alert, {
+        'media_id': media_capture.id,
+        'media_type': media_capture.media_type,
+        'file_size': media_capture.file_size,
+        'captured_at': media_capture.captured_at.isoformat(),
+    })
+    
+    # Create notification
+    EmergencyNotification.objects.create(
+        user=user,
+        alert=alert,
+        notification_type='media_uploaded',
+        title='Media Captured',
+        message=f'New {media_capture.media_type} captured and uploaded.',
+        data={
+            'media_type': media_capture.media_type,
+            'file_size': media_capture.file_size,
+            'captured_at': media_capture.captured_at.isoformat()
+        }
+    )
+    
+    logger.info(f"Media uploaded for alert {alert.alert_id}: {media_capture.media_type}")
 
 
 def handle_suspicious_deactivation(alert, attempts):
@@ -2014,21 +2198,7 @@ def handle_suspicious_deactivation(alert, attempts):
     logger.warning(f"SECURITY ALERT: Multiple failed deactivation attempts ({attempts}) for alert {alert.alert_id}")
     
     # Notify administrators
-    admins = User.objects.filter(user_type='admin')
-    for admin in admins:
-        EmergencyNotification.objects.create(
-            user=admin,
-            alert=alert,
-            notification_type='alert_activated',
-            title='Suspicious Deactivation Attempts',
-            message=f'Multiple failed deactivation attempts ({attempts}) for alert {alert.alert_id}. Possible coercion situation.',
-            data={
-                'attempts': attempts, 
-                'alert_id': alert.alert_id,
-                'user_email': alert.user.email,
-                'user_name': alert.user.full_name
-            }
-        )
+    notifications.notify_admins(alert, notifications.suspicious_deactivation(alert, attempts))
 
 
 def check_emergency_completion(alert):
@@ -2055,6 +2225,13 @@ def check_emergency_completion(alert):
         )
 
 
+def arrival_sentence(eta, label):
+    """' <label>: N minutes' for notification messages, or nothing when the ETA is unknown"""
+    if eta is None:
+        return ''
+    return f' {label}: {eta} minutes'
+
+
 def calculate_eta(alert, responder, index):
     """
     Calculate estimated time of arrival (simplified version)
@@ -2137,44 +2314,102 @@ def emergency_statistics(request):
     """
     user = request.user
     
-    total_alerts = EmergencyAlert.objects.filter(user=user).count()
-    active_alerts = EmergencyAlert.objects.filter(user=user, status='active').count()
-    resolved_alerts = EmergencyAlert.objects.filter(user=user, status='resolved').count()
-    cancelled_alerts = EmergencyAlert.objects.filter(user=user, status='cancelled').count()
-    
-    # Average response time (simplified)
-    resolved_with_response = EmergencyAlert.objects.filter(
-        user=user, 
-        status='resolved',
-        responses__isnull=False
+    if rollups.requested(request):
+        stats_query = rollups.stats_query('emergency_alert', user=user)
+    else:
+        stats_query = StatsQuery(EmergencyAlert.objects.filter(user=user))
+    
+    counts = (
+        stats_query
+        .count('total_alerts')
+        .count('active_alerts', status='active')
+        .count('resolved_alerts', status='resolved')
+        .count('cancelled_alerts', status='cancelled')
+        .run()
     )
     
-    avg_response_time = None
-    if resolved_with_response.exists():
-        # Mock average response time calculation
-        avg_response_time = 8.5  # minutes
+    response_times = analytics.for_victim(user)
     
     return Response({
         'success': True,
         'data': {
-            'total_alerts': total_alerts,
-            'active_alerts': active_alerts,
-            'resolved_alerts': resolved_alerts,
-            'cancelled_alerts': cancelled_alerts,
-            'avg_response_time': avg_response_time,
+            **counts,
+            'avg_response_time': analytics.average_minutes(response_times),
+            'response_times': response_times,
             'emergency_contacts_count': EmergencyContact.objects.filter(user=user, is_emergency_contact=True).count()
         }
     })
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def response_time_analytics(request):
+    """
+    Responder latency distributions (seconds) for dispatch tuning
+    GET /api/aegis/emergency/response-times/?days=30&alert_id=EMG-...
+    Controllers see every responder, agents only themselves.
+    """
+    user = request.user
+    if user.user_type not in ['controller', 'agent']:
+        return Response({
+            'success': False,
+            'error': 'Only controllers and responders can view response times'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    alert_id = request.query_params.get('alert_id')
+    if alert_id:
+        alert = get_object_or_404(EmergencyAlert, alert_id=alert_id)
+        if user.user_type != 'controller' and not alert.responses.filter(responder=user).exists():
+            return Response({
+                'success': False,
+                'error': 'Not authorized to view this alert'
+            }, status=status.HTTP_403_FORBIDDEN)
+        return Response({'success': True, 'data': analytics.for_alert(alert)})
+    
+    try:
+        days = int(request.query_params.get('days', analytics.RESPONSE_ANALYTICS_WINDOW_DAYS))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= 365:
+        return Response({
+            'success': False,
+            'error': 'days must be between 1 and 365'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    if user.user_type == 'controller':
+        data = analytics.for_controller(days)
+    else:
+        data = analytics.for_responder(user, days)
+    return Response({'success': True, 'data': data})
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_emergency_updates(request, alert_id):
     """
     Get real-time updates for emergency - POLLING ENDPOINT
     GET /api/aegis/emergency/updates/EMG-ABC12345/
+    GET /api/aegis/emergency/updates/EMG-ABC12345/?since=<cursor>
+
+    Every response carries a `cursor`. Passing it back as `since` returns only
+    what changed after it (304 Not Modified when nothing did), without marking
+    notifications as read.
     """
+    since = request.query_params.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'since must be an integer cursor'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return get_emergency_changes(alert_id, since)
+
     try:
         alert = get_object_or_404(EmergencyAlert, alert_id=alert_id)
+        cursor = settled_cursor(**alert.events.aggregate(
+            latest=Max('id'), unsettled=Min('id', filter=Q(created_at__gte=AlertEvent.settle_cutoff()))
+        ))
         
         # Get latest data
         location_updates = LocationUpdate.objects.filter(alert=alert).order_by('-timestamp')[:5]
@@ -2202,7 +2437,9 @@ def get_emergency_updates(request, alert_id):
                 'media_captures': media_serializer.data,
                 'responses': response_serializer.data,
                 'notifications': notification_serializer.data,
-                'timestamp': timezone.now().isoformat()
+                'latest_location': location_ingest.latest_location(alert),
+                'timestamp': timezone.now().isoformat(),
+                'cursor': cursor
             }
         })
         
@@ -2213,18 +2450,88 @@ def get_emergency_updates(request, alert_id):
         }, status=status.HTTP_404_NOT_FOUND)
 
 
+def settled_cursor(latest, unsettled):
+    """
+    The cursor to hand out: the newest event id, held back to just before the
+    oldest event younger than AlertEvent.CURSOR_SETTLE_SECONDS. Ids are taken
+    when a row is inserted, not when it commits, so a slower transaction can
+    still commit an id below the newest one. The next poll re-reads the young
+    events and picks up anything that committed late.
+    """
+    if unsettled is not None:
+        return unsettled - 1
+    return latest or 0
+
+
+def get_emergency_changes(alert_id, since):
+    """
+    Delta mode of get_emergency_updates: only entities with events after `since`
+    """
+    # One indexed lookup answers the common "nothing changed" poll
+    row = (
+        EmergencyAlert.objects.filter(alert_id=alert_id)
+        .values('id')
+        .annotate(cursor=Max('events__id'))
+        .first()
+    )
+    if row is None:
+        return Response({
+            'success': False,
+            'error': 'Emergency alert not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    if (row['cursor'] or 0) <= since:
+        return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+    changed = {}
+    unsettled = None
+    cutoff = AlertEvent.settle_cutoff()
+    new_events = AlertEvent.objects.filter(alert_id=row['id'], id__gt=since)
+    for event_id, kind, object_id, created_at in new_events.values_list('id', 'kind', 'object_id', 'created_at'):
+        changed.setdefault(kind, set()).add(object_id)
+        if created_at >= cutoff and unsettled is None:
+            unsettled = event_id
+    cursor = settled_cursor(row['cursor'], unsettled)
+
+    alert_data = None
+    if 'alert' in changed:
+        alert_data = EmergencyAlertSerializer(EmergencyAlert.objects.get(id=row['id'])).data
+
+    location_updates = LocationUpdate.objects.filter(
+        alert_id=row['id'], id__in=changed.get('location', [])
+    ).order_by('-timestamp')
+    media_captures = MediaCapture.objects.filter(
+        alert_id=row['id'], id__in=changed.get('media', [])
+    ).order_by('-captured_at')
+    responses = EmergencyResponse.objects.filter(
+        alert_id=row['id'], id__in=changed.get('response', [])
+    ).select_related('responder')
+    notifications = EmergencyNotification.objects.filter(
+        alert_id=row['id'], id__in=changed.get('notification', [])
+    ).order_by('-created_at')
+
+    return Response({
+        'success': True,
+        'data': {
+            'alert': alert_data,
+            'location_updates': LocationUpdateSerializer(location_updates, many=True).data if 'location' in changed else [],
+            'media_captures': MediaCaptureSerializer(media_captures, many=True).data if 'media' in changed else [],
+            'responses': EmergencyResponseSerializer(responses, many=True).data if 'response' in changed else [],
+            'notifications': EmergencyNotificationSerializer(notifications, many=True).data if 'notification' in changed else [],
+            'timestamp': timezone.now().isoformat(),
+            'cursor': cursor
+        }
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_emergecy_list(request):
 
-    alerts = EmergencyAlert.objects.all().order_by('-activated_at')
+    alerts, paginator = paginate(request, EmergencyAlert.objects.with_list_data(), '-activated_at')
     serializer = EmergencyAlertSerializer(alerts, many=True)
     
-    return Response({
-        'success': True,
-        'count': alerts.count(),
-        'data': serializer.data
-    })
+    return envelope(paginator, serializer.data)
 
 
 
@@ -2232,8 +2539,8 @@ def get_emergecy_list(request):
 @permission_classes([IsAuthenticated])
 def get_available_responders(request, alert_id):
     """
-    Get available responders with distances from emergency location
-    GET /api/aegis/emergency/EMG-ABC12345/available-responders/
+    Get available responders with distances from emergency location, nearest first
+    GET /api/aegis/emergency/EMG-ABC12345/available-responders/?limit=50&responder_type=police
     """
     try:
         alert = get_object_or_404(EmergencyAlert, alert_id=alert_id)
@@ -2244,28 +2551,28 @@ def get_available_responders(request, alert_id):
                 'error': 'Emergency location not available'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get available responders (not currently assigned to this emergency)
-        available_responders = User.objects.filter(
-            user_type='agent',
-            status='available',
-            latitude__isnull=False,
-            longitude__isnull=False
-        ).exclude(
-            id__in=EmergencyResponse.objects.filter(alert=alert).values('responder_id')
+        try:
+            limit = min(int(request.query_params.get('limit', 50)), 200)
+        except ValueError:
+            limit = 50
+        
+        # Nearest available responders not currently assigned to this emergency
+        available_responders = nearest_responders(
+            alert.initial_latitude,
+            alert.initial_longitude,
+            limit,
+            responder_type=request.query_params.get('responder_type'),
+            exclude_ids=EmergencyResponse.objects.filter(alert=alert).values('responder_id'),
+        )
+        
+        # Calculate ETAs based on distance and responder type in one batch
+        etas = eta_minutes(
+            [distance for _, distance in available_responders],
+            [responder.responder_type for responder, _ in available_responders],
         )
         
         responders_with_distance = []
-        for responder in available_responders:
-            distance = calculate_distance(
-                float(alert.initial_latitude),
-                float(alert.initial_longitude),
-                float(responder.latitude),
-                float(responder.longitude)
-            )
-            
-            # Calculate ETA based on distance and responder type
-            eta_minutes = calculate_eta_based_on_distance(distance, responder.responder_type)
-            
+        for (responder, distance), eta in zip(available_responders, etas):
             responders_with_distance.append({
                 'id': responder.id,
                 'name': responder.full_name,
@@ -2279,13 +2586,10 @@ def get_available_responders(request, alert_id):
                 'latitude': float(responder.latitude),
                 'longitude': float(responder.longitude),
                 'distance_km': round(distance, 2),
-                'eta_minutes': eta_minutes,
+                'eta_minutes': int(eta),
                 'profile_picture': responder.profile_picture.url if responder.profile_picture else None
             })
         
-        # Sort by distance
-        responders_with_distance.sort(key=lambda x: x['distance_km'])
-        
         return Response({
             'success': True,
             'count': len(responders_with_distance),
@@ -2322,22 +2626,22 @@ def assign_responder(request):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Calculate ETA based on current location
-            eta_minutes = calculate_eta_based_on_distance(
-                calculate_distance(
-                    float(alert.initial_latitude),
-                    float(alert.initial_longitude),
-                    float(responder.latitude),
-                    float(responder.longitude)
-                ),
-                responder.responder_type
-            )
+            eta = None
+            if responder.latitude is not None and responder.longitude is not None:
+                distance_km = haversine_km(
+                    alert.initial_latitude,
+                    alert.initial_longitude,
+                    [responder.latitude],
+                    [responder.longitude],
+                )
+                eta = int(eta_minutes(distance_km, [responder.responder_type])[0])
             
             # Create response assignment
             response = EmergencyResponse.objects.create(
                 alert=alert,
                 responder=responder,
                 status='assigned',
-                eta_minutes=eta_minutes,
+                eta_minutes=eta,
                 notes=serializer.validated_data.get('notes', '')
             )
             
@@ -2351,10 +2655,10 @@ def assign_responder(request):
                 alert=alert,
                 notification_type='responder_assigned',
                 title='New Emergency Assignment',
-                message=f'You have been assigned to emergency {alert.alert_id}. Estimated arrival: {eta_minutes} minutes',
+                message=f'You have been assigned to emergency {alert.alert_id}.' + arrival_sentence(eta, 'Estimated arrival'),
                 data={
                     'alert_id': alert.alert_id,
-                    'eta_minutes': eta_minutes,
+                    'eta_minutes': eta,
                     'emergency_type': alert.emergency_type,
                     'location': alert.initial_address,
                     'user_name': alert.user.full_name
@@ -2367,21 +2671,34 @@ def assign_responder(request):
                 alert=alert,
                 notification_type='responder_assigned',
                 title='Responder Assigned',
-                message=f'Responder {responder.full_name} has been assigned to your emergency. ETA: {eta_minutes} minutes',
+                message=f'Responder {responder.full_name} has been assigned to your emergency.' + arrival_sentence(eta, 'ETA'),
                 data={
                     'responder_name': responder.full_name,
-                    'eta_minutes': eta_minutes,
+                    'eta_minutes': eta,
                     'responder_type': responder.responder_type
                 }
             )
             
+            events.publish(
+                events.RESPONDER_ASSIGNED,
+                alert,
+                {
+                    'response_id': response.id,
+                    'responder_id': responder.id,
+                    'responder_name': responder.full_name,
+                    'responder_type': responder.responder_type,
+                    'eta_minutes': eta,
+                },
+                user_ids=[alert.user_id, responder.id],
+            )
+            
             logger.info(f"Responder {responder.email} assigned to alert {alert.alert_id}")
             
             return Response({
                 'success': True,
                 'message': 'Responder assigned successfully',
                 'response_id': response.id,
-                'eta_minutes': eta_minutes
+                'eta_minutes': eta
             })
             
         except EmergencyAlert.DoesNotExist:
@@ -2405,7 +2722,11 @@ def assign_responder(request):
 def get_emergency_map_data(request, alert_id):
     """
     Get map data for emergency including location, responder locations, etc.
-    GET /api/aegis/emergency/EMG-ABC12345/map-data/
+    GET /api/aegis/emergency/EMG-ABC12345/map-data/?zoom=15&max_points=1000
+
+    `track` is the victim's whole path as a precision-6 polyline with unix
+    timestamps, downsampled by ?zoom (one-pixel tolerance), ?tolerance_m,
+    ?bucket_seconds and ?max_points (default 1000, at most 5000).
     """
     try:
         alert = get_object_or_404(EmergencyAlert, alert_id=alert_id)
@@ -2419,6 +2740,7 @@ def get_emergency_map_data(request, alert_id):
                 'emergency_type': alert.emergency_type
             },
             'location_updates': [],
+            'track': tracks.track_for_request(alert, request.query_params),
             'assigned_responders': [],
             'available_responders': []
         }
@@ -2464,43 +2786,6 @@ def get_emergency_map_data(request, alert_id):
 
 
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate distance between two coordinates in kilometers using Haversine formula
-    """
-    R = 6371  # Earth radius in kilometers
-    
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    
-    a = (math.sin(dlat/2) * math.sin(dlat/2) +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlon/2) * math.sin(dlon/2))
-    
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    distance = R * c
-    
-    return distance
-
-def calculate_eta_based_on_distance(distance_km, responder_type):
-    
-    # Base speed in km/h based on responder type
-    base_speeds = {
-        'police': 60,    # km/h
-        'medical': 50,   # km/h  
-        'ngo': 40,       # km/h
-        'volunteer': 30, # km/h
-    }
-    
-    speed = base_speeds.get(responder_type, 40)  # Default 40 km/h
-    
-    # Calculate time in hours, then convert to minutes
-    time_hours = distance_km / speed
-    eta_minutes = max(2, time_hours * 60)  # Minimum 2 minutes
-    
-    return round(eta_minutes)
-
-
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_media(request):
@@ -2517,15 +2802,10 @@ def get_media(request):
         if media_type and media_type in ['audio', 'photo', 'video']:
             media_queryset = media_queryset.filter(media_type=media_type)
         
-        media_queryset = media_queryset.order_by('-captured_at')
-        
-        serializer = MediaCaptureSerializer(media_queryset, many=True)
+        media_page, paginator = paginate(request, media_queryset, '-captured_at')
+        serializer = MediaCaptureSerializer(media_page, many=True)
         
-        return Response({
-            'success': True,
-            'count': len(serializer.data),
-            'data': serializer.data
-        })
+        return envelope(paginator, serializer.data)
         
     except Exception as e:
         logger.error(f"Error fetching media: {str(e)}")
@@ -2570,19 +2850,18 @@ def list_emergency_responses(request, alert_id):
                 'responses': []
             }, status=status.HTTP_200_OK)
 
+        # Distances for every responder in one batch (NaN where location is missing)
+        responses = list(responses_qs)
+        distances = haversine_km(
+            alert.initial_latitude,
+            alert.initial_longitude,
+            *coordinates([response.responder for response in responses]),
+        )
+
         response_list = []
-        for response in responses_qs:
+        for response, distance in zip(responses, distances):
             responder = response.responder
-
-            # Calculate distance if both locations exist
-            distance_km = None
-            if responder.latitude and responder.longitude:
-                distance_km = calculate_distance(
-                    float(alert.initial_latitude),
-                    float(alert.initial_longitude),
-                    float(responder.latitude),
-                    float(responder.longitude)
-                )
+            distance_km = None if math.isnan(distance) else float(distance)
 
             response_list.append({
                 'response_id': response.id,
@@ -2660,15 +2939,10 @@ def emergency_incident_reports(request):
             if severity:
                 reports = reports.filter(severity=severity)
             
-            reports = reports.order_by('-created_at')
-            
+            reports, paginator = paginate(request, reports, '-created_at')
             serializer = EmergencyIncidentReportListSerializer(reports, many=True)
             
-            return Response({
-                'success': True,
-                'count': len(serializer.data),
-                'data': serializer.data
-            })
+            return envelope(paginator, serializer.data)
         
         elif request.method == 'POST':
             serializer = EmergencyIncidentReportSerializer(data=request.data, context={'request': request})
@@ -2887,19 +3161,22 @@ def my_emergency_incident_reports(request):
 @permission_classes([IsAuthenticated])
 def emergency_incident_reports_stats(request):
     try:
-        if request.user.user_type in ['controller','admin']:
-            reports = EmergencyIncidentReport.objects.all()
+        scope = {} if request.user.user_type in ['controller','admin'] else {'agent': request.user}
+        if rollups.requested(request):
+            stats_query = rollups.stats_query('emergency_incident_report', **scope)
         else:
-            reports = EmergencyIncidentReport.objects.filter(agent=request.user)
-        
-        stats = {
-            'total': reports.count(),
-            'draft': reports.filter(status='draft').count(),
-            'submitted': reports.filter(status='submitted').count(),
-            'approved': reports.filter(status='approved').count(),
-            'by_type': list(reports.values('incident_type').annotate(count=Count('id'))),
-            'by_severity': list(reports.values('severity').annotate(count=Count('id'))),
-        }
+            stats_query = StatsQuery(EmergencyIncidentReport.objects.filter(**scope))
+        
+        stats = (
+            stats_query
+            .count('total')
+            .count('draft', status='draft')
+            .count('submitted', status='submitted')
+            .count('approved', status='approved')
+            .breakdown('by_type', 'incident_type')
+            .breakdown('by_severity', 'severity')
+            .run()
+        )
         
         return Response({
             'success': True,
@@ -3030,7 +3307,9 @@ def create_safe_location(request):
         # Prepare data for serializer
         data = {
             'name': request.data.get('name'),
-            'address': request.data.get('address'),
+            'address': request.data.get('address') or gazetteer.describe(
+                request.data.get('latitude'), request.data.get('longitude')
+            ),
             'location_type': request.data.get('location_type', 'other'),
             'latitude': request.data.get('latitude'),
             'longitude': request.data.get('longitude'),
@@ -3075,7 +3354,6 @@ def get_emergency_history_location(request):
             Q(initial_latitude__isnull=True) | Q(initial_longitude__isnull=True)
         ).order_by('-activated_at')[:10]
         
-        print(OPENROUTE_API_KEY)
         emergency_data = []
         for emergency in emergencies:
             emergency_data.append({
@@ -3100,6 +3378,36 @@ def get_emergency_history_location(request):
 
 
 
+def plan_route(start, end, hazards, avoidance_polygons):
+    """
+    Directions between two [lng, lat] points in OpenRouteService's shape, from
+    the local road graph or OpenRouteService, whichever is preferred and can
+    answer; None if neither can
+    """
+    graph = local_routing.get_graph()
+    if graph is not None and local_routing.preferred():
+        route_data = graph.route(start, end, hazards)
+        if route_data is not None:
+            return route_data
+
+    client = openroute.get_client()
+    try:
+        return client.directions(start, end, avoid_polygons=avoidance_polygons)
+    except openroute.OpenRouteError as e:
+        # Retrying without the avoided areas only helps when they made the
+        # route impossible, not when the service is down
+        if avoidance_polygons and e.status is not None and e.status < 500:
+            try:
+                return client.directions(start, end)
+            except openroute.OpenRouteError:
+                pass
+        logger.warning(f"OpenRouteService directions failed: {str(e)}")
+
+    if graph is not None and not local_routing.preferred():
+        return graph.route(start, end, hazards)
+    return None
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def find_safe_route(request):
@@ -3145,103 +3453,56 @@ def find_safe_route(request):
                 [lng - 0.005, lat - 0.005]   # Close polygon
             ])
         
-        # Step 1: Geocode destination using OpenRouteService Geocoding
-        geocode_url = "https://api.openrouteservice.org/geocode/search"
-        geocode_headers = {
-            'Authorization': OPENROUTE_API_KEY
-        }
-        geocode_params = {
-            'text': destination,
-            'boundary.country': 'BGD',  # Bangladesh
-            'size': 1
-        }
-        
-        geocode_response = requests.get(
-            geocode_url, 
-            headers=geocode_headers, 
-            params=geocode_params
-        )
-        
-        if geocode_response.status_code != 200:
-            return Response({
-                'success': False,
-                'error': 'Could not find destination location'
-            }, status=400)
-        
-        geocode_data = geocode_response.json()
-        
-        if not geocode_data.get('features'):
-            return Response({
-                'success': False,
-                'error': 'Destination not found'
-            }, status=400)
-        
-        # Extract destination coordinates
-        dest_feature = geocode_data['features'][0]
-        dest_coords = dest_feature['geometry']['coordinates']  # [lng, lat]
-        dest_address = dest_feature['properties']['label']
-        
-        # Step 2: Get route from OpenRouteService Directions API
-        route_url = "https://api.openrouteservice.org/v2/directions/driving-car"
-        route_headers = {
-            'Authorization': OPENROUTE_API_KEY,
-            'Content-Type': 'application/json'
-        }
-        
-        # Prepare coordinates: [start_lng, start_lat], [end_lng, end_lat]
-        coordinates = [
-            [current_lng, current_lat],
-            dest_coords
-        ]
-        
-        route_body = {
-            "coordinates": coordinates,
-            "instructions": False,
-            "preference": "recommended"
-        }
-        
-        # Add avoidance areas if there are emergency locations
-        if avoidance_polygons:
-            route_body["options"] = {
-                "avoid_polygons": {
-                    "type": "MultiPolygon",
-                    "coordinates": [avoidance_polygons]
-                }
-            }
-        
-        route_response = requests.post(
-            route_url, 
-            json=route_body, 
-            headers=route_headers
-        )
+        client = openroute.get_client()
         
-        if route_response.status_code != 200:
-            # Fallback: Try without avoidance
-            route_body.pop('options', None)
-            route_response = requests.post(
-                route_url, 
-                json=route_body, 
-                headers=route_headers
-            )
+        # Step 1: Geocode destination (Bangladesh only), unless the app
+        # already knows where it is
+        if request.data.get('destination_lat') is not None and request.data.get('destination_lng') is not None:
+            dest_coords = [float(request.data['destination_lng']), float(request.data['destination_lat'])]
+            dest_address = destination
+        else:
+            try:
+                dest_feature = client.geocode(destination, country='BGD')
+            except openroute.OpenRouteError:
+                return Response({
+                    'success': False,
+                    'error': 'Could not find destination location'
+                }, status=400)
+            
+            if dest_feature is None:
+                return Response({
+                    'success': False,
+                    'error': 'Destination not found'
+                }, status=400)
             
-            if route_response.status_code != 200:
+            # Extract destination coordinates
+            dest_coords = dest_feature['geometry']['coordinates']  # [lng, lat]
+            dest_address = dest_feature['properties']['label']
+        
+        # Step 2: Get route, avoiding emergency locations when possible. The
+        # same trip avoiding the same places reuses the stored geometry.
+        start = [float(current_lng), float(current_lat)]
+        hazards = [(loc['lat'], loc['lng']) for loc in avoided_locations]
+        route_key = route_store.route_key(start, dest_coords, hazards)
+        stored_route = route_store.lookup(route_key)
+        if stored_route is None:
+            route_data = plan_route(start, dest_coords, hazards, avoidance_polygons)
+            if route_data is None:
                 return Response({
                     'success': False,
                     'error': 'Could not calculate route'
                 }, status=400)
-        
-        route_data = route_response.json()
+            stored_route = route_store.store(route_key, route_data)
         
         # Extract route information
-        route_feature = route_data['features'][0]
-        geometry = route_feature['geometry']['coordinates']  # Full path coordinates
-        properties = route_feature['properties']['summary']
+        geometry = route_store.coordinates(stored_route)  # Full path coordinates
         
-        distance_km = properties['distance'] / 1000  # Convert to km
-        duration_min = properties['duration'] / 60   # Convert to minutes
+        distance_km = stored_route.distance_m / 1000  # Convert to km
+        duration_min = stored_route.duration_s / 60   # Convert to minutes
         
-        # Calculate safety rating based on avoided locations
-        safety_rating = max(1.0, 5.0 - (len(avoided_locations) * 0.1))
+        # Rate the route by the incident history along it
+        route_risk = risk.get_surface().score(geometry)
+        safety_rating = route_risk['safety_rating']
         
         # Generate waypoints from the route
         waypoints = []
@@ -3259,22 +3520,22 @@ def find_safe_route(request):
             'distance': f"{distance_km:.1f} km",
             'duration': f"{duration_min:.0f} min",
             'safety_rating': round(safety_rating, 1),
+            'risk': {'exposure': route_risk['exposure'], 'peak': route_risk['peak']},
             'features': [
                 'Avoids emergency locations' if avoided_locations else 'Direct route',
                 'Real-time navigation',
                 'Live location sharing'
             ],
             'waypoints': waypoints,
-            'route_path': geometry,
             'start_location': [current_lng, current_lat],
-            'end_location': dest_coords,
-            'raw_route_data': route_data
+            'end_location': dest_coords
         }
         
-        # Save the route to database
+        # Save the route to database; the path itself lives on the geometry
         safe_route = SafeRoute.objects.create(
             user=request.user,
             destination=dest_address,
+            geometry=stored_route,
             route_data=route_info,
             avoided_locations=avoided_locations
         )
@@ -3287,13 +3548,14 @@ def find_safe_route(request):
                 'distance': route_info['distance'],
                 'duration': route_info['duration'],
                 'safety_rating': route_info['safety_rating'],
+                'risk': route_info['risk'],
                 'features': route_info['features'],
                 'avoided_locations': avoided_locations,
                 'waypoints': waypoints,
                 'route_path': geometry,  # Full coordinate path for the map
                 'start_location': [current_lng, current_lat],
                 'end_location': dest_coords,
-                'bounds': route_feature.get('bbox', [])  # Map bounds
+                'bounds': stored_route.bbox  # Map bounds
             }
         })
         
@@ -3303,6 +3565,74 @@ def find_safe_route(request):
             'error': f'Route calculation failed: {str(e)}'
         }, status=500)
 
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Always use the first renderer, whatever the Accept header asks for"""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class RiskTileView(APIView):
+    """Incident-density heatmap tile for the map: GET /risk/tiles/<z>/<x>/<y>.png"""
+    permission_classes = [IsAuthenticated]
+    # Map tile clients ask for image/*; errors still come back as JSON
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, z, x, y):
+        if not (0 <= z <= 18 and x < 2 ** z and y < 2 ** z):
+            return Response({
+                'success': False,
+                'error': 'Invalid tile'
+            }, status=400)
+
+        response = HttpResponse(risk.tile_png(z, x, y), content_type='image/png')
+        response['Cache-Control'] = f'private, max-age={risk.RISK_TILE_CACHE_SECONDS}'
+        return response
+
+
+class MediaStreamView(APIView):
+    """Evidence file download with Range support: GET /media/<kind>/<pk>/?variant=thumbnail|preview"""
+    permission_classes = [IsAuthenticated]
+    # Video players ask for video/*; errors still come back as JSON
+    content_negotiation_class = IgnoreClientContentNegotiation
+
+    def get(self, request, kind, pk):
+        if kind not in streaming.SOURCES:
+            return Response({
+                'success': False,
+                'error': 'Unknown media kind'
+            }, status=404)
+        variant = request.query_params.get('variant')
+        if variant and variant not in streaming.VARIANTS:
+            return Response({
+                'success': False,
+                'error': f"Variant must be one of: {', '.join(streaming.VARIANTS)}"
+            }, status=400)
+
+        model = streaming.SOURCES[kind][0]
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None:
+            return Response({
+                'success': False,
+                'error': 'Media not found'
+            }, status=404)
+        if not streaming.can_access(request.user, instance):
+            return Response({
+                'success': False,
+                'error': 'Access denied'
+            }, status=403)
+
+        field = streaming.source_file(instance, variant)
+        if not field:
+            return Response({
+                'success': False,
+                'error': 'File not found'
+            }, status=404)
+        return streaming.serve(request, field)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def get_route_geojson(request):
@@ -3316,47 +3646,11 @@ def get_route_geojson(request):
                 'error': 'Route ID is required'
             }, status=400)
         
-        route = SafeRoute.objects.get(id=route_id, user=request.user)
-        route_data = route.route_data
-        
-        # Create GeoJSON feature for the route
-        geojson = {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "properties": {
-                        "name": f"Route to {route.destination}",
-                        "distance": route_data['distance'],
-                        "duration": route_data['duration']
-                    },
-                    "geometry": {
-                        "type": "LineString",
-                        "coordinates": route_data['route_path']
-                    }
-                }
-            ]
-        }
-        
-        # Add emergency locations as point features
-        for i, location in enumerate(route.avoided_locations):
-            geojson['features'].append({
-                "type": "Feature",
-                "properties": {
-                    "name": f"Avoided: {location['address']}",
-                    "type": location['type'],
-                    "marker-color": "#ff0000"
-                },
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [location['lng'], location['lat']]
-                }
-            })
+        route = SafeRoute.objects.select_related('geometry').get(id=route_id, user=request.user)
         
-        return Response({
-            'success': True,
-            'data': geojson
-        })
+        # Route line from the stored geometry's prebuilt GeoJSON, plus the
+        # avoided emergency locations as point features
+        return StreamingHttpResponse(route_store.geojson_chunks(route), content_type='application/json')
         
     except SafeRoute.DoesNotExist:
         return Response({
@@ -3383,35 +3677,24 @@ def reverse_geocode(request):
                 'error': 'Latitude and longitude are required'
             }, status=400)
         
-        reverse_geocode_url = "https://api.openrouteservice.org/geocode/reverse"
-        headers = {
-            'Authorization': OPENROUTE_API_KEY
-        }
-        params = {
-            'point.lon': lng,
-            'point.lat': lat,
-            'size': 1
-        }
-        
-        response = requests.get(reverse_geocode_url, headers=headers, params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('features'):
-                address = data['features'][0]['properties']['label']
-                return Response({
-                    'success': True,
-                    'data': {
-                        'address': address,
-                        'coordinates': [float(lng), float(lat)]
-                    }
-                })
+        lat, lng = float(lat), float(lng)
+        # A named place right there needs no network. Otherwise the remote
+        # geocoder gives a street address, and without it the nearest place
+        # ("3.4 km from ...") is the offline answer.
+        address = gazetteer.describe(lat, lng, gazetteer.GAZETTEER_NEAR_KM)
+        if not address:
+            try:
+                address = openroute.get_client().reverse_geocode(lat, lng)
+            except openroute.OpenRouteError:
+                address = None
+        if not address:
+            address = gazetteer.describe(lat, lng)
         
         return Response({
             'success': True,
             'data': {
-                'address': f"Location ({lat:.4f}, {lng:.4f})",
-                'coordinates': [float(lng), float(lat)]
+                'address': address or f"Location ({lat:.4f}, {lng:.4f})",
+                'coordinates': [lng, lat]
             }
         })
         
@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import base64
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +45,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -54,6 +57,7 @@ INSTALLED_APPS = [
     'accounts',
     'aegis',
     'corsheaders',
+    'channels',
 ]
 
 MIDDLEWARE = [
@@ -86,6 +90,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'aegisB.wsgi.application'
+ASGI_APPLICATION = 'aegisB.asgi.application'
 
 
 # Database
@@ -163,7 +168,9 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 
-FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
+# Larger multipart files spool to a temporary file instead of worker memory;
+# big recordings should use the resumable upload API (aegis/uploads.py)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB
 
 # Optional: Add file type restrictions
@@ -179,4 +186,91 @@ load_dotenv()
 
 OPENROUTE_API_KEY = os.getenv('OPENROUTE_API_KEY')
 
-TEST_RUNNER = 'django.test.runner.DiscoverRunner'
\ No newline at end of file
+# Channel layer used to push real-time events to WebSocket clients. The in-memory
+# layer only works within a single process; set REDIS_URL (requires channels_redis)
+# when running more than one worker.
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Cache shared by every worker process: it holds the latest location of each
+# alert (aegis/location_ingest.py), task idempotency keys and cached routes, so
+# a per-process memory cache would give each worker its own view. Redis when
+# REDIS_URL is set (requires redis), otherwise a database table created by
+# `python manage.py createcachetable`.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'aegis_cache',
+        }
+    }
+
+# Background jobs (aegis/tasks.py): 'thread' runs them on an in-process pool,
+# 'database' queues them durably for `python manage.py run_jobs`
+TASK_BACKEND = os.getenv('TASK_BACKEND', 'thread')
+
+
+TEST_RUNNER = 'django.test.runner.DiscoverRunner'
+
+# Offline reverse geocoding index, written by `python manage.py build_gazetteer`.
+# Until it exists the bundled place list is indexed in memory at first use.
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(BASE_DIR, 'gazetteer_index'))
+
+# Local routing (aegis/local_routing.py) over a graph written by
+# `python manage.py build_road_graph`. With ROUTING_BACKEND = 'local' it is
+# tried before OpenRouteService; otherwise only when OpenRouteService fails.
+ROUTING_GRAPH_PATH = os.getenv('ROUTING_GRAPH_PATH', os.path.join(BASE_DIR, 'road_graph'))
+ROUTING_BACKEND = os.getenv('ROUTING_BACKEND', 'openroute')
+
+# Route risk surface (aegis/risk.py). Set a file path to share one surface
+# between processes; otherwise each process keeps its own in memory.
+RISK_SURFACE_PATH = os.getenv('RISK_SURFACE_PATH')
+
+# Partial files of resumable uploads (aegis/uploads.py). Keep this on the same
+# filesystem as MEDIA_ROOT so finishing an upload is a rename, not a copy.
+UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'upload_sessions'))
+
+# Hand evidence downloads (aegis/streaming.py) to the web server instead of
+# sending them from Django: 'x-accel-redirect' for nginx, with
+# MEDIA_ACCEL_PREFIX an internal location aliased to MEDIA_ROOT, or
+# 'x-sendfile' for Apache/lighttpd.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Master key wrapping the per-file keys of encrypted evidence (aegis/crypto.py):
+# 32 random bytes, urlsafe base64, e.g. from
+#   python -c "import base64, os; print(base64.urlsafe_b64encode(os.urandom(32)).decode())"
+# After rotating, list the previous keys in MEDIA_ENCRYPTION_OLD_KEYS
+# (comma separated) so existing files stay readable. Required unless DEBUG is
+# on; in development a random key is kept in .media_encryption_key, which must
+# never be committed.
+MEDIA_ENCRYPTION_KEY = os.getenv('MEDIA_ENCRYPTION_KEY')
+if not MEDIA_ENCRYPTION_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured('MEDIA_ENCRYPTION_KEY must be set when DEBUG is off')
+    _dev_key_file = BASE_DIR / '.media_encryption_key'
+    try:
+        with open(_dev_key_file, 'x') as output:
+            output.write(base64.urlsafe_b64encode(os.urandom(32)).decode())
+    except FileExistsError:
+        pass
+    MEDIA_ENCRYPTION_KEY = _dev_key_file.read_text().strip()
+MEDIA_ENCRYPTION_OLD_KEYS = [key for key in os.getenv('MEDIA_ENCRYPTION_OLD_KEYS', '').split(',') if key]